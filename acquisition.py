@@ -0,0 +1,93 @@
+import argparse
+import datetime
+import os
+import queue
+import sys
+import threading
+
+import numpy as np
+
+import helpers.outils as outils
+from helpers.classes import AcquisitionLog, ChannelRegistry, SerialReaderStats, SharedRingBuffer
+
+"""
+File Duties:
+
+Acquisition process (started by interface.py when acquisition_process = True).
+It reads the Arduino (or the simulated data), converts the samples and writes
+them to the shared-memory ring buffer created by the interface, so that the
+sampling never waits for the GUI (rendering, tight_layout, ...). The whole raw
+stream is also written to an acquisition log ("data/acquisition_*.log", it can
+be read with recover_log.py).
+
+The process finishes when the interface requests it (stop flag of the ring
+buffer) or closes the stdin pipe (e.g. the interface crashed).
+
+Usage:
+    python acquisition.py <shared_memory_name> [--port COM6] [--baud-rate 115200]
+                          [--simulated | --replay FILE [--replay-speed N]]
+                          [--channels JSON] [--capture] [--no-log]
+"""
+
+parser = argparse.ArgumentParser(description="Acquisition process of interface.py")
+parser.add_argument("ring_name", help="name of the shared memory of the ring buffer")
+parser.add_argument("--port", default="COM6")
+parser.add_argument("--baud-rate", type=int, default=115200)
+parser.add_argument("--simulated", action="store_true")
+parser.add_argument("--replay", help="recorded run to replay instead of the Arduino (see outils.replay_data_thread)")
+parser.add_argument("--replay-speed", type=float, default=1., help="replay speed (0: as fast as possible)")
+parser.add_argument("--channels", default=None,
+                    help="channels as JSON (ChannelRegistry.to_json; default: load cell + potentiometer)")
+parser.add_argument("--capture", action="store_true", help="save the bytes received (data/serial_*.raw)")
+parser.add_argument("--no-log", action="store_true", help="do not write the raw acquisition log")
+args = parser.parse_args()
+
+channels = ChannelRegistry.from_json(args.channels) if args.channels else outils.default_channels()
+ring = SharedRingBuffer(name=args.ring_name)
+parent_alive = threading.Event()
+parent_alive.set()
+
+
+def watch_parent():
+    """The stdin pipe is closed when the interface finishes (even if it crashed)"""
+    sys.stdin.read()
+    parent_alive.clear()
+
+
+threading.Thread(target=watch_parent, daemon=True).start()
+
+# Bounded queue filled by the reader thread (a replay waits for space; otherwise the oldest samples are dropped)
+reader_stats = SerialReaderStats()
+data_queue, ser = outils.start_data_source(channels, args.port, args.baud_rate, args.simulated, args.replay,
+                                           args.replay_speed, stats=reader_stats, capture=args.capture)
+if data_queue is None:
+    print("[ERROR] Unable to establish connection. Acquisition process finished.")
+    sys.exit(1)
+
+log = None
+if not args.no_log:
+    os.makedirs("data", exist_ok=True)
+    file_name = f"acquisition_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+    raw_columns = ["time"] + [f"raw_{name}" for name in channels.names]
+    log = AcquisitionLog(os.path.join("data", file_name), raw_columns,
+                         metadata={"source": args.replay or ("simulated" if args.simulated else args.port)})
+
+t_us_last = 0
+while not ring.stop_requested and parent_alive.is_set():
+    try:
+        samples = data_queue.get(timeout=0.2)  # Blocks until the reader has new samples
+    except queue.Empty:
+        continue
+    t_us, values = outils.convert_channels(samples, t_us_last, channels)
+    t_us_last = int(t_us[-1])
+    rows = np.column_stack([outils.from_t_us_to_s(t_us), values])
+    ring.write(rows)
+    if log is not None:
+        log.write_samples(dict(zip(raw_columns, rows.T)))
+
+if log is not None:
+    log.close()
+if data_queue.n_dropped > 0:
+    print(f"[WARNING] {data_queue.n_dropped} samples were dropped (acquisition queue full)")
+ring.close()
+print("[INFO] Acquisition process finished")
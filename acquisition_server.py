@@ -0,0 +1,151 @@
+import argparse
+import datetime
+import os
+import queue
+import sys
+import time
+
+import numpy as np
+
+import helpers.outils as outils
+from helpers.classes import AcquisitionLog, ChannelRegistry, SampleServer, SerialReaderStats, ZeroCallibration
+
+"""
+File Duties:
+
+Headless acquisition (no GUI): it reads the Arduino (or the simulated data or
+a recorded run), converts the samples, computes the callibration zeros and
+writes the acquisition log ("data/server_*.log", it can be read with
+recover_log.py), exactly as interface.py does, and publishes the samples in
+batches through a local socket (see classes.SampleServer for the wire format).
+
+Any number of viewers (operator screen, projector, scoreboard, ...) can
+connect and disconnect at any time without disturbing the sampling: every
+viewer has its own bounded queue and the oldest batches of a slow viewer are
+dropped. acquisition_viewer.py is a console viewer.
+
+A callibration is done when the first data arrives and whenever a viewer sends
+the command "callibrate" (e.g. python acquisition_viewer.py --callibrate).
+The server runs until it is interrupted (Ctrl+C).
+
+Usage:
+    python acquisition_server.py [--listen 127.0.0.1:5757 | --listen /tmp/bridge.sock]
+                                 [--port COM6] [--baud-rate 115200]
+                                 [--simulated | --replay FILE [--replay-speed N]]
+                                 [--channels JSON] [--callibration-time 5]
+                                 [--threshold 50] [--batch-time 0.05] [--no-log]
+"""
+
+parser = argparse.ArgumentParser(description="Headless acquisition that publishes the samples through a socket")
+parser.add_argument("--listen", default="127.0.0.1:5757", help="host:port (TCP) or path of a Unix socket")
+parser.add_argument("--port", default="COM6")
+parser.add_argument("--baud-rate", type=int, default=115200)
+parser.add_argument("--simulated", action="store_true")
+parser.add_argument("--replay", help="recorded run to replay instead of the Arduino (see outils.replay_data_thread)")
+parser.add_argument("--replay-speed", type=float, default=1., help="replay speed (0: as fast as possible)")
+parser.add_argument("--channels", default=None,
+                    help="channels as JSON (ChannelRegistry.to_json; default: load cell + potentiometer)")
+parser.add_argument("--callibration-time", type=float, default=5., help="window of samples used to compute the zeros (s)")
+parser.add_argument("--threshold", type=float, default=50, help="threshold of the mass peaks (kg)")
+parser.add_argument("--batch-time", type=float, default=0.05, help="period between published batches (s)")
+parser.add_argument("--max-queued", type=int, default=256, help="batches queued for each viewer before dropping")
+parser.add_argument("--no-log", action="store_true", help="do not write the acquisition log")
+args = parser.parse_args()
+
+channels = ChannelRegistry.from_json(args.channels) if args.channels else outils.default_channels(args.threshold)
+columns = channels.store_columns()
+source = args.replay or ("simulated" if args.simulated else args.port)
+
+# Data source (same threads as interface.py): bounded queue filled by the reader thread
+# (a replay waits for space; otherwise the oldest samples are dropped)
+reader_stats = SerialReaderStats()
+data_queue, ser = outils.start_data_source(channels, args.port, args.baud_rate, args.simulated, args.replay,
+                                           args.replay_speed, stats=reader_stats)
+if data_queue is None:
+    print("[ERROR] Unable to establish connection. Acquisition server finished.")
+    sys.exit(1)
+
+# Commands of the viewers (received in the connection threads, run in the main loop)
+commands = queue.Queue()
+server = SampleServer(outils.parse_socket_address(args.listen), columns,
+                      metadata={"channels": channels.to_json(), "source": source},
+                      max_queued=args.max_queued, on_command=commands.put)
+print(f"[INFO] Acquisition server listening on {server.address}")
+
+log = None
+if not args.no_log:
+    os.makedirs("data", exist_ok=True)
+    file_name = f"server_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+    log = AcquisitionLog(os.path.join("data", file_name), columns, metadata={"source": source})
+
+zero_callibration = ZeroCallibration(args.callibration_time, channels.thresholds())
+zeros = np.zeros(channels.n_channels)
+callibration_dict = {}
+callibration_requested = args.callibration_time > 0
+t_us_last = 0
+n_samples = 0  # Samples published (index of the next one)
+
+try:
+    while True:
+        time.sleep(args.batch_time)  # Samples are published in batches
+        while not commands.empty():
+            command = commands.get()
+            if command == "callibrate":
+                callibration_requested = True
+            else:
+                print(f"[WARNING] Unknown command: {command}")
+
+        samples = data_queue.drain()
+        if len(samples) == 0:
+            continue
+        t_us, values = outils.convert_channels(samples, t_us_last, channels)
+        t_us_last = int(t_us[-1])
+        time_s = outils.from_t_us_to_s(t_us)
+        if callibration_requested and not zero_callibration.collecting:
+            # From the first new sample (a replay may not start at 0 s)
+            zero_callibration.start(np.nextafter(time_s[0], -np.inf))
+            callibration_requested = False
+            print(f"[INFO] Callibrating ({args.callibration_time} s)...")
+
+        processed = values - zeros
+        idx_end = zero_callibration.update(time_s, values)
+        if idx_end is not None:
+            zeros = zero_callibration.zeros
+            processed[idx_end:] = values[idx_end:] - zeros
+            zero_mass, zero_deflection = (float(total[0]) for total in channels.totals(zeros[None, :]))
+            i = len(callibration_dict)
+            idx_last = n_samples + idx_end - 1
+            callibration_dict[i] = {"callibration":
+                                    {"t_ini_callibration": zero_callibration.t_ini,
+                                     "t_end_callibration": zero_callibration.t_end,
+                                     "zero_mass": zero_mass,
+                                     "zero_deflection": zero_deflection,
+                                     "zeros": dict(zip(channels.names, zeros.tolist()))},
+                                    "raw_processed_data":
+                                    {"time": float(time_s[idx_end - 1]) if idx_end > 0 else zero_callibration.t_end,
+                                     "idx_ini": idx_last}}
+            server.publish_json({"callibration": {str(i): callibration_dict[i]}})
+            if log is not None:
+                log.write_json({"callibration": callibration_dict})
+            print(f"[INFO] Callibration done ({zero_callibration.n_samples} samples): "
+                  f"{zero_mass:.3f} kg, {zero_deflection:.3f} mm")
+            if zero_callibration.unstable:
+                print("[WARNING] The load changed during the callibration (no stable samples): "
+                      "remove the load and callibrate again.")
+
+        block = channels.store_block(time_s, values, processed)
+        server.publish_samples(block.T)
+        if log is not None:
+            log.write_samples(dict(zip(columns, block)))
+        n_samples += len(time_s)
+except KeyboardInterrupt:
+    pass
+
+server.close()
+if log is not None:
+    log.close()
+if data_queue.n_dropped > 0:
+    print(f"[WARNING] {data_queue.n_dropped} samples were dropped (acquisition queue full)")
+if server.n_dropped > 0:
+    print(f"[WARNING] {server.n_dropped} batches were dropped for slow viewers")
+print("[INFO] Acquisition server finished")
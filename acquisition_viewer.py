@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import numpy as np
+
+import helpers.outils as outils
+from helpers.classes import SampleSubscriber
+
+"""
+File Duties:
+
+Console viewer of acquisition_server.py (e.g. for a scoreboard or to check the
+server): it connects to the server and prints the current load and deflection
+and the peak load every second. With --callibrate it asks the server for a new
+callibration before.
+
+Usage:
+    python acquisition_viewer.py [--connect 127.0.0.1:5757] [--callibrate] [--period 1]
+"""
+
+parser = argparse.ArgumentParser(description="Console viewer of acquisition_server.py")
+parser.add_argument("--connect", default="127.0.0.1:5757", help="host:port (TCP) or path of a Unix socket")
+parser.add_argument("--callibrate", action="store_true", help="request a new callibration")
+parser.add_argument("--period", type=float, default=1., help="period between printed lines (s)")
+args = parser.parse_args()
+
+subscriber = SampleSubscriber(outils.parse_socket_address(args.connect))
+print(f"[INFO] Connected to {args.connect} (source: {subscriber.metadata.get('source')})")
+if args.callibrate:
+    subscriber.send_command("callibrate")
+
+peak_load = 0.
+t_print = time.monotonic()
+try:
+    while True:
+        kind, content = subscriber.receive()
+        if kind == "END_":
+            print("[INFO] The server has finished")
+            break
+        if kind == "JSON" and "callibration" in content:
+            peak_load = 0.  # New test
+            for entry in content["callibration"].values():
+                print(f"[INFO] Callibration: {entry['callibration']['zero_mass']:.3f} kg, "
+                      f"{entry['callibration']['zero_deflection']:.3f} mm")
+        elif kind == "DATA":
+            peak_load = max(peak_load, float(np.max(content["processed_mass"])))
+            if time.monotonic() - t_print >= args.period:
+                t_print = time.monotonic()
+                print(f"Time: {content['time'][-1]:.2f} s | Load: {content['processed_mass'][-1]:.2f} kg | "
+                      f"Deflection: {content['processed_deflection'][-1]:.2f} mm | Peak: {peak_load:.2f} kg")
+except KeyboardInterrupt:
+    pass
+subscriber.close()
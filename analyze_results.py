@@ -0,0 +1,148 @@
+import argparse
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import helpers.outils as outils
+
+"""
+File Duties:
+
+Batch analysis of all the runs of a results folder (e.g. after a contest).
+Every result file (.bcr or .json; if a run has both, the .bcr is used) is
+analyzed in a pool of processes (all the cores by default) with
+outils.analyze_run: peak load, deflection at the peak, stiffness, energy and
+failure time. The runs are ranked by peak load and the leaderboard is saved
+as CSV and JSON next to the folder (<folder>_leaderboard.csv/.json), so that
+it is not taken as a result file by the scripts that read the folder (e.g.
+process_results.py).
+
+The results of each file are cached (.analysis_cache.json in the folder)
+together with its modification time and size, so on reruns only new or
+modified files are analyzed (the cache is discarded if the analysis
+parameters change).
+
+Usage:
+    python analyze_results.py [folder] [--recursive] [--output <folder>_leaderboard]
+                              [--workers N] [--threshold 50] [--failure-drop 0.2]
+"""
+
+CACHE_NAME = ".analysis_cache.json"
+FIELDS = ("rank", "team", "file", "peak_load", "deflection_at_peak", "time_peak", "stiffness",
+          "energy", "failure_time", "max_deflection", "duration", "n_samples")
+
+
+def find_result_files(folder, recursive=False, exclude=()):
+    """Result files of the folder (.bcr preferred over .json of the same run)"""
+    exclude = {os.path.abspath(path) for path in exclude}
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        runs = {}
+        for f in sorted(files):
+            stem, ext = os.path.splitext(f)
+            if ext in (".bcr", ".json") and not f.startswith(".") \
+                    and os.path.abspath(os.path.join(root, f)) not in exclude:
+                if ext == ".bcr" or stem not in runs:
+                    runs[stem] = f
+        paths += [os.path.join(root, f) for f in sorted(runs.values())]
+        if not recursive:
+            break
+        dirs.sort()
+    return paths
+
+
+def team_name(path):
+    """Team of a result file (name before the date: Equipo_Azul_2025-03-07_09-33-45.json)"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = re.match(r"(.*?)_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}", stem)
+    return match.group(1) if match else stem
+
+
+def analyze_file(path, params):
+    """Worker of the pool: loads and analyzes one result file"""
+    try:
+        return path, outils.analyze_run(outils.load_results(path), **params), None
+    except Exception as e:  # A bad file must not stop the analysis of the rest
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis and leaderboard of all the runs of a folder")
+    parser.add_argument("folder", nargs="?", default="data")
+    parser.add_argument("--recursive", action="store_true", help="also analyze the subfolders")
+    parser.add_argument("--output", default=None, help="leaderboard path without extension "
+                                                       "(default: <folder>_leaderboard, outside the folder)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all the cores)")
+    parser.add_argument("--threshold", type=float, default=50, help="threshold of the mass peaks (kg)")
+    parser.add_argument("--failure-drop", type=float, default=0.2,
+                        help="fraction of the peak load lost after the peak that means failure")
+    parser.add_argument("--no-cache", action="store_true", help="analyze all the files again")
+    args = parser.parse_args()
+
+    params = {"threshold_mass_peaks": args.threshold, "failure_drop": args.failure_drop}
+    output = args.output or os.path.normpath(args.folder) + "_leaderboard"
+    paths = find_result_files(args.folder, args.recursive, exclude=[output + ".json"])
+    if not paths:
+        print(f"[WARNING] No result files in {args.folder}")
+        return
+
+    # Cache of the previous runs (only valid with the same parameters)
+    cache_path = os.path.join(args.folder, CACHE_NAME)
+    cache = {"params": params, "files": {}}
+    if os.path.exists(cache_path) and not args.no_cache:
+        with open(cache_path) as f:
+            previous = json.load(f)
+        if previous.get("params") == params:
+            cache = previous
+
+    results, pending = {}, []
+    for path in paths:
+        key = os.path.relpath(path, args.folder)
+        st = os.stat(path)
+        entry = cache["files"].get(key)
+        if entry is not None and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+            results[key] = entry["result"]
+        else:
+            pending.append(path)
+    print(f"[INFO] {len(paths)} runs: {len(results)} unchanged (cached), {len(pending)} to analyze")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for path, result, error in pool.map(analyze_file, pending, [params] * len(pending)):
+                key = os.path.relpath(path, args.folder)
+                if error is not None:
+                    print(f"[ERROR] {path}: {error}")
+                    continue
+                st = os.stat(path)
+                cache["files"][key] = {"mtime": st.st_mtime, "size": st.st_size, "result": result}
+                results[key] = result
+
+    # Files removed since the last run are dropped from the cache
+    cache["files"] = {key: cache["files"][key] for key in results}
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=1)
+
+    # Leaderboard: ranked by peak load (runs without data at the end)
+    rows = [{"team": team_name(key), "file": key, **result} for key, result in results.items()]
+    rows.sort(key=lambda row: -row["peak_load"] if row["peak_load"] == row["peak_load"] else float("inf"))
+    for rank, row in enumerate(rows, start=1):
+        row["rank"] = rank
+
+    with open(output + ".csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(output + ".json", "w") as f:
+        json.dump(rows, f, indent=4)
+
+    print(f"{'#':>3}  {'team':<20}{'peak (kg)':>10}{'defl. (mm)':>12}{'k (kg/mm)':>11}{'E (J)':>9}{'fail (s)':>10}")
+    for row in rows:
+        print(f"{row['rank']:>3}  {row['team']:<20}{row['peak_load']:>10.2f}{row['deflection_at_peak']:>12.2f}"
+              f"{row['stiffness']:>11.2f}{row['energy']:>9.2f}{row['failure_time']:>10.2f}")
+    print(f"[INFO] Leaderboard saved in {output}.csv and {output}.json")
+
+
+if __name__ == "__main__":  # Required by the process pool (the workers import this file)
+    main()
@@ -8,27 +8,75 @@
   This example code is in the public domain.
 
   https://www.arduino.cc/en/Tutorial/BuiltInExamples/AnalogReadSerial
+
+  Output formats (BINARY_PROTOCOL):
+  - 1 (binary): one 16-byte frame per reading (little-endian), sent as soon as
+    the HX711 has a new value (no delay):
+      bytes 0-1   sync 0xAA 0x55
+      bytes 2-3   sequence number (uint16, wraps around)
+      bytes 4-7   micros() timestamp (uint32, wraps around)
+      bytes 8-11  HX711 reading (int32)
+      bytes 12-13 potentiometer reading (uint16, 10-bit ADC)
+      bytes 14-15 CRC-16/CCITT-FALSE of bytes 2-13
+    It is decoded by helpers/outils.py (decode_binary_frames / classes.FrameDecoder).
+  - 0 (legacy text): "deltaTime loadCell potentiometer" lines every 50 ms.
 */
 
 #include "HX711.h"
 
+#define BINARY_PROTOCOL 1
+#define BAUD_RATE 115200  // Must match baud_rate in interface.py
+
 // Define the pins for the first HX711
 const int SG_DOUT_PIN_1 = 52;
 const int SG_SCK_PIN_1 = 53;
 long previousTime = 0;
 long currentTime = 0;
+uint16_t sequence = 0;
 
 HX711 scale1;
 
+// CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF)
+uint16_t crc16(const uint8_t *data, uint8_t length) {
+  uint16_t crc = 0xFFFF;
+  for (uint8_t i = 0; i < length; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t j = 0; j < 8; j++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(uint32_t timestamp, int32_t loadCell, uint16_t potentiometer) {
+  uint8_t frame[16];
+  frame[0] = 0xAA;
+  frame[1] = 0x55;
+  memcpy(frame + 2, &sequence, 2);  // AVR is little-endian
+  memcpy(frame + 4, &timestamp, 4);
+  memcpy(frame + 8, &loadCell, 4);
+  memcpy(frame + 12, &potentiometer, 2);
+  uint16_t crc = crc16(frame + 2, 12);
+  memcpy(frame + 14, &crc, 2);
+  Serial.write(frame, 16);
+  sequence++;
+}
+
 // the setup routine runs once when you press reset:
 void setup() {
-  // initialize serial communication at 9600 bits per second:
-  Serial.begin(9600);
+  // initialize serial communication at BAUD_RATE bits per second:
+  Serial.begin(BAUD_RATE);
   scale1.begin(SG_DOUT_PIN_1, SG_SCK_PIN_1);
 }
 
 // the loop routine runs over and over again forever:
 void loop() {
+#if BINARY_PROTOCOL
+  long loadCell = scale1.read();  // Waits for the next HX711 conversion (up to 80 SPS)
+  uint32_t timestamp = micros();
+  int potentiometer = analogRead(A0);
+  sendFrame(timestamp, loadCell, potentiometer);
+#else
   currentTime = millis();  // Update currentTime before calculating deltaTime
   unsigned long deltaTime = currentTime - previousTime;
   previousTime = currentTime;
@@ -42,4 +90,5 @@ void loop() {
   Serial.print(" ");
   Serial.println(potentiometer);
   delay(50);  // delay in between reads for stability
+#endif
 }
@@ -0,0 +1,354 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Rendering without a window (same drawing code as the interface)
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import helpers.outils as outils
+import helpers.filters as filters
+from helpers.classes import SampleStore, RunningStats, MassDeflectionPlot, StiffnessPlot, \
+    StreamingPeakFilter, StreamingSmoother, SampleBlockQueue
+
+"""
+File Duties:
+
+Benchmarks of the processing and rendering hot paths (unit conversions,
+manual_find_peaks, the Hampel filter, smooth_with_edges, the ingest of process_data, the frames
+of the plots on the Agg backend and the save/load of result files) for
+history sizes from 1k to 10M samples. For each case and size, the time (best
+of several repetitions) and the peak memory (tracemalloc, separate run) are
+reported.
+
+The results can be saved as a baseline (JSON) and later runs are compared
+with it: a case is flagged as a regression if it is slower (or uses more
+memory) than the baseline by more than the tolerance. Baselines are only
+meaningful on the machine where they were created.
+
+Usage (from the project folder):
+    python benchmarks/run_benchmarks.py                     (compare with benchmarks/baseline.json)
+    python benchmarks/run_benchmarks.py --save-baseline     (create/overwrite the baseline)
+    python benchmarks/run_benchmarks.py --quick             (sizes up to 100k)
+    python benchmarks/run_benchmarks.py --cases smooth find_peaks --sizes 1000 1000000
+"""
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUICK_SIZES = (1_000, 10_000, 100_000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+INGEST_BATCH = 1000  # Samples per ingest (high data rate or replay)
+FRAME_SAMPLES = 10  # New samples per rendered frame
+STEP_SMOOTH = 3
+THRESHOLD_MASS_PEAKS = 50
+DESPIKE_WINDOW = 21
+TMP_DIR = tempfile.TemporaryDirectory(prefix="bench_")  # Result files (removed at exit)
+CHANNELS = outils.default_channels(THRESHOLD_MASS_PEAKS)  # Load cell + potentiometer (as interface.py)
+
+
+# -----------------------------------------------------------------------------
+# Synthetic data (same shape as a real run: increasing load with noise and peaks)
+# -----------------------------------------------------------------------------
+def raw_samples(n, seed=0):
+    """Raw samples (delta_t_us, bits_hx711, bits_potentiometer) as read from the Arduino"""
+    rng = np.random.default_rng(seed)
+    samples = np.empty((n, 3), dtype=np.int64)
+    samples[:, 0] = 12500 + rng.integers(-50, 50, n)
+    samples[:, 1] = np.linspace(0, 5e6, n).astype(np.int64) + rng.integers(-2000, 2000, n)
+    samples[:, 1][rng.random(n) < 0.001] = 2**23  # Outliers
+    samples[:, 2] = np.linspace(100, 900, n).astype(np.int64) + rng.integers(-2, 3, n)
+    return samples
+
+
+def converted(n):
+    t_us, values = outils.convert_channels(raw_samples(n), 0, CHANNELS)
+    return (outils.from_t_us_to_s(t_us), *CHANNELS.totals(values))
+
+
+# -----------------------------------------------------------------------------
+# Cases: setup(n) prepares the data and returns the function to be measured
+# -----------------------------------------------------------------------------
+def case_conversions(n):
+    samples = raw_samples(n)
+    return lambda: outils.convert_channels(samples, 0, CHANNELS)
+
+
+def case_find_peaks(n):
+    _, mass, _ = converted(n)
+    return lambda: outils.manual_find_peaks(mass, THRESHOLD_MASS_PEAKS)
+
+
+def case_despike(n):
+    _, mass, _ = converted(n)
+    return lambda: filters.hampel_mask(mass, DESPIKE_WINDOW, min_deviation=THRESHOLD_MASS_PEAKS)
+
+
+def case_smooth(n):
+    _, mass, _ = converted(n)
+    return lambda: outils.smooth_with_edges(mass, STEP_SMOOTH)
+
+
+def case_ingest(n):
+    """Steps of process_data (interface.py) for n samples arriving in batches"""
+    batches = np.array_split(raw_samples(n), max(1, n // INGEST_BATCH))
+
+    zeros = np.zeros(CHANNELS.n_channels)
+
+    def run():
+        data_queue = SampleBlockQueue()
+        store, stats, t_us_last = SampleStore(CHANNELS.store_columns()), RunningStats(), 0
+        for batch in batches:
+            data_queue.put(batch)
+            samples = data_queue.drain()
+            t_us, values = outils.convert_channels(samples, t_us_last, CHANNELS)
+            t_us_last = int(t_us[-1])
+            t = outils.from_t_us_to_s(t_us)
+            processed = values - zeros
+            mass, deflection = CHANNELS.totals(processed)
+            store.extend_block(CHANNELS.store_block(t, values, processed))
+            stats.update(t, mass, deflection)
+    return run
+
+
+class _Frames:
+    """
+    Class Duties:
+        The plots and streaming filters of interface.py fed with a history of
+        samples. add() runs the same steps as update_mass_deflection_graph and
+        update_stiffness_graph (with smooth_plots = True) on the views of the
+        history, as the interface does on the snapshot of the store.
+    """
+
+    def __init__(self, t, mass, deflection):
+        self.columns = (t, mass, deflection)
+        self.n = 0  # Samples in the history
+        self.fig_left, (ax1, ax2) = plt.subplots(2, 1, figsize=(8, 6))
+        self.fig_right, ax3 = plt.subplots(figsize=(6, 4))
+        self.plot_left = MassDeflectionPlot(self.fig_left, ax1, ax2)
+        self.plot_right = StiffnessPlot(self.fig_right, ax3)
+        self.peak_filter = StreamingPeakFilter(THRESHOLD_MASS_PEAKS, keep_indices=False)
+        self.mass_smoother = StreamingSmoother(STEP_SMOOTH, n_columns=3)
+        self.stiffness_smoother = StreamingSmoother(STEP_SMOOTH, n_columns=2)
+        self.stiffness_n_samples = 0
+
+    def add(self, n_new):
+        """Adds the next n_new samples of the history and updates both plots"""
+        self.n += n_new
+        columns = tuple(values[:self.n] for values in self.columns)  # Views (the snapshot)
+        t, mass, deflection = columns
+
+        # update_mass_deflection_graph: the last sample is provisionally valid (tail)
+        new = slice(self.peak_filter.n, self.n)
+        valid_indices = self.peak_filter.update(mass[new])
+        new_rows = np.column_stack([values[valid_indices] for values in columns])
+        last_sample = slice(self.peak_filter.n - 1, self.peak_filter.n)
+        last_row = np.column_stack([values[last_sample] for values in columns])
+        stable_rows = self.mass_smoother.update(new_rows)
+        tail_rows = self.mass_smoother.tail(last_row)
+        self.plot_left.update(*stable_rows.T, tail=tail_rows.T)
+
+        # update_stiffness_graph
+        new = slice(self.stiffness_n_samples, self.n)
+        self.stiffness_n_samples = self.n
+        stable_rows = self.stiffness_smoother.update(np.column_stack((deflection[new], mass[new])))
+        self.plot_right.update(*stable_rows.T, tail=self.stiffness_smoother.tail().T)
+
+    def draw(self):
+        self.fig_left.canvas.draw()
+        self.fig_right.canvas.draw()
+
+    def close(self):
+        plt.close(self.fig_left)
+        plt.close(self.fig_right)
+
+
+def case_render_history(n):
+    """First frame after a callibration with n samples (bulk update + draw)"""
+    t, mass, deflection = converted(n)
+
+    def run():
+        frames = _Frames(t, mass, deflection)
+        frames.add(n)
+        frames.draw()
+        frames.close()
+    return run
+
+
+def case_render_frame(n):
+    """One live frame (FRAME_SAMPLES new samples + draw) with n samples of history"""
+    n_frames = 1000  # More than the repetitions of measure
+    frames = _Frames(*converted(n + n_frames * FRAME_SAMPLES))
+    frames.add(n)
+    frames.draw()
+
+    def run():
+        if frames.n + FRAME_SAMPLES > len(frames.columns[0]):
+            raise RuntimeError("No new samples left for the frame")
+        frames.add(FRAME_SAMPLES)
+        frames.draw()
+    return run
+
+
+def _results_dict(n):
+    t, mass, deflection = converted(n)
+    return {"time": t, "raw_mass": mass, "raw_deflection": deflection,
+            "processed_mass": mass, "processed_deflection": deflection,
+            "callibration": {"0": {"callibration": {"zero_mass": 0., "zero_deflection": 0.}}}}
+
+
+def _case_results(n, extension, operation):
+    data_dict = _results_dict(n)
+    path = os.path.join(TMP_DIR.name, f"results_{n}{extension}")
+
+    def save():
+        if extension == ".json":  # As save_data_to_file (interface.py) with save_json
+            lists = {name: values.tolist() if isinstance(values, np.ndarray) else values
+                     for name, values in data_dict.items()}
+            with open(path, "w") as f:
+                json.dump(lists, f, indent=4)
+        else:
+            outils.save_results(path, data_dict)
+
+    save()
+
+    def load():
+        data = outils.load_results(path)
+        return [float(np.sum(data[name])) for name in ("time", "raw_mass")]  # Read the values
+    return save if operation == "save" else load
+
+
+def case_save_json(n):
+    return _case_results(n, ".json", "save")
+
+
+def case_load_json(n):
+    return _case_results(n, ".json", "load")
+
+
+def case_save_bcr(n):
+    return _case_results(n, ".bcr", "save")
+
+
+def case_load_bcr(n):
+    return _case_results(n, ".bcr", "load")
+
+
+# name: (setup function, maximum size)
+CASES = {
+    "conversions": (case_conversions, None),
+    "find_peaks": (case_find_peaks, None),
+    "despike": (case_despike, None),
+    "smooth": (case_smooth, None),
+    "ingest": (case_ingest, None),
+    "render_history": (case_render_history, None),
+    "render_frame": (case_render_frame, None),
+    "save_json": (case_save_json, 1_000_000),  # JSON is too slow and large for 10M
+    "load_json": (case_load_json, 1_000_000),
+    "save_bcr": (case_save_bcr, None),
+    "load_bcr": (case_load_bcr, None),
+}
+
+
+# -----------------------------------------------------------------------------
+# Runner
+# -----------------------------------------------------------------------------
+def measure(setup, n, min_time=0.5, max_repeat=20):
+    """
+    Function Duties:
+        Times the function returned by setup(n) (best of several repetitions,
+        repeated until min_time) and its peak memory (tracemalloc, one run
+        without timing since tracing slows it down).
+    Output:
+        time (s) and peak memory (MB)
+    """
+    run = setup(n)
+    times = []
+    while len(times) < max_repeat and (sum(times) < min_time or len(times) < 3):
+        gc.collect()
+        t_ini = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t_ini)
+        if times[-1] > 10 * min_time:  # Slow case: a single run is enough
+            break
+
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 2**20
+
+
+def compare(result, baseline, tolerance, min_mb=1.):
+    """Flags of the metrics that are worse than the baseline by more than tolerance"""
+    flags = []
+    if result["time"] > baseline["time"] * (1 + tolerance):
+        flags.append(f"time x{result['time'] / baseline['time']:.2f}")
+    if result["peak_mb"] > max(baseline["peak_mb"] * (1 + tolerance), min_mb):
+        flags.append(f"memory x{result['peak_mb'] / max(baseline['peak_mb'], 1e-9):.2f}")
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the processing and rendering hot paths")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int)
+    parser.add_argument("--quick", action="store_true", help=f"sizes {QUICK_SIZES}")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown flagged (default 0.25)")
+    parser.add_argument("--output", help="also save the results of this run (JSON)")
+    args = parser.parse_args()
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"[INFO] Comparing with {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    results, regressions = {}, []
+    print(f"{'case':<16}{'size':>11}{'time (ms)':>13}{'peak (MB)':>12}  baseline")
+    for name in args.cases:
+        setup, max_size = CASES[name]
+        for n in sizes:
+            if max_size is not None and n > max_size:
+                continue
+            t, peak = measure(setup, n)
+            key = f"{name}[{n}]"
+            results[key] = {"time": t, "peak_mb": peak}
+            status = ""
+            if key in baseline:
+                flags = compare(results[key], baseline[key], args.tolerance)
+                status = "[REGRESSION] " + ", ".join(flags) if flags else "ok"
+                if flags:
+                    regressions.append(key)
+            print(f"{name:<16}{n:>11}{t * 1000:>13.3f}{peak:>12.2f}  {status}")
+
+    run_info = {"python": platform.python_version(), "numpy": np.__version__,
+                "matplotlib": matplotlib.__version__, "machine": platform.platform(),
+                "processor": platform.processor(), "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "results": results}
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run_info, f, indent=2)
+        print(f"[INFO] Baseline saved in {args.baseline}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run_info, f, indent=2)
+
+    if regressions:
+        print(f"[WARNING] {len(regressions)} regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
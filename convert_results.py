@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import numpy as np
+import helpers.outils as outils
+
+"""
+File Duties:
+
+Converts the JSON result files of a folder (and its subfolders, e.g.
+"backup") to the compact binary format (.bcr, see outils.save_results).
+Each converted file is read back and compared with the original JSON
+(round trip); the .bcr file is only kept if both are identical.
+
+Usage:
+    python convert_results.py [folder]  (default: bridge_contest_results)
+"""
+
+
+def check_round_trip(json_path, bcr_path):
+    """Checks that the .bcr file has exactly the same data as the JSON file"""
+    with open(json_path) as f:
+        original = json.load(f)
+    converted = outils.load_results(bcr_path)
+    if set(original) != set(converted):
+        return False
+    for name, values in original.items():
+        if isinstance(values, list):
+            if not np.array_equal(np.asarray(values, dtype=np.float64), converted[name]):
+                return False
+        elif values != converted[name]:
+            return False
+    return True
+
+
+folder = sys.argv[1] if len(sys.argv) > 1 else "bridge_contest_results"
+
+n_ok, n_failed = 0, 0
+for dir_path, _, file_names in os.walk(folder):
+    for file_name in sorted(file_names):
+        if not file_name.endswith(".json"):
+            continue
+        json_path = os.path.join(dir_path, file_name)
+        bcr_path = os.path.splitext(json_path)[0] + ".bcr"
+        outils.save_results(bcr_path, outils.load_results(json_path))
+
+        if check_round_trip(json_path, bcr_path):
+            n_ok += 1
+            ratio = os.path.getsize(json_path) / os.path.getsize(bcr_path)
+            print(f"[INFO] {json_path} -> {bcr_path} ({ratio:.1f}x smaller)")
+        else:
+            n_failed += 1
+            os.remove(bcr_path)
+            print(f"[ERROR] Round trip failed for {json_path}; not converted")
+
+print(f"[INFO] {n_ok} files converted, {n_failed} failed")
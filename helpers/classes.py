@@ -1,2 +1,1959 @@
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
 
-# to be included here the classes when interface.py is refactored
\ No newline at end of file
+import numpy as np
+
+
+class SampleStore:
+    """
+    Class Duties:
+        Columnar, preallocated storage for the acquired samples (it replaces
+        the raw_time, raw_mass, ... Python lists of interface.py).
+
+        The samples are kept in a single 2-D float64 array of shape
+        (n_columns, capacity), so that each column is contiguous in memory.
+        When the array is full its capacity is doubled (amortized O(1)
+        appends). Rows that have already been written are never modified,
+        so the arrays returned by snapshot() are zero-copy views that remain
+        valid (and consistent) even if the store grows afterwards.
+
+        The oldest samples can be removed from memory with discard() (see
+        TieredRetention); the samples keep their (absolute) indices, i.e.
+        len(store) is the number of samples ever stored and the first one in
+        memory has the index offset.
+
+    Attributes:
+        - columns: names of the stored columns (e.g. "time", "raw_mass")
+        - lock: lock shared by the threads that read/write the store
+        - version: counter increased every time new samples are appended
+        - offset: index of the first sample kept in memory
+    """
+    COLUMNS = ("time", "raw_mass", "raw_deflection",
+               "processed_mass", "processed_deflection")
+
+    def __init__(self, columns=COLUMNS, capacity=4096):
+        self.columns = tuple(columns)
+        self._col_index = {name: i for i, name in enumerate(self.columns)}
+        self._min_capacity = max(int(capacity), 1)
+        self._data = np.empty((len(self.columns), self._min_capacity))
+        self._n = 0  # Samples in memory
+        self.offset = 0
+        self.lock = threading.Lock()
+        self.version = 0
+
+    def __len__(self):
+        return self.offset + self._n
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    def _grow(self, n_required):
+        """Reallocates the buffer (at least doubling its capacity)"""
+        new_capacity = max(2 * self.capacity, n_required)
+        new_data = np.empty((len(self.columns), new_capacity))
+        new_data[:, :self._n] = self._data[:, :self._n]
+        self._data = new_data
+
+    def extend(self, **columns):
+        """
+        Function Duties:
+            Appends a batch of samples to the store.
+        Input:
+            columns: one array-like per stored column, all with the same
+                length (e.g. store.extend(time=[...], raw_mass=[...], ...))
+        """
+        if set(columns) != set(self.columns):
+            raise ValueError(f"Expected columns {self.columns}, got {tuple(columns)}")
+        values = [np.asarray(columns[name], dtype=np.float64).ravel() for name in self.columns]
+        n_new = len(values[0])
+        if any(len(v) != n_new for v in values):
+            raise ValueError("All the columns must have the same length")
+        if n_new == 0:
+            return
+
+        with self.lock:
+            n_end = self._n + n_new
+            if n_end > self.capacity:
+                self._grow(n_end)
+            for i, v in enumerate(values):
+                self._data[i, self._n:n_end] = v
+            self._n = n_end
+            self.version += 1
+
+    def extend_block(self, block):
+        """
+        Function Duties:
+            Appends a batch of samples given as a single 2-D array (all the
+            columns are written at once, e.g. from ChannelRegistry.store_block).
+        Input:
+            block: array of shape (n_columns, n_samples), rows in the order of columns
+        """
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim != 2 or block.shape[0] != len(self.columns):
+            raise ValueError(f"Expected a block of shape ({len(self.columns)}, n), got {block.shape}")
+        n_new = block.shape[1]
+        if n_new == 0:
+            return
+
+        with self.lock:
+            n_end = self._n + n_new
+            if n_end > self.capacity:
+                self._grow(n_end)
+            self._data[:, self._n:n_end] = block
+            self._n = n_end
+            self.version += 1
+
+    def snapshot(self, start=0):
+        """
+        Function Duties:
+            Returns a consistent, read-only view of every column from index
+            start to the last sample stored (no data is copied).
+        Input:
+            start: first index of the view (e.g. the callibration idx_ini);
+                if it has been discarded, the view starts at offset
+        Output:
+            snapshot: dictionary {column name: 1-D read-only array}
+        """
+        with self.lock:
+            block = self._data[:, max(start - self.offset, 0):self._n]
+        block.flags.writeable = False
+        return {name: block[i] for i, name in enumerate(self.columns)}
+
+    def column(self, name, start=0):
+        """Returns a read-only view of a single column from index start"""
+        return self.snapshot(start)[name]
+
+    def last(self, name):
+        """Returns the last value of a column (0 if the store is empty)"""
+        with self.lock:
+            if self._n == 0:
+                return 0.
+            return float(self._data[self._col_index[name], self._n - 1])
+
+    def discard(self, end):
+        """
+        Function Duties:
+            Removes from memory the samples before the index end (the rest
+            keep their indices). The kept samples are copied to a new array,
+            so the views returned before remain valid.
+        """
+        with self.lock:
+            n_discarded = min(end - self.offset, self._n)
+            if n_discarded <= 0:
+                return
+            n_kept = self._n - n_discarded
+            new_data = np.empty((len(self.columns), max(2 * n_kept, self._min_capacity)))
+            new_data[:, :n_kept] = self._data[:, n_discarded:self._n]
+            self._data, self._n = new_data, n_kept
+            self.offset += n_discarded
+            self.version += 1
+
+
+class TieredRetention:
+    """
+    Class Duties:
+        Retention policy of a SampleStore for very long runs (e.g. creep or
+        fatigue tests), so the memory does not grow with the duration:
+            - the last recent_time seconds are kept at full resolution
+            - the older samples are compacted into summaries of bucket_time
+              seconds (min, max and mean of every column, see history)
+            - a sudden load drop (collapse: the load falls drop_fraction
+              below its peak) pins pre_time seconds before and post_time
+              seconds after it at full resolution (see pinned)
+
+        The peak load is the maximum of the minimum of each pair of
+        consecutive samples and a drop needs two consecutive samples below
+        the threshold, so isolated peaks (up or down) are ignored.
+        The store is compacted when it holds 1.5 * recent_time seconds, and
+        only up to limit (e.g. the first sample not written to the
+        acquisition log yet), so the full stream is still written to disk.
+
+    Attributes:
+        - history: SampleStore with a row per bucket (time_ini, time_end,
+          n_samples and <column>_min, <column>_max, <column>_mean)
+        - pinned: list of SampleStore with the full-resolution windows (the
+          samples are copied when they are compacted; the recent ones are
+          still in the store)
+        - events: times of the load drops
+    """
+
+    def __init__(self, store, recent_time=600., bucket_time=1., load_column="processed_mass",
+                 drop_fraction=0.3, min_peak=50., pre_time=30., post_time=30.):
+        self.store = store
+        self.recent_time = recent_time
+        self.bucket_time = bucket_time
+        self.load_column = load_column
+        self.drop_fraction, self.min_peak = drop_fraction, min_peak
+        self.pre_time = min(pre_time, recent_time)  # Older samples may be compacted already
+        self.post_time = post_time
+        self._values = [c for c in store.columns if c != "time"]
+        self.history = SampleStore(["time_ini", "time_end", "n_samples"]
+                                   + [f"{c}_{stat}" for c in self._values for stat in ("min", "max", "mean")])
+        self.pinned = []
+        self.events = []
+        self._windows = []  # (t_ini, t_end, pinned store) of the windows not fully copied yet
+        self.reset(len(store))
+
+    def reset(self, start):
+        """Starts the detection of load drops at the sample start (e.g. after a callibration)"""
+        self._n_checked = start
+        self._last_load = np.nan
+        self._peak = 0.
+        self._event_peak = 0.  # Peak before the last drop (a new drop needs a higher peak)
+
+    def _check_drops(self):
+        data = self.store.snapshot(self._n_checked)
+        t, load = data["time"], data[self.load_column]
+        self._n_checked = len(self.store)
+        if len(load) == 0:
+            return
+        previous = np.concatenate(([self._last_load], load[:-1]))
+        pair_min, pair_max = np.fmin(previous, load), np.fmax(previous, load)  # Sample and previous one
+        self._last_load = load[-1]
+        i = 0
+        while i < len(pair_min):
+            peak = np.maximum.accumulate(np.maximum(pair_min[i:], self._peak))
+            drops = np.flatnonzero((pair_max[i:] < (1 - self.drop_fraction) * peak)
+                                   & (peak >= self.min_peak) & (peak > self._event_peak))
+            if len(drops) == 0:
+                self._peak = peak[-1]
+                return
+            j = i + drops[0]
+            self._peak = self._event_peak = peak[drops[0]]
+            self.events.append(float(t[j]))
+            window = SampleStore(self.store.columns)
+            self.pinned.append(window)
+            self._windows.append((t[j] - self.pre_time, t[j] + self.post_time, window))
+            print(f"[INFO] Load drop at {t[j]:.2f} s (peak {self._peak:.2f} kg): "
+                  f"full resolution kept from {t[j] - self.pre_time:.2f} s to {t[j] + self.post_time:.2f} s")
+            i = j + 1
+
+    def update(self, limit=None):
+        """
+        Function Duties:
+            Checks the new samples for load drops and compacts the samples
+            older than recent_time (only before the index limit).
+        """
+        self._check_drops()
+        store = self.store
+        if len(store) == store.offset:
+            return
+        data = store.snapshot(store.offset)
+        t = data["time"]
+        if t[-1] - t[0] < 1.5 * self.recent_time:
+            return
+        # Complete buckets older than recent_time
+        t_cut = np.floor((t[-1] - self.recent_time) / self.bucket_time) * self.bucket_time
+        n_cut = int(np.searchsorted(t, t_cut))
+        if limit is not None:
+            n_cut = min(n_cut, limit - store.offset)
+        if n_cut <= 0:
+            return
+
+        # Summaries (vectorized: a segment of samples per bucket)
+        block = np.vstack([data[c][:n_cut] for c in store.columns])
+        t_old = t[:n_cut]
+        buckets = np.floor(t_old / self.bucket_time)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        counts = np.diff(np.append(starts, n_cut))
+        values = block[1:]
+        summary = [np.minimum.reduceat(t_old, starts), np.maximum.reduceat(t_old, starts), counts]
+        for v_min, v_max, v_mean in zip(np.minimum.reduceat(values, starts, axis=1),
+                                        np.maximum.reduceat(values, starts, axis=1),
+                                        np.add.reduceat(values, starts, axis=1) / counts):
+            summary += [v_min, v_max, v_mean]
+        self.history.extend_block(np.vstack(summary))
+
+        # Full-resolution windows around the load drops
+        t_last = t_old[-1]
+        for t_ini, t_end, window in self._windows:
+            in_window = (t_old >= t_ini) & (t_old <= t_end)
+            window.extend_block(block[:, in_window])
+        self._windows = [w for w in self._windows if w[1] > t_last]
+
+        store.discard(store.offset + n_cut)
+
+
+class Channel:
+    """
+    Class Duties:
+        A sensor of the acquisition (a column of the samples sent by the
+        Arduino) and its linear conversion from bits to physical units:
+        value = bits * scale + offset (see outils.kg_coefficients and
+        outils.deflection_coefficients). With lut_size, the conversion of
+        the bits within [0, lut_size) is done with a lookup table (ADC).
+
+    Attributes:
+        - name: name of the channel; the store has the columns raw_<name>
+          and processed_<name>
+        - kind: "load" (kg, summed into the total load) or "displacement" (mm)
+        - threshold: isolated peaks larger than it are outliers (None: the
+          channel is not filtered)
+    """
+    KINDS = ("load", "displacement")
+
+    def __init__(self, name, kind, unit, scale, offset=0., lut_size=None, threshold=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Channel kind must be one of {self.KINDS}, got {kind!r}")
+        self.name, self.kind, self.unit = name, kind, unit
+        self.scale, self.offset = float(scale), float(offset)
+        self.lut_size = lut_size
+        self.threshold = threshold
+        self.lut = self.scale * np.arange(lut_size) + self.offset if lut_size else None
+
+    def to_dict(self):
+        return {"name": self.name, "kind": self.kind, "unit": self.unit, "scale": self.scale,
+                "offset": self.offset, "lut_size": self.lut_size, "threshold": self.threshold}
+
+
+class ChannelRegistry:
+    """
+    Class Duties:
+        Registry of the channels of the acquisition (e.g. several load cells
+        and displacement sensors). The raw samples of all the channels are
+        a single 2-D array (n_samples, n_channels) and the conversion, the
+        filtering and the zeros are computed for all the channels at once
+        (vectorized), so adding channels does not add Python work per sample.
+
+        Besides the columns of each channel, the store has the totals used
+        by the plots, the statistics and the result files: raw_mass and
+        processed_mass (sum of the load channels) and raw_deflection and
+        processed_deflection (first displacement channel). With the default
+        channels ("mass" and "deflection") they are the channels themselves,
+        so the store has the same columns as always.
+    """
+
+    def __init__(self, channels=()):
+        self.channels = []
+        for channel in channels:
+            self.register(channel)
+
+    def register(self, channel):
+        """Adds a channel (its column is the next one of the samples)"""
+        if channel.name in self.names:
+            raise ValueError(f"Channel {channel.name!r} already registered")
+        self.channels.append(channel)
+        self.scales = np.array([c.scale for c in self.channels])
+        self.offsets = np.array([c.offset for c in self.channels])
+        self.load_indices = [i for i, c in enumerate(self.channels) if c.kind == "load"]
+        self.displacement_indices = [i for i, c in enumerate(self.channels) if c.kind == "displacement"]
+        return self
+
+    @property
+    def names(self):
+        return [c.name for c in self.channels]
+
+    @property
+    def n_channels(self):
+        return len(self.channels)
+
+    def thresholds(self, default=np.inf):
+        """Outlier threshold of each channel (array)"""
+        return np.array([default if c.threshold is None else c.threshold for c in self.channels],
+                        dtype=np.float64)
+
+    def convert(self, bits):
+        """
+        Function Duties:
+            Converts the raw bits of all the channels at once.
+        Input:
+            bits: int array of shape (n_samples, n_channels)
+        Output:
+            values: float64 array of shape (n_samples, n_channels)
+        """
+        bits = np.asarray(bits)
+        values = bits * self.scales + self.offsets
+        for j, c in enumerate(self.channels):  # Loop over the channels, not the samples
+            if c.lut is not None and bits.dtype.kind in "iu" and len(bits) > 0 \
+                    and bits[:, j].min() >= 0 and bits[:, j].max() < c.lut_size:
+                values[:, j] = c.lut[bits[:, j]]
+        return values
+
+    def to_bits(self, values):
+        """Inverse of convert (rounded to integers)"""
+        return np.rint((np.asarray(values, dtype=np.float64) - self.offsets) / self.scales).astype(np.int64)
+
+    def totals(self, values):
+        """Total load (sum of the load channels) and deflection (first displacement channel)"""
+        values = np.asarray(values)
+        mass = values[:, self.load_indices].sum(axis=1)
+        deflection = values[:, self.displacement_indices[0]] if self.displacement_indices \
+            else np.zeros(len(values))
+        return mass, deflection
+
+    def _totals_stored(self):
+        """True if the totals need their own columns (they are not channels)"""
+        return self.names != ["mass", "deflection"]
+
+    def store_columns(self):
+        """Columns of the SampleStore"""
+        columns = ["time"] + [f"raw_{n}" for n in self.names] + [f"processed_{n}" for n in self.names]
+        if self._totals_stored():
+            columns += ["raw_mass", "raw_deflection", "processed_mass", "processed_deflection"]
+        return tuple(columns)
+
+    def store_block(self, t, raw, processed):
+        """Block (n_columns, n_samples) for SampleStore.extend_block"""
+        rows = [np.asarray(t, dtype=np.float64)[None, :], np.asarray(raw).T, np.asarray(processed).T]
+        if self._totals_stored():
+            rows += [np.vstack(self.totals(raw)), np.vstack(self.totals(processed))]
+        return np.vstack(rows)
+
+    def to_json(self):
+        return json.dumps([c.to_dict() for c in self.channels])
+
+    @classmethod
+    def from_json(cls, text):
+        return cls(Channel(**d) for d in json.loads(text))
+
+
+class SerialReaderStats:
+    """
+    Class Duties:
+        Counters of the serial reader (outils.read_arduino_data_thread):
+        bytes, parsed lines (samples), malformed lines or corrupted frames
+        and dropped frames (gaps in the sequence numbers), plus the reception
+        rates (bytes/s and lines/s) computed over periods of about 1 second.
+    """
+
+    def __init__(self, period=1.0):
+        self.period = period
+        self.n_bytes = 0
+        self.n_lines = 0
+        self.n_malformed = 0
+        self.n_dropped = 0
+        self.decode_time = 0.  # s spent decoding the received data
+        self.bytes_per_second = 0.
+        self.lines_per_second = 0.
+        self._t_ini = time.monotonic()
+        self._n_bytes_ini, self._n_lines_ini = 0, 0
+
+    def update(self, n_bytes, n_lines, n_malformed, n_dropped=0, decode_time=0.):
+        """Adds the counts of a read (called from the reader thread)"""
+        self.decode_time += decode_time
+        self.n_bytes += n_bytes
+        self.n_lines += n_lines
+        self.n_malformed += n_malformed
+        self.n_dropped += n_dropped
+
+        t = time.monotonic()
+        if t - self._t_ini >= self.period:
+            self.bytes_per_second = (self.n_bytes - self._n_bytes_ini) / (t - self._t_ini)
+            self.lines_per_second = (self.n_lines - self._n_lines_ini) / (t - self._t_ini)
+            self._t_ini, self._n_bytes_ini, self._n_lines_ini = t, self.n_bytes, self.n_lines
+
+
+class SampleBlockQueue:
+    """
+    Class Duties:
+        Bounded queue of raw samples between the reader thread and the ingest.
+        The samples are kept in a preallocated int64 array of max_blocks
+        blocks of block_size samples used as a ring, so the memory is fixed.
+        A late drain (e.g. after a slow frame) returns at most capacity
+        samples, except with the "spill" policy: then it also returns all
+        the samples spilled to disk meanwhile.
+
+        When it is full, the policy decides what put does:
+            - "block": it waits until the ingest frees space (backpressure;
+              for sources that can wait, e.g. replays)
+            - "drop_oldest": the oldest samples are discarded (n_dropped)
+            - "spill": the oldest samples are moved to spill_path on disk and
+              returned first by the next drain (nothing is lost)
+
+    Attributes:
+        - n_put, n_dropped, n_spilled: samples put, discarded and spilled to disk
+        - n_blocked: times that put had to wait for space ("block")
+        - high_water: maximum number of samples waiting
+    """
+    POLICIES = ("block", "drop_oldest", "spill")
+
+    def __init__(self, n_fields=3, block_size=1024, max_blocks=256, policy="drop_oldest", spill_path=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Policy must be one of {self.POLICIES}, got {policy!r}")
+        if policy == "spill" and spill_path is None:
+            raise ValueError("The spill policy needs a spill_path")
+        self.n_fields = n_fields
+        self.block_size, self.max_blocks = block_size, max_blocks
+        self.capacity = block_size * max_blocks
+        self.policy = policy
+        self.spill_path = spill_path
+        self._data = np.empty((self.capacity, n_fields), dtype=np.int64)
+        self._start, self._n = 0, 0  # Ring: index of the oldest sample and samples in memory
+        self._spill = None  # Spill file (opened when first needed)
+        self._n_spilled_waiting = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self.n_put, self.n_dropped, self.n_spilled, self.n_blocked = 0, 0, 0, 0
+        self.high_water = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._n + self._n_spilled_waiting
+
+    def _write(self, samples):
+        """Copies samples after the newest one (there must be space)"""
+        i = (self._start + self._n) % self.capacity
+        n_first = min(len(samples), self.capacity - i)
+        self._data[i:i + n_first] = samples[:n_first]
+        self._data[:len(samples) - n_first] = samples[n_first:]
+        self._n += len(samples)
+
+    def _take(self, n):
+        """Removes and returns the n oldest samples in memory"""
+        i = self._start
+        n_first = min(n, self.capacity - i)
+        taken = np.concatenate([self._data[i:i + n_first], self._data[:n - n_first]])
+        self._start, self._n = (i + n) % self.capacity, self._n - n
+        return taken
+
+    def _make_room(self, n):
+        """Frees n samples of memory according to the policy (not "block")"""
+        if self.policy == "drop_oldest":
+            self._start, self._n = (self._start + n) % self.capacity, self._n - n
+            self.n_dropped += n
+            return
+        if self._spill is None:
+            self._spill = open(self.spill_path, "w+b")
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(self._take(n).tobytes())
+        self._n_spilled_waiting += n
+        self.n_spilled += n
+
+    def put(self, samples, timeout=None):
+        """
+        Function Duties:
+            Adds a batch of samples (or a single sample).
+        Input:
+            samples: int array of shape (n_samples, n_fields)
+            timeout: maximum wait for space with the "block" policy (None:
+                no limit); the samples that do not fit in time are dropped
+        """
+        samples = np.asarray(samples, dtype=np.int64).reshape(-1, self.n_fields)
+        with self._changed:
+            i = 0
+            while i < len(samples):
+                n_free = self.capacity - self._n
+                if n_free == 0:
+                    if self.policy != "block":
+                        n_free = min(len(samples) - i, self.capacity)
+                        self._make_room(n_free)
+                    else:
+                        self.n_blocked += 1
+                        if not self._changed.wait_for(lambda: self._n < self.capacity, timeout):
+                            self.n_dropped += len(samples) - i
+                            break
+                        continue
+                chunk = samples[i:i + n_free]
+                self._write(chunk)
+                i += len(chunk)
+                self.n_put += len(chunk)
+                self.high_water = max(self.high_water, self._n + self._n_spilled_waiting)
+                self._changed.notify_all()
+
+    def _drain(self):
+        parts = []
+        if self._n_spilled_waiting > 0:  # Older than the samples in memory
+            self._spill.seek(0)
+            parts.append(np.frombuffer(self._spill.read(), dtype=np.int64).reshape(-1, self.n_fields))
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._n_spilled_waiting = 0
+        parts.append(self._take(self._n))
+        self._changed.notify_all()
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def drain(self):
+        """
+        Function Duties:
+            Retrieves at once all the samples waiting (never blocks).
+        Output:
+            samples: int64 array of shape (n_samples, n_fields)
+        """
+        with self._changed:
+            return self._drain()
+
+    def get(self, timeout=None):
+        """Same as drain, but waits until there is at least one sample (queue.Empty after timeout)"""
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._n + self._n_spilled_waiting > 0, timeout):
+                raise queue.Empty
+            return self._drain()
+
+    def close(self):
+        """Removes the spill file (if any)"""
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                os.remove(self.spill_path)
+                self._spill = None
+
+
+class _StageTimer:
+    """Context manager that adds the elapsed time to a stage of PipelineMetrics"""
+
+    def __init__(self, times):
+        self._times = times
+
+    def __enter__(self):
+        self._t_ini = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._times.append(time.perf_counter() - self._t_ini)
+
+
+class _NullTimer:
+    """Context manager that does nothing (PipelineMetrics disabled)"""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class PipelineMetrics:
+    """
+    Class Duties:
+        Lightweight instrumentation of the live pipeline, to find which stage
+        makes the interface lag (serial reader, process_data, filters,
+        rendering, ...):
+            - timers of each stage: with metrics.timer("stage"): ...
+            - samples ingested per second, effective sensor rate and jitter
+              (standard deviation of the time between samples)
+            - gauges set by the interface (queue depth, parse errors, ...)
+
+        Every report() (e.g. each second) the statistics of the last period
+        are returned as text lines (GUI overlay) and written as a JSON line
+        to the metrics log. When disabled, timer() returns a shared object
+        that does nothing and the other methods return at once, so the
+        instrumentation can stay in the code at almost no cost.
+    """
+
+    def __init__(self, enabled=False, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.gauges = {}
+        self._times = {}
+        self._timers = {}
+        self._n_samples = 0
+        self._deltas = []
+        self._last_time = None
+        self._t_ini = time.monotonic()
+        self._log = open(log_path, "a") if enabled and log_path is not None else None
+
+    def timer(self, stage):
+        """Context manager that measures the time of a stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        if stage not in self._timers:
+            self._times[stage] = []
+            self._timers[stage] = _StageTimer(self._times[stage])
+        return self._timers[stage]
+
+    def add_time(self, stage, seconds):
+        """Adds a time measured elsewhere (e.g. a frame of the animation)"""
+        if self.enabled:
+            self.timer(stage)  # Creates the stage if needed
+            self._times[stage].append(seconds)
+
+    def record_samples(self, t):
+        """Adds the times (s) of the ingested samples (rate and jitter)"""
+        if not self.enabled or len(t) == 0:
+            return
+        t = np.asarray(t, dtype=np.float64)
+        prev = t[0] if self._last_time is None else self._last_time
+        self._deltas.append(np.diff(t, prepend=prev))
+        self._n_samples += len(t)
+        self._last_time = t[-1]
+
+    def report(self):
+        """
+        Function Duties:
+            Statistics since the previous report (they are then restarted).
+        Output:
+            lines: list of text lines (empty if disabled)
+        """
+        if not self.enabled:
+            return []
+        t = time.monotonic()
+        period = max(t - self._t_ini, 1e-9)
+        summary = {"time": time.time(), "period": period,
+                   "samples_per_second": self._n_samples / period, "stages": {}}
+        deltas = np.concatenate([np.empty(0)] + self._deltas)
+        deltas = deltas[deltas > 0]
+        if len(deltas) > 0:
+            summary["sensor_rate"] = 1 / deltas.mean()
+            summary["jitter_ms"] = deltas.std() * 1000
+        for stage, times in self._times.items():
+            if times:
+                summary["stages"][stage] = {"n": len(times), "mean_ms": 1000 * sum(times) / len(times),
+                                            "max_ms": 1000 * max(times),
+                                            "load": sum(times) / period}  # Fraction of the period
+            times.clear()
+        summary.update(self.gauges)
+        self._t_ini, self._n_samples, self._deltas = t, 0, []
+
+        if self._log is not None:
+            self._log.write(json.dumps(summary) + "\n")
+            self._log.flush()
+
+        lines = [f"ingest {summary['samples_per_second']:.0f} samples/s"
+                 + (f" | sensor {summary['sensor_rate']:.1f} Hz, jitter {summary['jitter_ms']:.2f} ms"
+                    if "sensor_rate" in summary else "")]
+        lines += [f"{stage}: {s['mean_ms']:.2f} ms (max {s['max_ms']:.2f}, {100 * s['load']:.0f}%)"
+                  for stage, s in summary["stages"].items()]
+        lines += [" | ".join(f"{name}: {value}" for name, value in self.gauges.items())]
+        return lines
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+class FrameDecoder:
+    """
+    Class Duties:
+        Stateful decoder of the bytes received from the Arduino. The format
+        (binary frames or legacy text lines, see the .ino file) is detected
+        from the first data received (outils.is_binary_stream) and kept
+        afterwards, unless the decoder only gets errors (REDETECT_ERRORS in a
+        row without any sample): then the format is detected again.
+
+        The output are batches of samples (delta_t_us, bits_hx711,
+        bits_potentiometer). For binary frames delta_t is computed from the
+        micros() timestamps (uint32, wraps every ~71 min) and the frames lost
+        are counted from the gaps in the sequence numbers (uint16).
+
+    Attributes:
+        - binary: True/False once the format is detected (None before)
+        - n_fields: fields of the text lines (delta_t plus one per channel,
+          see classes.ChannelRegistry); the binary frames only carry the
+          load cell and the potentiometer (n_fields = 3)
+        - n_frames, n_corrupted, n_dropped: totals of the binary frames
+        - n_new_errors, n_new_dropped: counts of the last decode() call
+        - n_redetections: times that the format was detected again
+    """
+    REDETECT_ERRORS = 20  # Errors in a row (without samples) that mean a wrong format
+
+    def __init__(self, binary=None, n_fields=3):
+        from helpers import outils
+        self._outils = outils
+        self.binary = binary
+        self.n_fields = n_fields
+        self._rest = b""
+        self._last_seq = None
+        self._last_micros = None
+        self.n_frames = 0
+        self.n_corrupted = 0
+        self.n_dropped = 0
+        self.n_new_errors = 0
+        self.n_new_dropped = 0
+        self.n_redetections = 0
+        self._n_errors_in_row = 0
+
+    def decode(self, chunk):
+        """
+        Function Duties:
+            Decodes the new bytes (plus the incomplete data of the previous call).
+        Input:
+            chunk: bytes read from the serial port
+        Output:
+            samples: int64 array of shape (n_samples, n_fields)
+        """
+        samples = self._decode(chunk)
+        if len(samples) > 0:
+            self._n_errors_in_row = 0
+            return samples
+        self._n_errors_in_row += self.n_new_errors
+        if self._n_errors_in_row >= self.REDETECT_ERRORS:
+            print(f"[WARNING] {self._n_errors_in_row} errores seguidos sin datos válidos; "
+                  "se detecta de nuevo el formato de datos")
+            self.binary = None
+            self._last_seq, self._last_micros = None, None
+            self._n_errors_in_row = 0
+            self.n_redetections += 1
+        return samples
+
+    def _decode(self, chunk):
+        """Decodes with the detected format (see decode)"""
+        buffer = self._rest + chunk
+        self.n_new_errors, self.n_new_dropped = 0, 0
+        if self.binary is None:
+            self.binary = self._outils.is_binary_stream(buffer, self.n_fields)
+            if self.binary is None:  # Not enough data to decide yet
+                self._rest = buffer
+                return np.empty((0, self.n_fields), dtype=np.int64)
+            print("[INFO] Formato de datos:", "binario" if self.binary else "texto")
+            if self.binary and self.n_fields != 3:
+                print(f"[ERROR] Las tramas binarias solo tienen 2 canales ({self.n_fields - 1} configurados); "
+                      "use el formato de texto")
+
+        if not self.binary:
+            samples, self._rest, malformed = self._outils.parse_text_lines(buffer, self.n_fields)
+            for line in malformed:
+                print("[ERROR] Formato de datos incorrecto:", line.decode("utf-8", errors="replace"))
+            self.n_new_errors = len(malformed)
+            return samples
+
+        frames, self._rest, n_corrupted = self._outils.decode_binary_frames(buffer)
+        self.n_new_errors = n_corrupted
+        self.n_corrupted += n_corrupted
+        if len(frames) == 0 or self.n_fields != 3:
+            return np.empty((0, self.n_fields), dtype=np.int64)
+
+        seq = frames["seq"].astype(np.int64)
+        micros = frames["micros"].astype(np.int64)
+        prev_seq = seq[0] - 1 if self._last_seq is None else self._last_seq
+        prev_micros = micros[0] if self._last_micros is None else self._last_micros
+        gaps = np.diff(seq, prepend=prev_seq) % 2**16 - 1
+        self.n_new_dropped = int(np.sum(gaps[gaps > 0]))
+        if self.n_new_dropped:
+            print(f"[WARNING] Se han perdido {self.n_new_dropped} tramas")
+        self.n_dropped += self.n_new_dropped
+        self.n_frames += len(frames)
+        self._last_seq, self._last_micros = int(seq[-1]), int(micros[-1])
+
+        samples = np.empty((len(frames), 3), dtype=np.int64)
+        samples[:, 0] = np.diff(micros, prepend=prev_micros) % 2**32
+        samples[:, 1] = frames["hx711"]
+        samples[:, 2] = frames["potentiometer"]
+        return samples
+
+
+class RunningStats:
+    """
+    Class Duties:
+        Aggregates of the processed samples updated at ingest time (each
+        batch is reduced with vectorized operations), so that the live
+        statistics (e.g. maximum load) are available in O(1).
+        It is reset at every new callibration.
+
+    Attributes:
+        - count: number of samples
+        - max_mass, min_mass: maximum and minimum mass (kg)
+        - t_max_mass: time of the maximum mass (s)
+        - deflection_at_max_mass: deflection at the maximum mass (mm)
+        - max_deflection, min_deflection: maximum and minimum deflection (mm)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.max_mass, self.min_mass = -np.inf, np.inf
+        self.t_max_mass, self.deflection_at_max_mass = np.nan, np.nan
+        self.max_deflection, self.min_deflection = -np.inf, np.inf
+
+    def update(self, t, mass, deflection):
+        """
+        Function Duties:
+            Updates the aggregates with a batch of new samples
+        Input:
+            t, mass, deflection: arrays of the same length
+        """
+        if len(mass) == 0:
+            return
+        self.count += len(mass)
+        i_max = np.argmax(mass)
+        if mass[i_max] > self.max_mass:
+            self.max_mass = float(mass[i_max])
+            self.t_max_mass = float(t[i_max])
+            self.deflection_at_max_mass = float(deflection[i_max])
+        self.min_mass = min(self.min_mass, float(np.min(mass)))
+        self.max_deflection = max(self.max_deflection, float(np.max(deflection)))
+        self.min_deflection = min(self.min_deflection, float(np.min(deflection)))
+
+
+class StiffnessEstimator:
+    """
+    Class Duties:
+        Online least-squares estimate of the stiffness (slope of load vs
+        deflection, kg/mm) of the processed samples, updated at ingest time
+        with running sums (O(new samples) per batch):
+            - tangent: slope of the least-squares line of the last window
+              samples (current stiffness)
+            - secant: load / deflection of the mean point of the window
+              (line from the origin)
+
+        The sums of the window are updated adding the new samples and
+        subtracting the ones that leave it (they are recomputed exactly
+        every window updates to avoid the accumulation of rounding errors).
+        Isolated load peaks are discarded (StreamingPeakFilter, one sample
+        of delay). It is reset at every new callibration.
+    """
+
+    def __init__(self, window=50, threshold=50):
+        self.window = max(int(window), 2)
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self._filter = StreamingPeakFilter(self.threshold, keep_indices=False)
+        self._pending = np.empty((0, 2))  # Last sample (its filter status is not final yet)
+        self._buffer = np.empty((0, 2))  # Samples of the window (deflection, mass)
+        self._origin = None  # First sample: the sums are relative to it (less rounding errors)
+        self._sums = np.zeros(5)  # n, Sx, Sy, Sxx, Sxy of the window
+        self._n_updates = 0
+        self.tangent = self.secant = float("nan")
+
+    @staticmethod
+    def _moments(rows):
+        x, y = rows[:, 0], rows[:, 1]
+        return np.array([len(rows), x.sum(), y.sum(), (x * x).sum(), (x * y).sum()])
+
+    @staticmethod
+    def _slope(sums):
+        n, sx, sy, sxx, sxy = sums
+        denominator = n * sxx - sx * sx
+        if n < 2 or denominator <= 1e-12 * max(n * sxx, 1e-300):  # No deflection range
+            return float("nan")
+        return float((n * sxy - sx * sy) / denominator)
+
+    def update(self, deflection, mass):
+        """
+        Function Duties:
+            Adds a batch of processed samples and updates the estimates
+        Input:
+            deflection, mass: arrays of the new samples (mm, kg)
+        """
+        new = np.column_stack((np.asarray(deflection, dtype=np.float64), np.asarray(mass, dtype=np.float64)))
+        if len(new) == 0:
+            return
+        rows = np.vstack((self._pending, new))
+        first = self._filter.n - len(self._pending)  # Filter index of rows[0]
+        valid = self._filter.update(new[:, 1]) - first
+        self._pending = rows[-1:]
+        rows = rows[valid]
+        if len(rows) == 0:
+            return
+        if self._origin is None:
+            self._origin = rows[0].copy()
+        rows = rows - self._origin
+
+        joined = np.vstack((self._buffer, rows))
+        leaving = joined[:max(len(joined) - self.window, 0)]
+        self._buffer = joined[len(leaving):]
+        self._n_updates += 1
+        if len(rows) >= self.window or self._n_updates % self.window == 0:
+            self._sums = self._moments(self._buffer)  # Exact sums
+        else:
+            self._sums += self._moments(rows) - self._moments(leaving)
+
+        self.tangent = self._slope(self._sums)
+        mean_x, mean_y = self._sums[1:3] / self._sums[0] + self._origin
+        self.secant = float(mean_y / mean_x) if mean_x > 0 else float("nan")
+
+
+class ZeroCallibration:
+    """
+    Class Duties:
+        Non-blocking callibration of the zero offsets (mass and deflection),
+        driven by the timestamps of the samples instead of waiting on the GUI
+        thread. States:
+            - IDLE: nothing to do
+            - COLLECTING: the samples of the next duration seconds (from the
+              last sample when started) are collected as they are ingested
+            - DONE: the zeros are computed once a sample reaches the end of
+              the window; the samples after it belong to the measurement
+
+        The zeros of all the channels are computed at once (vectorized): they
+        are the mean of the collected samples without outliers, i.e. the
+        samples where any channel has an isolated peak (outils.find_peaks_mask)
+        or is further than its threshold from its median are discarded. If
+        no sample is left (the load changed during the window), only the
+        peaks are discarded and unstable is set: the callibration should be
+        repeated.
+    """
+    IDLE, COLLECTING, DONE = "idle", "collecting", "done"
+
+    def __init__(self, duration=5.0, thresholds=(50, np.inf)):
+        self.duration = duration
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)  # One per channel (inf: no filter)
+        self.state = self.IDLE
+        self.t_ini, self.t_end = None, None
+        self.zeros = np.zeros(len(self.thresholds))
+        self.n_samples = 0
+        self.unstable = False  # The last window had no stable samples (see _compute_zeros)
+        self._chunks = []
+
+    @property
+    def collecting(self):
+        return self.state == self.COLLECTING
+
+    def start(self, t_now):
+        """Starts collecting the samples after t_now (time of the last sample, s)"""
+        self.state = self.COLLECTING
+        self.t_ini, self.t_end = t_now, t_now + self.duration
+        self._chunks = []
+
+    def remaining(self, t_now):
+        """Seconds of samples still to be collected"""
+        return max(0., self.t_end - t_now) if self.collecting else 0.
+
+    def update(self, t, values):
+        """
+        Function Duties:
+            Adds a batch of ingested samples while collecting.
+        Input:
+            t: times of the new samples (s)
+            values: converted samples, shape (n_samples, n_channels)
+        Output:
+            None while collecting (or idle); when the window is completed,
+            the index (in this batch) of the first sample after it
+        """
+        if not self.collecting or len(t) == 0:
+            return None
+        t = np.asarray(t)
+        i0, i1 = np.searchsorted(t, [self.t_ini, self.t_end], side="right")
+        self._chunks.append(np.asarray(values, dtype=np.float64)[i0:i1])
+        if t[-1] < self.t_end:
+            return None
+        self._compute_zeros()
+        return int(i1)
+
+    def _compute_zeros(self):
+        values = np.vstack([np.empty((0, len(self.thresholds)))] + self._chunks)
+        self._chunks = []
+        self.n_samples = len(values)
+        self.state = self.DONE
+        self.unstable = False
+        if len(values) == 0:
+            return  # No samples (keep the previous zeros)
+
+        from helpers.outils import find_peaks_mask
+        valid = ~find_peaks_mask(values, self.thresholds).any(axis=1)
+        if not valid.any():
+            valid[:] = True
+        deviation = np.abs(values - np.median(values[valid], axis=0))
+        stable = valid & (deviation <= self.thresholds).all(axis=1)
+        # No sample close to the median (e.g. the load was placed in the middle of the
+        # window): the zeros are the mean without peaks and a new callibration is needed
+        self.unstable = not stable.any()
+        self.zeros = values[valid if self.unstable else stable].mean(axis=0)
+
+
+class StreamingPeakFilter:
+    """
+    Class Duties:
+        Incremental version of outils.manual_find_peaks: a sample is an
+        outlier (isolated peak) if it differs more than threshold from both
+        the previous and the next samples.
+
+        The samples are added in batches with update(), which only checks
+        the new samples: the status of a sample is final once the next one
+        is known (one-sample lookahead), so only the last two values are
+        kept. The last sample is provisionally valid (as in
+        manual_find_peaks, which never marks the last sample as outlier).
+    """
+
+    def __init__(self, threshold, keep_indices=True):
+        self.threshold = threshold
+        self.keep_indices = keep_indices  # False: valid_indices() is not available (bounded memory)
+        self.n = 0  # Number of samples added
+        self._prev, self._last = np.nan, np.nan  # Last two samples
+        self._valid_chunks = []  # Indices of the (final) valid samples
+
+    def update(self, values):
+        """
+        Function Duties:
+            Adds new samples and checks the ones whose status becomes final
+        Input:
+            values: new samples (e.g. mass)
+        Output:
+            valid_indices: indices (counted from the first sample added) of
+                the samples that are now known to be valid
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # w[1:-1] are the samples to be checked: the previous last sample
+        # (if any) and the new ones except the last
+        head = [self._prev, self._last] if self.n > 0 else [np.nan]
+        w = np.concatenate((head, values))
+        diff = np.abs(np.diff(w))
+        with np.errstate(invalid="ignore"):
+            outliers = (diff[:-1] > self.threshold) & (diff[1:] > self.threshold)
+        first = self.n - 1 if self.n > 0 else 0
+        valid_indices = first + np.flatnonzero(~outliers)
+
+        self.n += len(values)
+        self._prev, self._last = w[-2], w[-1]
+        if self.keep_indices:
+            self._valid_chunks.append(valid_indices)
+        return valid_indices
+
+    def valid_indices(self):
+        """Indices of all the valid samples (same result as outils.manual_find_peaks)"""
+        last = [np.array([self.n - 1])] if self.n > 0 else []
+        return np.concatenate([np.empty(0, dtype=np.int64)] + self._valid_chunks + last)
+
+
+class StreamingSmoother:
+    """
+    Class Duties:
+        Incremental version of outils.smooth_with_edges (moving average of
+        step samples) for series that grow over time, applied to several
+        columns at once (e.g. time, mass and deflection).
+
+        It reproduces the smoothed series plotted in interface.py, i.e.
+        smooth_with_edges(x, step)[step:]: the first values are moving
+        averages of step samples (computed with running sums) and the last
+        step values use the progressive average of the edges. Each update()
+        only returns the new values that will not change anymore, and
+        tail() returns the last (provisional) ones, so the cost per update
+        depends on the number of new samples and not on the run length.
+    """
+
+    def __init__(self, step, n_columns=1):
+        self.step = max(int(step), 1)
+        self.n = 0  # Number of samples added
+        self.n_output = 0  # Number of (stable) values returned by update()
+        self._buffer = np.empty((0, n_columns))  # Last 2 * step samples
+
+    def _window(self, values):
+        """Buffer + new samples (2-D) and global index of its first row"""
+        values = np.asarray(values, dtype=np.float64).reshape(len(values), self._buffer.shape[1])
+        return np.vstack((self._buffer, values)), self.n - len(self._buffer)
+
+    def update(self, values):
+        """
+        Function Duties:
+            Adds new samples and returns the new stable smoothed values
+        Input:
+            values: array of shape (n_samples, n_columns)
+        Output:
+            smoothed: array of shape (n_stable_new, n_columns)
+        """
+        w, base = self._window(values)
+        self.n += len(w) - len(self._buffer)
+        self._buffer = w[-2 * self.step:]
+
+        # Output k is the average of samples k..k+step-1; it is stable once
+        # it is not one of the last step values (n > k + 2 * step)
+        k = np.arange(self.n_output, max(self.n - 2 * self.step, self.n_output)) - base
+        self.n_output = max(self.n - 2 * self.step, self.n_output)
+        cumsum = np.vstack((np.zeros((1, w.shape[1])), np.cumsum(w, axis=0)))
+        return (cumsum[k + self.step] - cumsum[k]) / self.step
+
+    def tail(self, provisional=None):
+        """
+        Function Duties:
+            Returns the last smoothed values (the ones that may still change),
+            i.e. the values after the ones returned by update()
+        Input:
+            provisional: samples not added yet but to be included (e.g. the
+                last sample of a StreamingPeakFilter), shape (n, n_columns)
+        Output:
+            smoothed: array of shape (n_tail, n_columns)
+        """
+        if provisional is None:
+            provisional = ()
+        w, base = self._window(provisional)
+        n, step = base + len(w), self.step
+        if n <= step:  # Too few samples: not smoothed (as smooth_with_edges)
+            return w
+        if n <= 2 * step:
+            return w[step:]
+
+        cumsum = np.vstack((np.zeros((1, w.shape[1])), np.cumsum(w, axis=0)))
+        # Moving average of the samples not returned by update() yet
+        k = np.arange(self.n_output, n - 2 * step) - base
+        middle = (cumsum[k + step] - cumsum[k]) / step
+        # Edges: progressive average of the samples k+1..n-1
+        k = np.arange(n - 2 * step, n - step) - base
+        edges = (cumsum[-1] - cumsum[k + 1]) / (len(w) - k - 1)[:, None]
+        return np.vstack((middle, edges))
+
+
+def _expand_limits(limits, data_min, data_max, min_pad, headroom=0.2):
+    """
+    Function Duties:
+        Checks whether the data leaves the current axis limits and, if so,
+        returns new (expanded) limits; otherwise returns None.
+    Input:
+        limits: current (lower, upper) limits of the axis
+        data_min, data_max: range of the data to be shown
+        min_pad: (lower, upper) minimum margins added when expanding
+        headroom: extra margin (fraction of the data span) so that the
+            limits do not need to be changed again in the next frames
+    Output:
+        new_limits: (lower, upper) or None if the data fits in the view
+    """
+    lower, upper = limits
+    if data_min >= lower and data_max <= upper:
+        return None
+    span = (data_max - data_min) * headroom
+    if data_min < lower:
+        lower = data_min - max(min_pad[0], span)
+    if data_max > upper:
+        upper = data_max + max(min_pad[1], span)
+    return lower, upper
+
+
+class StreamingDecimator:
+    """
+    Class Duties:
+        Min/max decimation of a growing series (x, y) for the live plots.
+
+        The samples are grouped in buckets of bucket_size consecutive
+        samples and each complete bucket is reduced (vectorized) to its
+        minimum and maximum points, which are kept and never recomputed.
+        Only the newest (incomplete) bucket is recomputed in each frame.
+        When there are more than max_buckets buckets, consecutive pairs of
+        buckets are merged and bucket_size is doubled, so the number of
+        plotted points stays around 2 * max_buckets for any run length.
+
+        Only samples that will not change anymore must be added with
+        extend(); the last (provisional) samples can be passed to points().
+    """
+
+    def __init__(self, max_buckets=1000):
+        self.max_buckets = max(int(max_buckets), 1)
+        self.bucket_size = 1
+        self.n_input = 0  # Number of samples added with extend()
+        # Completed buckets: 2 points each (first and second extreme in time)
+        self._x = np.empty((0, 2))
+        self._y = np.empty((0, 2))
+        # Samples of the incomplete bucket
+        self._x_open = np.empty(0)
+        self._y_open = np.empty(0)
+
+    @staticmethod
+    def _reduce(x, y):
+        """Reduces each row (bucket) of x, y to its min and max points in time order"""
+        i_min, i_max = y.argmin(axis=1), y.argmax(axis=1)
+        i_first = np.minimum(i_min, i_max)[:, None]
+        i_second = np.maximum(i_min, i_max)[:, None]
+        idx = np.hstack((i_first, i_second))
+        return np.take_along_axis(x, idx, axis=1), np.take_along_axis(y, idx, axis=1)
+
+    def extend(self, x, y):
+        """
+        Function Duties:
+            Adds new (already stable) samples to the decimated series
+        Input:
+            x, y: arrays of the same length
+        """
+        x = np.concatenate((self._x_open, np.asarray(x, dtype=np.float64)))
+        y = np.concatenate((self._y_open, np.asarray(y, dtype=np.float64)))
+        self.n_input += len(x) - len(self._x_open)
+
+        n_full = len(y) // self.bucket_size
+        n_used = n_full * self.bucket_size
+        if n_full > 0:
+            x_new, y_new = self._reduce(x[:n_used].reshape(n_full, -1), y[:n_used].reshape(n_full, -1))
+            self._x = np.vstack((self._x, x_new))
+            self._y = np.vstack((self._y, y_new))
+        self._x_open, self._y_open = x[n_used:], y[n_used:]
+
+        while len(self._y) > self.max_buckets:
+            self._merge()
+
+    def _merge(self):
+        """Merges consecutive pairs of complete buckets (bucket_size is doubled)"""
+        n_pairs = len(self._y) // 2
+        x_pairs = self._x[:2 * n_pairs].reshape(n_pairs, 4)
+        y_pairs = self._y[:2 * n_pairs].reshape(n_pairs, 4)
+        x_new, y_new = self._reduce(x_pairs, y_pairs)
+        self._x = np.vstack((x_new, self._x[2 * n_pairs:]))
+        self._y = np.vstack((y_new, self._y[2 * n_pairs:]))
+        self.bucket_size *= 2
+
+    def points(self, tail_x=(), tail_y=()):
+        """
+        Function Duties:
+            Returns the decimated series
+        Input:
+            tail_x, tail_y: provisional last samples (plotted as they are)
+        Output:
+            x, y: arrays to be plotted
+        """
+        x, y = [self._x.ravel()], [self._y.ravel()]
+        if len(self._y_open) > 0:
+            x_open, y_open = self._reduce(self._x_open[None, :], self._y_open[None, :])
+            x.append(x_open.ravel())
+            y.append(y_open.ravel())
+        x.append(np.asarray(tail_x, dtype=np.float64))
+        y.append(np.asarray(tail_y, dtype=np.float64))
+        return np.concatenate(x), np.concatenate(y)
+
+
+class ScatterGridDecimator:
+    """
+    Class Duties:
+        Fixed-size view of a growing scatter (x, y) for the live plots: the
+        view (axis limits) is divided in a grid of n_cells x n_cells cells
+        and only the first point that falls in each cell is kept, so the
+        shape of the cloud is kept in both directions (also the extremes of
+        x) and the number of points is bounded by the grid, not by the
+        number of samples.
+
+        New points are binned with vectorized operations (only the new
+        ones); when the limits change, the kept points are binned again
+        with the new cell size (few points, so it is cheap).
+    """
+
+    def __init__(self, n_cells=200):
+        self.n_cells = max(int(n_cells), 1)
+        self.n_input = 0
+        self._limits = None
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._keys = np.empty(0, dtype=np.int64)  # Sorted keys of the occupied cells
+
+    def _cell_keys(self, x, y):
+        (x0, x1), (y0, y1) = self._limits
+        ix = np.floor((x - x0) / ((x1 - x0) / self.n_cells))
+        iy = np.floor((y - y0) / ((y1 - y0) / self.n_cells))
+        # Points out of the view (they will be binned again when the limits grow)
+        ix = np.clip(ix, -2**20, 2**20).astype(np.int64) + 2**20
+        iy = np.clip(iy, -2**20, 2**20).astype(np.int64) + 2**20
+        return ix * 2**22 + iy
+
+    def _select(self, x, y, keys):
+        """Keeps the first point of each cell not occupied yet"""
+        keys_new, first = np.unique(keys, return_index=True)
+        free = ~np.isin(keys_new, self._keys, assume_unique=True)
+        first = np.sort(first[free])
+        self._x = np.concatenate((self._x, x[first]))
+        self._y = np.concatenate((self._y, y[first]))
+        self._keys = np.union1d(self._keys, keys_new[free])
+
+    def set_limits(self, xlim, ylim, n_cells=None):
+        """Sets the current view (and grid); the kept points are binned again if it changed"""
+        limits = (tuple(map(float, xlim)), tuple(map(float, ylim)))
+        n_cells = self.n_cells if n_cells is None else max(int(n_cells), 1)
+        if limits == self._limits and n_cells == self.n_cells:
+            return
+        self._limits, self.n_cells = limits, n_cells
+        x, y = self._x, self._y
+        self._x, self._y, self._keys = np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+        if len(x) > 0:
+            self._select(x, y, self._cell_keys(x, y))
+
+    def extend(self, x, y):
+        """
+        Function Duties:
+            Adds new (already stable) points; set_limits() must have been called
+        Input:
+            x, y: arrays of the same length
+        """
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        self.n_input += len(x)
+        if len(x) > 0:
+            self._select(x, y, self._cell_keys(x, y))
+
+    def points(self, tail_x=(), tail_y=()):
+        """Kept points plus the provisional last ones (plotted as they are)"""
+        return (np.concatenate((self._x, np.asarray(tail_x, dtype=np.float64))),
+                np.concatenate((self._y, np.asarray(tail_y, dtype=np.float64))))
+
+
+def _axis_pixels(ax):
+    """Width of an axis in pixels (number of buckets for the decimation)"""
+    return max(int(ax.bbox.width), 100)
+
+
+def _decimate(decimator, n_buckets, x, y, tail_x, tail_y):
+    """Adds the new stable samples to a StreamingDecimator and returns its points"""
+    decimator.max_buckets = n_buckets
+    decimator.extend(x, y)
+    return decimator.points(tail_x, tail_y)
+
+
+class MassDeflectionPlot:
+    """
+    Class Duties:
+        Live "mass vs time" and "deflection vs time" plots (a single figure
+        with 2 axes).
+
+        The artists (lines, titles, labels and legends) are created once and
+        each frame only updates the line data with set_data(). The layout is
+        computed once (and again only when the figure is resized) and the
+        axis limits are only changed when the data leaves the current view;
+        in that case the figure background is redrawn so that the blitting
+        of FuncAnimation caches the new ticks.
+
+        The lines are decimated (StreamingDecimator) to about 2 points per
+        pixel of the axis width.
+    """
+    default_xlim = (0, 60)
+    default_ylim_mass = (-2, 500)
+    default_ylim_deflection = (-5, 5)
+
+    def __init__(self, fig, ax1, ax2):
+        self.fig, self.ax1, self.ax2 = fig, ax1, ax2
+
+        self.line_mass, = ax1.plot([], [], label="Célula de carga", color="blue")
+        ax1.set_title("Carga Aplicada")
+        ax1.set_xlabel("Tiempo (s)")
+        ax1.set_ylabel("Masa (kg)")
+        ax1.legend(loc="upper left")
+
+        self.line_deflection, = ax2.plot([], [], label="Potenciómetro", color="red")
+        ax2.set_title("Flecha en Centro de Vano")
+        ax2.set_xlabel("Tiempo (s)")
+        ax2.set_ylabel("Flecha (mm)")
+        ax2.legend(loc="upper left")
+
+        self.artists = (self.line_mass, self.line_deflection)
+        self.idx_ini = None  # First store index shown (the view is reset when it changes)
+        self.version = None  # Version of the last data shown (nothing to do if unchanged)
+        self.reset()
+        fig.tight_layout()
+        fig.canvas.mpl_connect("resize_event", lambda event: fig.tight_layout())
+
+    def reset(self):
+        """Restores the default limits (e.g. when a new callibration starts)"""
+        for ax in (self.ax1, self.ax2):
+            ax.set_xlim(self.default_xlim)
+        self.ax1.set_ylim(self.default_ylim_mass)
+        self.ax2.set_ylim(self.default_ylim_deflection)
+        self._fit_to_data = True
+        self._decimator_mass = StreamingDecimator(_axis_pixels(self.ax1))
+        self._decimator_deflection = StreamingDecimator(_axis_pixels(self.ax2))
+
+    def update(self, t, mass, deflection, tail=((), (), ())):
+        """
+        Function Duties:
+            Updates the lines with the new data (arrays of the same length)
+        Input:
+            t, mass, deflection: new samples since the last update (they
+                must not change anymore; they are stored in the decimators)
+            tail: (t, mass, deflection) last samples that may still change
+                in the next frames (plotted but not stored)
+        Output:
+            artists: tuple of updated artists (required for blitting)
+        """
+        t_mass, mass = _decimate(self._decimator_mass, _axis_pixels(self.ax1),
+                                 t, mass, tail[0], tail[1])
+        t_deflection, deflection = _decimate(self._decimator_deflection, _axis_pixels(self.ax2),
+                                             t, deflection, tail[0], tail[2])
+        self.line_mass.set_data(t_mass, mass)
+        self.line_deflection.set_data(t_deflection, deflection)
+        if len(t_mass) == 0:
+            return self.artists
+        t = t_mass  # First and last times are kept by the decimation
+
+        if self._fit_to_data:
+            # First data after a reset: same limits as the original plots
+            self._fit_to_data = False
+            new_limits = [
+                (self.ax1.set_xlim, (t[0], max(t[-1], t[0] + self.default_xlim[1]))),
+                (self.ax2.set_xlim, (t[0], max(t[-1], t[0] + self.default_xlim[1]))),
+                (self.ax1.set_ylim, (min(mass.min(), -2), mass.max() + 50)),
+                (self.ax2.set_ylim, (min(deflection.min(), -5), deflection.max() + 5)),
+            ]
+        else:
+            new_limits = [
+                (self.ax1.set_xlim, _expand_limits(self.ax1.get_xlim(), t[0], t[-1], (0, 10))),
+                (self.ax2.set_xlim, _expand_limits(self.ax2.get_xlim(), t[0], t[-1], (0, 10))),
+                (self.ax1.set_ylim, _expand_limits(self.ax1.get_ylim(), mass.min(), mass.max(), (2, 50))),
+                (self.ax2.set_ylim, _expand_limits(self.ax2.get_ylim(), deflection.min(),
+                                                   deflection.max(), (1, 5))),
+            ]
+
+        rescaled = False
+        for set_limits, limits in new_limits:
+            if limits is not None:
+                set_limits(limits)
+                rescaled = True
+        if rescaled:
+            self.fig.canvas.draw()  # new background (animated artists are not drawn)
+
+        return self.artists
+
+
+class StiffnessPlot:
+    """
+    Class Duties:
+        Live "load vs deflection" scatter plot. As in MassDeflectionPlot, the
+        artists are created once and only the scatter offsets are updated
+        in each frame (set_offsets()). The points are decimated with a grid
+        of the view (ScatterGridDecimator, about one point every
+        pixels_per_cell pixels), so the cost of a frame does not grow with
+        the length of the run.
+    """
+    pixels_per_cell = 4
+    default_xlim = (0, 5)
+    default_ylim = (0, 20)
+
+    def __init__(self, fig, ax):
+        self.fig, self.ax = fig, ax
+
+        self.scatter = ax.scatter([], [], label="Rigidez", color="black")
+        ax.set_title("Flecha vs Carga")
+        ax.set_xlabel("Flecha (mm)")
+        ax.set_ylabel("Carga (kg)")
+        ax.legend(loc="lower right")
+
+        self.artists = (self.scatter,)
+        self.idx_ini = None  # First store index shown (the view is reset when it changes)
+        self.version = None  # Version of the last data shown (nothing to do if unchanged)
+        self.reset()
+        fig.tight_layout()
+        fig.canvas.mpl_connect("resize_event", lambda event: fig.tight_layout())
+
+    def reset(self):
+        """Restores the default limits (e.g. when a new callibration starts)"""
+        self.ax.set_xlim(self.default_xlim)
+        self.ax.set_ylim(self.default_ylim)
+        self._decimator = ScatterGridDecimator(_axis_pixels(self.ax) // self.pixels_per_cell)
+        self._decimator.set_limits(self.ax.get_xlim(), self.ax.get_ylim())
+
+    def update(self, deflection, mass, tail=((), ())):
+        """
+        Function Duties:
+            Updates the scatter points (arrays of the same length)
+        Input:
+            deflection, mass: new samples since the last update (they must
+                not change anymore; they are stored in the decimator)
+            tail: (deflection, mass) last samples that may still change
+        Output:
+            artists: tuple of updated artists (required for blitting)
+        """
+        # Limits first (the grid of the decimator depends on them)
+        new_x = np.concatenate((np.asarray(deflection, dtype=np.float64), np.asarray(tail[0], dtype=np.float64)))
+        new_y = np.concatenate((np.asarray(mass, dtype=np.float64), np.asarray(tail[1], dtype=np.float64)))
+        x_limits = y_limits = None
+        if len(new_x) > 0:
+            # Lower limits are fixed to 0 (as in the original plot)
+            x_limits = _expand_limits(self.ax.get_xlim(), 0, new_x.max(), (0, 5))
+            y_limits = _expand_limits(self.ax.get_ylim(), 0, new_y.max(), (0, 20))
+        if x_limits is not None:
+            self.ax.set_xlim(x_limits)
+        if y_limits is not None:
+            self.ax.set_ylim(y_limits)
+
+        self._decimator.set_limits(self.ax.get_xlim(), self.ax.get_ylim(),
+                                   _axis_pixels(self.ax) // self.pixels_per_cell)
+        self._decimator.extend(deflection, mass)
+        self.scatter.set_offsets(np.column_stack(self._decimator.points(tail[0], tail[1])))
+
+        if x_limits is not None or y_limits is not None:
+            self.fig.canvas.draw()  # new background (animated artists are not drawn)
+        return self.artists
+
+
+class AcquisitionLog:
+    """
+    Class Duties:
+        Append-only binary log of a measurement, written incrementally while
+        the samples arrive (it replaces the full JSON backups). It can be
+        read with outils.read_acquisition_log, which also recovers the data
+        of a truncated log (e.g. after a crash).
+
+    File format (little-endian):
+        - Header: MAGIC (8 bytes), version (uint16), metadata length (uint32)
+          and metadata (JSON with the column names and other information)
+        - Chunks: kind (4 bytes), payload length (uint32), number of rows
+          (uint32), CRC32 of the payload (uint32) and payload:
+            - b"DATA": float64 samples, shape (n_rows, n_columns)
+            - b"JSON": JSON object (e.g. the callibration dictionary)
+            - b"END_": empty; the log was closed properly
+
+        Every chunk is written at once and flushed; os.fsync is only called
+        every fsync_interval seconds (and when closing) to batch disk syncs.
+    """
+    MAGIC = b"BRIDGLOG"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHI")
+    CHUNK_HEADER = struct.Struct("<4sIII")
+
+    def __init__(self, path, columns, metadata=None, fsync_interval=2.0):
+        self.path = path
+        self.columns = tuple(columns)
+        self.fsync_interval = fsync_interval
+        self.n_rows = 0
+        self._lock = threading.Lock()
+
+        metadata = json.dumps({"columns": self.columns, **(metadata or {})}).encode("utf-8")
+        self._file = open(path, "wb")
+        self._file.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(metadata)) + metadata)
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def _write_chunk(self, kind, payload, n_rows=0):
+        header = self.CHUNK_HEADER.pack(kind, len(payload), n_rows, zlib.crc32(payload))
+        with self._lock:
+            self._file.write(header + payload)
+            self._file.flush()
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def write_samples(self, columns):
+        """
+        Function Duties:
+            Appends a chunk of samples to the log
+        Input:
+            columns: dictionary {column name: array}, all with the same length
+        """
+        block = np.column_stack([np.asarray(columns[name], dtype="<f8") for name in self.columns])
+        if len(block) == 0:
+            return
+        self._write_chunk(b"DATA", block.tobytes(), len(block))
+        self.n_rows += len(block)
+
+    def write_json(self, obj):
+        """Appends a JSON chunk (e.g. {"callibration": callibration_dict})"""
+        self._write_chunk(b"JSON", json.dumps(obj).encode("utf-8"))
+
+    def close(self):
+        """Writes the end mark, syncs the file to disk and closes it"""
+        self._write_chunk(b"END_", b"")
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+
+class _ServerClient:
+    """Connection of a viewer to the SampleServer, with its own bounded queue of messages"""
+
+    def __init__(self, conn, max_queued):
+        self.conn = conn
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.n_dropped = 0
+
+    def put(self, message):
+        """Never blocks: if the viewer is too slow, its oldest message is dropped"""
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.n_dropped += 1
+                except queue.Empty:
+                    pass
+
+
+class SampleServer:
+    """
+    Class Duties:
+        Publishes the live samples through a local socket (TCP, e.g.
+        ("127.0.0.1", 5757), or a Unix socket path) to any number of viewers
+        (operator screen, projector, scoreboard; see acquisition_server.py).
+        Publishing never waits for the viewers: each one has its own bounded
+        queue of messages and sender thread, and the oldest messages of a
+        viewer that does not keep up are dropped (counted in n_dropped).
+
+    Wire format (little-endian, the framing of AcquisitionLog):
+        - On connection: MAGIC (8 bytes), version (uint16), metadata length
+          (uint32) and metadata (JSON with the column names and other information)
+        - Messages: kind (4 bytes), payload length (uint32), number of rows
+          (uint32), CRC32 of the payload (uint32) and payload:
+            - b"DATA": float64 samples, shape (n_rows, n_columns)
+            - b"JSON": JSON object (e.g. a callibration)
+            - b"END_": empty; the server is closing
+        The viewers can send text commands, one per line (e.g. b"callibrate\n"),
+        which are passed to on_command (called from the connection thread).
+    """
+    MAGIC = b"BRIDGNET"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHI")
+    CHUNK_HEADER = struct.Struct("<4sIII")
+
+    def __init__(self, address, columns, metadata=None, max_queued=256, on_command=None):
+        self.columns = tuple(columns)
+        self.max_queued = max_queued
+        self.on_command = on_command
+        metadata = json.dumps({"columns": self.columns, **(metadata or {})}).encode("utf-8")
+        self._header = self.HEADER.pack(self.MAGIC, self.VERSION, len(metadata)) + metadata
+        self._clients = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._n_dropped_closed = 0
+
+        if isinstance(address, str):  # Unix socket
+            if os.path.exists(address):
+                os.unlink(address)  # Left by a previous server
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(address)
+        self._sock.listen(8)
+        self.address = self._sock.getsockname()  # Actual port if 0 was requested
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    @property
+    def n_clients(self):
+        with self._lock:
+            return len(self._clients)
+
+    @property
+    def n_dropped(self):
+        """Messages dropped for slow viewers (all the connections)"""
+        with self._lock:
+            return self._n_dropped_closed + sum(c.n_dropped for c in self._clients)
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+                conn.sendall(self._header)  # Small: fits in the socket buffer
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            client = _ServerClient(conn, self.max_queued)
+            with self._lock:
+                self._clients.append(client)
+            threading.Thread(target=self._send_loop, args=(client,), daemon=True).start()
+            threading.Thread(target=self._command_loop, args=(client,), daemon=True).start()
+
+    def _send_loop(self, client):
+        while True:
+            message = client.queue.get()
+            if message is None:
+                break
+            try:
+                client.conn.sendall(message)
+            except OSError:  # The viewer disconnected
+                break
+        self._remove(client)
+
+    def _command_loop(self, client):
+        try:
+            for line in client.conn.makefile("rb"):
+                command = line.decode("utf-8", errors="replace").strip()
+                if command and self.on_command is not None:
+                    self.on_command(command)
+        except OSError:
+            pass
+        client.put(None)  # Viewer disconnected: stop its sender
+
+    def _remove(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+                self._n_dropped_closed += client.n_dropped
+        try:
+            client.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        client.conn.close()
+
+    def _publish(self, kind, payload, n_rows=0):
+        message = self.CHUNK_HEADER.pack(kind, len(payload), n_rows, zlib.crc32(payload)) + payload
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(message)
+
+    def publish_samples(self, rows):
+        """
+        Function Duties:
+            Sends a batch of samples to all the viewers
+        Input:
+            rows: array of shape (n_samples, n_columns), columns in the order of columns
+        """
+        rows = np.ascontiguousarray(rows, dtype="<f8")
+        if len(rows) == 0:
+            return
+        self._publish(b"DATA", rows.tobytes(), len(rows))
+
+    def publish_json(self, obj):
+        """Sends a JSON message (e.g. {"callibration": ...}) to all the viewers"""
+        self._publish(b"JSON", json.dumps(obj).encode("utf-8"))
+
+    def close(self):
+        """Sends the end mark to the viewers and closes the server"""
+        self._publish(b"END_", b"")
+        self._closed = True
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(None)
+        self._sock.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class SampleSubscriber:
+    """
+    Class Duties:
+        Viewer side of SampleServer: connects to the server, reads the
+        metadata (columns) and receives its messages (see acquisition_viewer.py).
+    """
+
+    def __init__(self, address, timeout=None):
+        if isinstance(address, str):  # Unix socket
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(address)
+        else:
+            self._sock = socket.create_connection(address, timeout)
+        self._file = self._sock.makefile("rb")
+
+        magic, version, meta_len = SampleServer.HEADER.unpack(self._read(SampleServer.HEADER.size))
+        if magic != SampleServer.MAGIC:
+            raise ValueError(f"{address} is not a sample server")
+        self.metadata = json.loads(self._read(meta_len))
+        self.columns = tuple(self.metadata["columns"])
+
+    def _read(self, n_bytes):
+        data = self._file.read(n_bytes)
+        if len(data) < n_bytes:
+            raise ConnectionError("Connection closed by the server")
+        return data
+
+    def receive(self):
+        """
+        Function Duties:
+            Waits for the next message of the server
+        Output:
+            kind, content: ("DATA", {column name: array}), ("JSON", object)
+                or ("END_", None) when the server closes
+        """
+        try:
+            kind, n_bytes, n_rows, crc = SampleServer.CHUNK_HEADER.unpack(self._read(SampleServer.CHUNK_HEADER.size))
+            payload = self._read(n_bytes)
+        except ConnectionError:
+            return "END_", None
+        if zlib.crc32(payload) != crc:
+            raise ValueError("Corrupted message")
+        kind = kind.decode("ascii")
+        if kind == "DATA":
+            rows = np.frombuffer(payload, dtype="<f8").reshape(n_rows, len(self.columns))
+            return kind, {name: rows[:, i] for i, name in enumerate(self.columns)}
+        if kind == "JSON":
+            return kind, json.loads(payload)
+        return kind, None
+
+    def send_command(self, command):
+        """Sends a text command to the server (e.g. "callibrate")"""
+        self._sock.sendall(command.encode("utf-8") + b"\n")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+class SharedRingBuffer:
+    """
+    Class Duties:
+        Ring buffer of samples in shared memory (multiprocessing.shared_memory),
+        used to pass the samples from the acquisition process (acquisition.py)
+        to the GUI without locks: there is a single writer and the readers
+        never block it.
+
+    Memory layout:
+        - Header: int64 [write_count, capacity, n_columns, stop_flag,
+          target_count]
+        - Data: float64 array of shape (capacity, n_columns); the sample
+          number k is stored in the row k % capacity
+
+        The writer announces the count it is writing up to (target_count),
+        copies the rows and then increments write_count, so the readers only
+        see complete rows. After copying, a reader checks target_count again
+        and discards the rows that the writer may have overwritten meanwhile.
+        A reader that falls behind more than capacity samples loses the
+        oldest ones (they are counted).
+    """
+    HEADER_SIZE = 5
+
+    def __init__(self, name=None, capacity=2**20, n_columns=3):
+        from multiprocessing import shared_memory  # Only needed with acquisition_process (slow import)
+        create = name is None
+        n_bytes = 8 * (self.HEADER_SIZE + capacity * n_columns)
+        if create:
+            self._shm = shared_memory.SharedMemory(create=True, size=n_bytes)
+        else:
+            self._shm = self._attach(name)
+        self.owner = create
+        self._header = np.ndarray((self.HEADER_SIZE,), dtype=np.int64, buffer=self._shm.buf)
+        if create:
+            self._header[:] = (0, capacity, n_columns, 0, 0)
+        self.capacity, self.n_columns = int(self._header[1]), int(self._header[2])
+        self._data = np.ndarray((self.capacity, self.n_columns), dtype=np.float64,
+                                buffer=self._shm.buf, offset=8 * self.HEADER_SIZE)
+        self.read_count = int(self._header[0])  # Readers start with the new samples
+        self.n_lost = 0
+
+    @staticmethod
+    def _attach(name):
+        """Opens an existing block; only its owner must destroy it at exit"""
+        from multiprocessing import shared_memory
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+        except TypeError:
+            shm = shared_memory.SharedMemory(name=name)
+            if os.name == "posix":  # Otherwise the resource tracker destroys it at exit
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            return shm
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def write_count(self):
+        return int(self._header[0])
+
+    def write(self, rows):
+        """
+        Function Duties:
+            Appends the rows (array of shape (n, n_columns)); only the writer
+            process may call it.
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.n_columns)
+        count = int(self._header[0]) + len(rows)
+        kept = rows[-self.capacity:]  # Only the last capacity rows fit
+        self._header[4] = count  # The readers discard the rows overwritten from now on
+        self._data[np.arange(count - len(kept), count) % self.capacity] = kept
+        self._header[0] = count  # Publish the rows once they are written
+
+    def read(self):
+        """
+        Function Duties:
+            Returns the rows written since the previous call (a copy).
+        Output:
+            rows: float64 array of shape (n, n_columns)
+        """
+        count = int(self._header[0])
+        start = max(self.read_count, count - self.capacity)
+        rows = self._data[np.arange(start, count) % self.capacity]
+        # Rows overwritten by the writer while they were copied (including a
+        # write in progress, up to target_count) are discarded and counted as lost
+        first_valid = min(int(self._header[4]) - self.capacity, count)
+        if first_valid > start:
+            rows = rows[first_valid - start:]
+            start = first_valid
+        self.n_lost += start - self.read_count
+        self.read_count = count
+        return rows
+
+    def request_stop(self):
+        """Asks the writer process to finish"""
+        self._header[3] = 1
+
+    @property
+    def stop_requested(self):
+        return bool(self._header[3])
+
+    def close(self):
+        """Releases the shared memory (it is also destroyed by its owner)"""
+        del self._header, self._data
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
@@ -0,0 +1,139 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+"""
+File Duties:
+
+Robust offline filters to clean the results of a run (e.g. process_results.py).
+Unlike outils.manual_find_peaks (isolated single-sample peaks larger than a
+fixed threshold), they detect bursts of up to window // 2 consecutive samples
+and the Hampel filter adapts its threshold to the local noise level.
+
+All the filters return a boolean mask of the outliers of one column, so the
+same mask can be applied to all the columns of the run:
+    valid = ~filters.hampel_mask(data["processed_mass"])
+    time, mass, deflection = data["time"][valid], ...
+
+The rolling windows are strided views of the data (no copies) processed in
+chunks of CHUNK_SIZE samples, so the memory stays bounded for runs of
+millions of samples.
+"""
+
+CHUNK_SIZE = 2**16  # Samples per chunk of the rolling windows
+MAD_TO_SIGMA = 1.4826  # Standard deviation of normal noise = 1.4826 * MAD
+
+
+def _check_window(window):
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"The window must be an odd number of samples >= 3, got {window}")
+    return window // 2
+
+
+def rolling_median(values, window=21, chunk_size=CHUNK_SIZE):
+    """
+    Function Duties:
+        Centered rolling median. At the edges the window is truncated (median
+        of the samples available), so a spike at the first or last sample is
+        not repeated as padding and it is still detected.
+    Input:
+        values: 1-D array
+        window: odd number of samples of the window
+        chunk_size: samples processed at once (bounds the memory)
+    Output:
+        median: array with the median of the window around each sample
+    """
+    half = _check_window(window)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    median = np.empty(n)
+    for i in np.r_[0:min(half, n), max(n - half, half):n]:  # Edges (at most 2 * half samples)
+        median[i] = np.median(values[max(i - half, 0):i + half + 1])
+    for i in range(half, n - half, chunk_size):
+        windows = sliding_window_view(values[i - half:min(i + chunk_size, n - half) + half], window)
+        median[i:i + len(windows)] = np.partition(windows, half, axis=1)[:, half]
+    return median
+
+
+def rolling_mad(values, window=21, median=None):
+    """
+    Function Duties:
+        Local noise level: median absolute deviation (MAD) of the residuals
+        (values - rolling median). It is computed in consecutive blocks of
+        window samples (the noise level changes slowly), so only the median
+        needs a sliding window.
+    Input:
+        values: 1-D array
+        window: odd number of samples of the window
+        median: rolling_median(values, window) if already computed
+    Output:
+        mad: array with the MAD of the block of each sample
+    """
+    _check_window(window)
+    values = np.asarray(values, dtype=np.float64)
+    if median is None:
+        median = rolling_median(values, window)
+    residuals = np.abs(values - median)
+    n_full = len(values) // window * window
+    mad = np.empty(len(values))
+    blocks = residuals[:n_full].reshape(-1, window)
+    mad[:n_full] = np.repeat(np.partition(blocks, window // 2, axis=1)[:, window // 2], window)
+    if n_full < len(values):  # Last incomplete block
+        mad[n_full:] = np.median(residuals[n_full:])
+    return mad
+
+
+def hampel_mask(values, window=21, n_sigmas=3., min_deviation=0.):
+    """
+    Function Duties:
+        Hampel filter: a sample is an outlier if it differs from the rolling
+        median more than n_sigmas times the local noise (1.4826 * rolling_mad)
+        and more than min_deviation (needed where the signal is flat and the
+        noise is nearly 0).
+    Input:
+        values: 1-D array
+        window: odd number of samples of the window (bursts of up to
+            window // 2 samples are detected)
+        n_sigmas: threshold in standard deviations of the local noise
+        min_deviation: minimum deviation of an outlier (units of values)
+    Output:
+        outliers: boolean array (True for the outliers)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    median = rolling_median(values, window)
+    threshold = np.maximum(n_sigmas * MAD_TO_SIGMA * rolling_mad(values, window, median), min_deviation)
+    return np.abs(values - median) > threshold
+
+
+def mad_mask(values, window=21, n_sigmas=5., min_deviation=0.):
+    """
+    Function Duties:
+        Same as hampel_mask with a single noise level for the whole run (MAD
+        of all the residuals); better when the noise is constant and the
+        spikes are frequent.
+    Input:
+        values: 1-D array
+        window: odd number of samples of the rolling median
+        n_sigmas: threshold in standard deviations of the noise
+        min_deviation: minimum deviation of an outlier (units of values)
+    Output:
+        outliers: boolean array (True for the outliers)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    residuals = values - rolling_median(values, window)
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    mad = np.median(np.abs(residuals - np.median(residuals)))
+    return np.abs(residuals) > max(n_sigmas * MAD_TO_SIGMA * mad, min_deviation)
+
+
+def median_mask(values, window=21, threshold=50.):
+    """
+    Function Duties:
+        A sample is an outlier if it differs from the rolling median more
+        than a fixed threshold (as manual_find_peaks, but also for bursts of
+        up to window // 2 samples).
+    Output:
+        outliers: boolean array (True for the outliers)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.abs(values - rolling_median(values, window)) > threshold
@@ -1,13 +1,17 @@
-
 import time
-import serial
 import datetime
+import json
+import os
+import struct
+import threading
+import zlib
 import numpy as np
 
-def from_bits_to_deflection(bits):
+def deflection_coefficients():
     """
     Function Duties:
-        Converts potentiometer bits to deflection (mm)
+        Computes the coefficients of the (affine) conversion from
+        potentiometer bits to deflection (mm): deflection = scale * bits + offset
 
     Potentiometer:
         It provides an output electric current ranging from I0 to If;
@@ -28,6 +32,8 @@ def from_bits_to_deflection(bits):
         The arduino analog pin has an integrated ADC which converts the
         voltage from 0 to Vcc to a digital value from 0 to 2^n_bits - 1
         - n_bits: 10 (Arduino ADC)
+    Output:
+        scale, offset: mm per bit and deflection (mm) for 0 bits
     """
     # Potentiometer characteristics
     L = 500  # mm
@@ -42,18 +48,21 @@ def from_bits_to_deflection(bits):
     n_bits = 10  # 10-bit ADC (Arduino ADC)
     bits_max = 2**n_bits - 1  # Maximum value for 10 bits
 
-    # Deflection obtention
-    V = bits * Vcc / bits_max  # from bits to voltage
-    I = V / R  # Ohm's Law
-    deflection = (I * 1000 - I0) / (If - I0) * L  # Linear response; 1000 conversion A -> mA
+    # Deflection obtention:
+    # V = bits * Vcc / bits_max  (from bits to voltage)
+    # I = V / R  (Ohm's Law)
+    # deflection = (I * 1000 - I0) / (If - I0) * L  (linear response; 1000 conversion A -> mA)
+    scale = Vcc / bits_max / R * 1000 / (If - I0) * L
+    offset = -I0 / (If - I0) * L
 
-    return deflection  # mm
+    return scale, offset
 
 
-def from_bits_to_kg(bits):
+def kg_coefficients():
     """
     Function Duties:
-        Converts the bits measured by the HX711 to kg.
+        Computes the coefficients of the (affine) conversion from HX711
+        bits to kg: kg = scale * bits + offset
 
     Load Cell:
         It provides an output voltage ranging from 0 mV to
@@ -70,6 +79,8 @@ def from_bits_to_kg(bits):
         - Gain: 128
         - sensitivity_hx711: 20 mV
         - inverted_sign: the connection may be inverted; if so, the sign is inverted
+    Output:
+        scale, offset: kg per bit and kg for 0 bits
     """
     # Load cell characteristics
     sensitivity = 2  # mV/V (load cell)
@@ -84,15 +95,23 @@ def from_bits_to_kg(bits):
     hx711_V_range = gain * sensitivity_hx711 * 0.001  # V (positive and negative values)
     inverted_sign = False
 
-    # Weight obtention
-    V = bits * hx711_V_range / bits_max  # amplified measured V
-    V = V / gain  # original V (before gain)
-    kg = V * 1000 / (sensitivity * Vcc) * max_load  # Load cell has a linear response
+    # Weight obtention (load cell has a linear response):
+    # V = bits * hx711_V_range / bits_max  (amplified measured V)
+    # V = V / gain  (original V, before gain)
+    # kg = V * 1000 / (sensitivity * Vcc) * max_load
+    scale = hx711_V_range / bits_max / gain * 1000 / (sensitivity * Vcc) * max_load
+    offset = 0.
 
     if inverted_sign:
-        kg = -kg
+        scale = -scale
+
+    return scale, offset
+
 
-    return kg
+# Conversion coefficients (computed once, not in every conversion)
+KG_SCALE, KG_OFFSET = kg_coefficients()
+DEFLECTION_SCALE, DEFLECTION_OFFSET = deflection_coefficients()
+DEFLECTION_ADC_SIZE = 2**10  # 10-bit ADC of the potentiometer (lookup table of its channel)
 
 
 def from_t_ms_to_s(t_ms):
@@ -100,73 +119,459 @@ def from_t_ms_to_s(t_ms):
     return t_ms / 1000
 
 
+def from_t_us_to_s(t_us):
+    """Converts time from us (from arduinio, see convert_channels) to s"""
+    return t_us / 1000000
+
+
+def default_channels(threshold_mass_peaks=50):
+    """
+    Function Duties:
+        Channels of the standard setup: a load cell (HX711, "mass") and the
+        potentiometer ("deflection"), with the conversions of kg_coefficients
+        and deflection_coefficients.
+    Output:
+        channels: classes.ChannelRegistry
+    """
+    from helpers.classes import Channel, ChannelRegistry
+    return ChannelRegistry([
+        Channel("mass", "load", "kg", KG_SCALE, KG_OFFSET, threshold=threshold_mass_peaks),
+        Channel("deflection", "displacement", "mm", DEFLECTION_SCALE, DEFLECTION_OFFSET,
+                lut_size=DEFLECTION_ADC_SIZE)])
+
 
-def connect_arduino(port, baud_rate):
+def convert_channels(samples, t_us_last, channels):
+    """
+    Function Duties:
+        Converts a batch of raw samples (from the acquisition queue) to
+        physical units; all the channels are converted at once (see
+        classes.ChannelRegistry.convert). The time is accumulated in integer
+        us (no drift due to float sums).
+    Input:
+        samples: int array of shape (n_samples, 1 + n_channels) with the
+            columns delta_t (us) and the bits of each channel
+        t_us_last: time (integer us) of the last sample already converted
+        channels: classes.ChannelRegistry
+    Output:
+        t_us: int64 array with the time of each sample (us)
+        values: array of shape (n_samples, n_channels) in physical units
+    """
+    t_us = t_us_last + np.cumsum(samples[:, 0], dtype=np.int64)
+    return t_us, channels.convert(samples[:, 1:])
+
+
+def parse_socket_address(text):
+    """
+    Function Duties:
+        Address of a SampleServer given as text: "host:port" (TCP) or the
+        path of a Unix socket.
+    Output:
+        (host, port) tuple or path
+    """
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return text
+
+
+def connect_arduino(port, baud_rate, ready_timeout=3.0, n_fields=3):
     """
     Function Duties:
         Establish a serial connection and return the Serial object.
+        The Arduino resets when the port is opened; instead of waiting a
+        fixed time, the connection is ready as soon as the first valid data
+        arrives (see wait_arduino_ready).
     Input: (check .ino file to see the port and baud rate)
         port: COM port where the Arduino is connected
-        baud_rate: communication speed (e.g. 9600)
+        baud_rate: communication speed (e.g. 115200)
+        ready_timeout: maximum time waiting for the first valid data (s)
+        n_fields: fields of each sample (delta_t plus one per channel)
     Output:
         ser: Serial object or None if the connection fails
     """
+    import serial  # Only needed with the Arduino (not in simulated or replay runs)
     try:
-        ser = serial.Serial(port, baud_rate, timeout=1)
+        ser = serial.Serial(port, baud_rate, timeout=0.1)
         print(f"[INFO] Conectado a {port}")
-        time.sleep(2)  # Wait for Arduino to be ready
-        return ser
     except serial.SerialException:
         print(f"[ERROR] No se pudo abrir el puerto {port}")
         return None  # No active connection
 
+    t_ini = time.monotonic()
+    if wait_arduino_ready(ser, ready_timeout, n_fields):
+        print(f"[INFO] Arduino listo ({time.monotonic() - t_ini:.2f} s)")
+    else:
+        print(f"[WARNING] No se han recibido datos válidos del Arduino en {ready_timeout} s")
+    ser.timeout = 1
+    return ser
 
-def read_arduino_data_thread(ser, data_queue) -> None:
+
+def wait_arduino_ready(ser, timeout=3.0, n_fields=3):
     """
     Function Duties:
-        Continuously reads data from Arduino and stores it in a queue.
+        Reads the serial port until the first valid sample (a binary frame
+        with a correct CRC or a complete text line) arrives. The bytes read
+        (boot messages, first samples) are discarded; the measurement always
+        starts later, with a callibration.
     Input:
-        ser: Serial object
-        data_queue: Queue to store the data
+        ser: Serial object (with a short timeout)
+        timeout: maximum waiting time (s)
+        n_fields: fields of each sample (delta_t plus one per channel)
     Output:
-        None (it will be in a thread)
+        ready: True if valid data was received
     """
-    while True:
-        if ser.in_waiting > 0:  # Check if data is available
+    buffer = b""
+    t_end = time.monotonic() + timeout
+    while time.monotonic() < t_end:
+        buffer += ser.read(max(1, ser.in_waiting))
+        binary = is_binary_stream(buffer, n_fields)
+        if binary:  # At least a frame with a correct CRC
+            return True
+        if binary is False:
+            # The first line may be incomplete (the port was opened in the middle)
+            samples, _, _ = parse_text_lines(buffer[buffer.find(b"\n") + 1:], n_fields)
+            if len(samples) > 0:
+                return True
+    return False
+
+
+def parse_text_lines(buffer, n_fields=3):
+    """
+    Function Duties:
+        Parses the complete lines of text received from the Arduino
+        ("deltaTime loadCell potentiometer" per line, or "deltaTime ch1 ... chN"
+        with several channels) all at once.
+    Input:
+        buffer: bytes received (it may end with an incomplete line)
+        n_fields: fields of a valid line (delta_t plus one per channel)
+    Output:
+        samples: int64 array of shape (n_samples, n_fields); delta_t is given in us
+            (the text format sends ms) as with the binary frames
+        rest: bytes of the last incomplete line (to be parsed with the next data)
+        malformed: list of the lines that could not be parsed
+    """
+    lines = buffer.split(b"\n")
+    rest = lines.pop()  # Incomplete line (empty if buffer ends with a new line)
+    fields = [line.split() for line in lines]
+    fields = [f for f in fields if f]  # Skip empty lines
+    malformed = [b" ".join(f) for f in fields if len(f) != n_fields]
+    fields = [f for f in fields if len(f) == n_fields]
+    if not fields:
+        return np.empty((0, n_fields), dtype=np.int64), rest, malformed
+
+    try:  # Fast path: all the lines are valid
+        samples = np.array(fields).astype(np.int64)
+    except (ValueError, OverflowError):  # Find the invalid lines (not numbers or out of the int64 range)
+        valid = []
+        for f in fields:
             try:
-                data = ser.readline().decode('utf-8').strip()
-                if data:
-                    delta_t, bits_hx711, bits_potentiometer = data.split()
-                    # Store data in queue
-                    data_queue.put(
-                        (int(delta_t), int(bits_hx711), int(bits_potentiometer)))
-            except ValueError:
-                print("[ERROR] Formato de datos incorrecto:", data)
-                continue  # Skip bad data
+                valid.append(np.array([int(x) for x in f], dtype=np.int64))
+            except (ValueError, OverflowError):
+                malformed.append(b" ".join(f))
+        samples = np.array(valid, dtype=np.int64).reshape(-1, n_fields)
+    samples[:, 0] *= 1000  # ms -> us
+    return samples, rest, malformed
+
+
+# Binary frames sent by the Arduino (see the .ino file): sync bytes, uint16
+# sequence, uint32 micros, int32 HX711 reading, uint16 potentiometer reading
+# and the CRC-16/CCITT-FALSE of the 12 bytes between the sync and the CRC
+FRAME_SYNC = b"\xaa\x55"
+FRAME_SIZE = 16
+FRAME_DTYPE = np.dtype([("sync", "<u2"), ("seq", "<u2"), ("micros", "<u4"),
+                        ("hx711", "<i4"), ("potentiometer", "<u2"), ("crc", "<u2")])
+FORMAT_PROBE_SIZE = 512  # Bytes without a valid frame after which the stream is taken as text
+
+
+def _crc16_table():
+    """Lookup table of CRC-16/CCITT-FALSE (polynomial 0x1021) for each byte"""
+    crc = np.arange(256, dtype=np.uint32) << 8
+    for _ in range(8):
+        crc = np.where(crc & 0x8000, (crc << 1) ^ 0x1021, crc << 1) & 0xFFFF
+    return crc.astype(np.uint16)
 
 
+CRC16_TABLE = _crc16_table()
+
+
+def crc16_ccitt(data):
+    """
+    Function Duties:
+        Computes the CRC-16/CCITT-FALSE of several messages at once.
+    Input:
+        data: uint8 array of shape (n_messages, n_bytes)
+    Output:
+        crc: uint16 array with the CRC of each message
+    """
+    crc = np.full(data.shape[0], 0xFFFF, dtype=np.uint16)
+    for j in range(data.shape[1]):  # Loop over the bytes, vectorized over the messages
+        crc = (crc << 8) ^ CRC16_TABLE[(crc >> 8) ^ data[:, j]]
+    return crc
+
 
-def simulated_data_thread(data_queue) -> None:
+def decode_binary_frames(buffer):
+    """
+    Function Duties:
+        Finds and decodes all the binary frames in the buffer at once. Every
+        sync position is a candidate frame; candidates whose CRC does not match
+        (corrupted frames or sync bytes inside the data) are discarded.
+    Input:
+        buffer: bytes received (it may start with garbage and end with an
+            incomplete frame)
+    Output:
+        frames: structured array (FRAME_DTYPE) with the valid frames
+        rest: bytes after the last valid frame that may still contain the
+            start of a frame (to be decoded with the next data)
+        n_corrupted: number of candidate frames discarded due to their CRC
+            that do not overlap a valid frame
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    n = len(data) - FRAME_SIZE + 1
+    if n <= 0:
+        return np.empty(0, dtype=FRAME_DTYPE), buffer, 0
+    start = np.flatnonzero((data[:n] == FRAME_SYNC[0]) & (data[1:n + 1] == FRAME_SYNC[1]))
+    raw = data[start[:, None] + np.arange(FRAME_SIZE)]
+    crc = raw[:, -2].astype(np.uint16) | (raw[:, -1].astype(np.uint16) << 8)
+    valid = crc16_ccitt(raw[:, 2:-2]) == crc
+    # Candidates starting inside a previous valid frame are data bytes
+    start_valid = start[valid]
+    overlap = np.zeros(len(start_valid), dtype=bool)
+    overlap[1:] = np.diff(start_valid) < FRAME_SIZE
+    frames = raw[valid][~overlap].copy().view(FRAME_DTYPE).reshape(-1)
+
+    # Discarded candidates overlapping a decoded frame are sync bytes inside its data, not corrupted frames
+    start_frames = start_valid[~overlap]
+    start_invalid = start[~valid]
+    i = np.searchsorted(start_frames, start_invalid)
+    after = np.append(start_frames, np.iinfo(np.int64).max)[i] - start_invalid < FRAME_SIZE
+    before = start_invalid - np.insert(start_frames, 0, np.iinfo(np.int64).min // 2)[i] < FRAME_SIZE
+    n_corrupted = int(np.count_nonzero(~(after | before)))
+
+    end = int(start_frames[-1]) + FRAME_SIZE if len(frames) else 0
+    end = max(end, len(buffer) - FRAME_SIZE + 1)  # Keep a possible incomplete frame
+    return frames, buffer[end:], n_corrupted
+
+
+def is_binary_stream(buffer, n_fields=3):
+    """
+    Function Duties:
+        Detects whether the Arduino sends binary frames or the legacy text
+        lines. A frame with a correct CRC means binary. Binary data can also
+        contain new line bytes, so text needs at least 2 complete lines that
+        are all valid samples (the first line is skipped, the stream may
+        start in the middle of it). Without a valid frame in
+        FORMAT_PROBE_SIZE bytes, the stream is taken as text.
+    Input:
+        buffer: bytes received
+        n_fields: fields of a valid text line (delta_t plus one per channel)
+    Output:
+        True (binary), False (text) or None (not enough data to decide)
+    """
+    frames, _, _ = decode_binary_frames(buffer)
+    if len(frames) > 0:
+        return True
+    samples, _, malformed = parse_text_lines(buffer[buffer.find(b"\n") + 1:], n_fields)
+    if len(samples) >= 2 and not malformed:
+        return False
+    if len(buffer) >= FORMAT_PROBE_SIZE:
+        return False
+    return None
+
+
+def read_arduino_data_thread(ser, data_queue, stats=None, capture_path=None, n_fields=3) -> None:
+    """
+    Function Duties:
+        Continuously reads data from Arduino and stores it in a queue.
+        The thread blocks in ser.read() until data arrives (no busy waiting)
+        and then reads all the bytes available, so many samples are decoded
+        at once and put in the queue as a single batch (array of samples).
+        Both the binary frames and the legacy text lines are supported (the
+        format is detected from the first data, see classes.FrameDecoder).
+    Input:
+        ser: Serial object (its timeout limits how long each read blocks)
+        data_queue: Queue to store the data
+        stats: classes.SerialReaderStats to count bytes, samples and errors (optional)
+        capture_path: file where all the received bytes are also written, so
+            that the stream can be replayed later (replay_data_thread)
+        n_fields: fields of each sample (delta_t plus one per channel)
+    Output:
+        None (it will be in a thread)
+    """
+    import serial
+    from helpers.classes import FrameDecoder
+    decoder = FrameDecoder(n_fields=n_fields)
+    capture = open(capture_path, "ab") if capture_path is not None else None
+    while True:
+        try:
+            # Blocks until 1 byte arrives (or timeout) and then takes all the available ones
+            chunk = ser.read(max(1, ser.in_waiting))
+        except serial.SerialException as e:
+            print("[ERROR] Error de lectura del puerto serie:", e)
+            return
+        if not chunk:
+            continue
+        if capture is not None:
+            capture.write(chunk)
+            capture.flush()
+
+        t_ini = time.perf_counter()
+        samples = decoder.decode(chunk)
+        if stats is not None:
+            stats.update(len(chunk), len(samples), decoder.n_new_errors, decoder.n_new_dropped,
+                         time.perf_counter() - t_ini)
+        if len(samples) > 0:
+            data_queue.put(samples)  # Store data in queue (batch)
+
+
+def simulated_data_thread(data_queue, n_channels=2) -> None:
     """
     Function Duties:
         Continuously reads data from Arduino and stores it in a queue.
     Input:
         ser: Serial object
         data_queue: Queue to store the data
+        n_channels: channels simulated; the first one is a load cell and the
+            rest are potentiometers
     Output:
         None (it will be in a thread)
     """
     import numpy as np
     while True:
-        delta_t, bits_hx711, bits_potentiometer = 50, np.random.randint(0, 2**10), np.random.randint(0, 2**6)
+        delta_t, bits_hx711 = 50000, np.random.randint(0, 2**10)
+        bits_potentiometer = np.random.randint(0, 2**6, size=n_channels - 1)
         time_now = datetime.datetime.now().timestamp()
         bits_hx711 += time_now * 100000
-        bits_potentiometer += time_now*30
+        bits_potentiometer = bits_potentiometer + time_now*30
         if np.random.randint(0, 1000) == 0:  # Simulate an outlier value
             bits_hx711 = 2**13
         data_queue.put(
-            (int(delta_t), int(bits_hx711), int(bits_potentiometer)))
-        time.sleep(delta_t / 1000)  # Convert ms to seconds
+            np.array([[delta_t, bits_hx711, *bits_potentiometer]], dtype=np.int64))
+        time.sleep(delta_t / 1000000)  # Convert us to seconds
+
+
+def load_replay_samples(path):
+    """
+    Function Duties:
+        Reads a recorded run and turns it back into raw samples (the format
+        put in the queue by read_arduino_data_thread).
+    Input:
+        path: result file (.bcr or .json, its raw_mass and raw_deflection
+            columns are converted back to bits) or captured serial stream
+            (any other extension, decoded as the Arduino data)
+    Output:
+        samples: int64 array of shape (n_samples, 3); the first delta_t is
+            the time of the first sample, so the original times are kept
+    """
+    if os.path.splitext(path)[1] in (".bcr", ".json"):
+        data = load_results(path)
+        t_us = np.rint(np.asarray(data["time"], dtype=np.float64) * 1e6).astype(np.int64)
+        samples = np.empty((len(t_us), 3), dtype=np.int64)
+        samples[:, 0] = np.maximum(np.diff(t_us, prepend=0), 0)
+        raw = np.column_stack((data["raw_mass"], data["raw_deflection"]))
+        samples[:, 1:] = default_channels().to_bits(raw)  # Rounded: the original readings
+        return samples
+
+    from helpers.classes import FrameDecoder
+    with open(path, "rb") as f:
+        return FrameDecoder().decode(f.read())
+
+
+def replay_data_thread(data_queue, path, speed=1.0, batch_time=0.05) -> None:
+    """
+    Function Duties:
+        Replays a recorded run (see load_replay_samples) through the same
+        queue as the Arduino data, e.g. to test the interface with a real
+        run or at a higher data rate.
+    Input:
+        data_queue: Queue to store the data
+        path: recorded run
+        speed: 1 (real time), N (N times faster) or None (as fast as possible)
+        batch_time: period (s, of real time) between batches put in the queue
+    Output:
+        None (it will be in a thread)
+    """
+    samples = load_replay_samples(path)
+    print(f"[INFO] Replaying {path}: {len(samples)} samples at "
+          + (f"{speed}x speed" if speed else "maximum speed"))
+    if not speed:
+        for i in range(0, len(samples), 10000):
+            data_queue.put(samples[i:i + 10000])
+    else:
+        # Time of each sample since the first one (s); each batch is put when it is due
+        t = np.cumsum(samples[:, 0]) - samples[0, 0] if len(samples) else np.empty(0)
+        t = t / 1e6 / speed
+        t_ini = time.monotonic()
+        i = 0
+        while i < len(samples):
+            elapsed = time.monotonic() - t_ini
+            j = int(np.searchsorted(t, elapsed, side="right"))
+            if j > i:
+                data_queue.put(samples[i:j])
+                i = j
+            time.sleep(batch_time)
+    print(f"[INFO] Replay finished ({path})")
+
+
+def start_data_source(channels, port="COM6", baud_rate=115200, simulated=False, replay_file=None,
+                      replay_speed=1., policy="drop_oldest", capacity=2**18, stats=None,
+                      capture=False, connection_attempts=1):
+    """
+    Function Duties:
+        Starts the data source of the acquisition (interface.py, acquisition.py
+        and acquisition_server.py): a recorded run, the simulated data or the
+        Arduino, read in a thread that fills a bounded SampleBlockQueue.
+    Input:
+        channels: classes.ChannelRegistry (samples of 1 + n_channels fields)
+        port, baud_rate: serial port of the Arduino
+        simulated: simulated data instead of the Arduino
+        replay_file, replay_speed: recorded run replayed instead of the
+            Arduino (see replay_data_thread)
+        policy: what the queue does when it is full (see SampleBlockQueue;
+            "spill" writes to data/spill_*.bin); a replay always waits ("block")
+        capacity: samples of the queue
+        stats: classes.SerialReaderStats of the serial reader (optional)
+        capture: also save the bytes received from the Arduino (data/serial_*.raw)
+        connection_attempts: attempts to connect to the Arduino
+    Output:
+        data_queue: SampleBlockQueue (None if the Arduino could not be connected)
+        ser: Serial object (None without Arduino)
+    """
+    from helpers.classes import SampleBlockQueue
+    n_fields = 1 + channels.n_channels  # delta_t and the bits of each channel
+    date = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+
+    ser = None
+    if replay_file is None and not simulated:
+        for attempt in range(connection_attempts):
+            if attempt > 0:
+                print("[WARNING] No active serial connection. Attempting to reconnect...")
+            ser = connect_arduino(port, baud_rate, n_fields=n_fields)
+            if ser is not None:
+                break
+        if ser is None:
+            return None, None
+
+    if replay_file is not None:
+        policy = "block"  # The replay can wait for the consumer (nothing is lost)
+    spill_path = None
+    if policy == "spill":
+        os.makedirs("data", exist_ok=True)
+        spill_path = os.path.join("data", f"spill_{date}.bin")
+    data_queue = SampleBlockQueue(n_fields, max_blocks=max(1, capacity // 1024), policy=policy,
+                                  spill_path=spill_path)
+
+    if replay_file is not None:
+        target, args = replay_data_thread, (data_queue, replay_file, replay_speed)
+    elif simulated:
+        target, args = simulated_data_thread, (data_queue, channels.n_channels)
+    else:
+        capture_path = None
+        if capture:
+            os.makedirs("data", exist_ok=True)
+            capture_path = os.path.join("data", f"serial_{date}.raw")
+        target, args = read_arduino_data_thread, (ser, data_queue, stats, capture_path, n_fields)
+    threading.Thread(target=target, args=args, daemon=True).start()
+    return data_queue, ser
 
 
 def manual_find_peaks(list_values, threshold):
@@ -190,6 +595,26 @@ def manual_find_peaks(list_values, threshold):
     return valid_indices
 
 
+def find_peaks_mask(values, thresholds):
+    """
+    Function Duties:
+        Same criterion as manual_find_peaks for several channels at once:
+        a sample is an outlier in a channel when it differs from both of its
+        neighbours more than the threshold of the channel.
+    Input:
+        values: array of shape (n_samples, n_channels)
+        thresholds: threshold of each channel (np.inf: never an outlier)
+    Output:
+        outliers: boolean array of shape (n_samples, n_channels)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nan_row = np.full((1, values.shape[1]), np.nan)
+    diff_before = np.abs(np.diff(values, axis=0, prepend=nan_row))
+    diff_after = np.abs(np.diff(values, axis=0, append=nan_row))
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return (diff_before > thresholds) & (diff_after > thresholds)
+
+
 def smooth_with_edges(data_list, step):
     data_list = np.array(data_list, dtype=np.float64)  # Ensure float for averaging
     n = len(data_list)
@@ -197,23 +622,272 @@ def smooth_with_edges(data_list, step):
     if n <= 2 * step:
         return data_list  # If the list is too small, return as is
 
-    # Compute moving average for the middle part
-    smoothed_values = np.convolve(data_list, np.ones(step)/step, mode='valid')
+    # Running sums (all the averages are computed from them, no loops)
+    cumsum = np.concatenate(([0.], np.cumsum(data_list)))
 
     # Initialize output array
     result = np.zeros(n)
-    
-    # Compute progressive averaging for the first `step` elements
-    for i in range(step):
-        result[i] = np.mean(data_list[:i + step])  # Average available values before step
 
-    # Compute progressive averaging for the last `step` elements
-    for i in range(n - step, n):
-        result[i] = np.mean(data_list[i - step + 1:])  # Average available values after step
+    # Progressive averaging for the first `step` elements (available values before step)
+    i = np.arange(step)
+    result[:step] = cumsum[i + step] / (i + step)
+
+    # Progressive averaging for the last `step` elements (available values after step)
+    i = np.arange(n - step, n)
+    result[n - step:] = (cumsum[-1] - cumsum[i - step + 1]) / (n - i + step - 1)
 
-    # Insert the moving average in the middle
-    mid_start = step
-    mid_end = n - step
-    result[mid_start:mid_end] = smoothed_values[:mid_end - mid_start]
+    # Moving average (of the previous `step` values) for the middle part
+    i = np.arange(step, n - step)
+    result[step:n - step] = (cumsum[i] - cumsum[i - step]) / step
 
     return result
+
+
+def minmax_decimate(values, n_buckets):
+    """
+    Function Duties:
+        Reduces a series to about 2 * n_buckets points keeping, for each
+        bucket of consecutive samples, the samples with the minimum and
+        the maximum value (so that load peaks remain visible in the plots).
+        For a plot, n_buckets should be the axis width in pixels.
+    Input:
+        values: list or array of values (e.g. mass)
+        n_buckets: number of buckets
+    Output:
+        indices: sorted indices of the samples to be plotted (the same
+            indices must be used for the x values, e.g. time)
+    """
+    values = np.asarray(values)
+    n = len(values)
+    n_buckets = max(int(n_buckets), 1)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)  # ceil division
+    n_full = n // size
+    starts = np.arange(n_full + 1) * size
+    blocks = values[:n_full * size].reshape(n_full, size)
+    indices = [starts[:-1] + blocks.argmin(axis=1), starts[:-1] + blocks.argmax(axis=1)]
+    if n_full * size < n:  # Last (incomplete) bucket
+        rest = values[n_full * size:]
+        indices.append(starts[-1] + np.array([rest.argmin(), rest.argmax()]))
+
+    return np.unique(np.concatenate(indices))
+
+
+def analyze_run(data_dict, threshold_mass_peaks=50, failure_drop=0.2, elastic_range=(0.1, 0.5)):
+    """
+    Function Duties:
+        Computes the results of a bridge test (vectorized). The result files
+        only contain the measurement (the first sample is the last one of the
+        callibration and it is skipped, as in process_results.py); the mass
+        peaks are filtered with manual_find_peaks.
+    Input:
+        data_dict: dictionary of a result file (see load_results)
+        threshold_mass_peaks: threshold of manual_find_peaks (kg)
+        failure_drop: fraction of the peak load that must be lost after the
+            peak to consider that the bridge failed
+        elastic_range: fractions of the peak load of the loading branch used
+            to fit the stiffness (least squares line mass vs deflection)
+    Output:
+        dictionary with:
+            - n_samples: samples of the measurement (after filtering)
+            - duration: duration of the measurement (s)
+            - peak_load: maximum load (kg)
+            - time_peak: time of the maximum load (s from the start)
+            - deflection_at_peak: deflection at the maximum load (mm)
+            - max_deflection: maximum deflection until the failure (mm)
+            - stiffness: slope of the loading branch (kg/mm)
+            - energy: work done until the failure (J), integral of the
+              load (N) over the deflection (m)
+            - failure_time: first time after the peak when the load is below
+              (1 - failure_drop) * peak_load (s from the start; NaN if the
+              bridge did not fail)
+    """
+    t = np.asarray(data_dict["time"], dtype=np.float64)[1:]
+    mass = np.asarray(data_dict["processed_mass"], dtype=np.float64)[1:]
+    deflection = np.asarray(data_dict["processed_deflection"], dtype=np.float64)[1:]
+    valid = manual_find_peaks(mass, threshold_mass_peaks)
+    t, mass, deflection = t[valid] - (t[0] if len(t) else 0), mass[valid], deflection[valid]
+    nan = float("nan")
+    if len(t) == 0:
+        return {"n_samples": 0, "duration": 0., "peak_load": nan, "time_peak": nan,
+                "deflection_at_peak": nan, "max_deflection": nan, "stiffness": nan,
+                "energy": nan, "failure_time": nan}
+
+    i_peak = int(np.argmax(mass))
+    peak_load = mass[i_peak]
+    after_peak = np.flatnonzero(mass[i_peak:] < (1 - failure_drop) * peak_load)
+    i_failure = i_peak + int(after_peak[0]) if len(after_peak) else len(mass) - 1
+
+    # Stiffness: loading branch (until the peak) within the elastic range of loads
+    loading = slice(0, i_peak + 1)
+    elastic = (mass[loading] >= elastic_range[0] * peak_load) & (mass[loading] <= elastic_range[1] * peak_load)
+    stiffness = nan
+    if np.count_nonzero(elastic) >= 2 and np.ptp(deflection[loading][elastic]) > 0:
+        stiffness = float(np.polyfit(deflection[loading][elastic], mass[loading][elastic], 1)[0])
+
+    # Energy (trapezoidal rule): kg * g = N, mm / 1000 = m
+    force = mass[:i_failure + 1] * 9.81
+    energy = float(np.sum((force[1:] + force[:-1]) / 2 * np.diff(deflection[:i_failure + 1]) / 1000))
+
+    return {"n_samples": int(len(t)),
+            "duration": float(t[-1]),
+            "peak_load": float(peak_load),
+            "time_peak": float(t[i_peak]),
+            "deflection_at_peak": float(deflection[i_peak]),
+            "max_deflection": float(np.max(deflection[:i_failure + 1])),
+            "stiffness": stiffness,
+            "energy": energy,
+            "failure_time": float(t[i_failure]) if len(after_peak) else nan}
+
+
+def read_acquisition_log_metadata(path):
+    """
+    Function Duties:
+        Reads only the header of an acquisition log (classes.AcquisitionLog)
+    Input:
+        path: path of the .log file
+    Output:
+        metadata: dictionary of the header ("columns" and e.g. "source")
+    """
+    from helpers.classes import AcquisitionLog
+
+    with open(path, "rb") as f:
+        magic, version, meta_len = AcquisitionLog.HEADER.unpack(f.read(AcquisitionLog.HEADER.size))
+        if magic != AcquisitionLog.MAGIC:
+            raise ValueError(f"{path} is not an acquisition log")
+        return json.loads(f.read(meta_len))
+
+
+def read_acquisition_log(path):
+    """
+    Function Duties:
+        Reads an acquisition log written by classes.AcquisitionLog. If the log
+        is truncated or corrupted (e.g. the program crashed), the data of the
+        valid chunks before the first bad one is returned.
+    Input:
+        path: path of the .log file
+    Output:
+        data_dict: dictionary with one array per column and the JSON chunks
+            merged (e.g. "callibration"), i.e. the format of the result files
+        complete: True if the log was closed properly (no data lost)
+    """
+    from helpers.classes import AcquisitionLog
+
+    with open(path, "rb") as f:
+        content = f.read()
+
+    magic, version, meta_len = AcquisitionLog.HEADER.unpack_from(content, 0)
+    if magic != AcquisitionLog.MAGIC:
+        raise ValueError(f"{path} is not an acquisition log")
+    pos = AcquisitionLog.HEADER.size
+    metadata = json.loads(content[pos:pos + meta_len])
+    pos += meta_len
+    columns = metadata["columns"]
+
+    blocks, extra, complete = [], {}, False
+    chunk_header = AcquisitionLog.CHUNK_HEADER
+    while pos + chunk_header.size <= len(content):
+        kind, n_bytes, n_rows, crc = chunk_header.unpack_from(content, pos)
+        payload = content[pos + chunk_header.size:pos + chunk_header.size + n_bytes]
+        if len(payload) < n_bytes or zlib.crc32(payload) != crc:
+            print(f"[WARNING] Log truncated or corrupted at byte {pos}; recovering previous data")
+            break
+        pos += chunk_header.size + n_bytes
+        if kind == b"DATA":
+            blocks.append(np.frombuffer(payload, dtype="<f8").reshape(n_rows, len(columns)))
+        elif kind == b"JSON":
+            extra.update(json.loads(payload))
+        elif kind == b"END_":
+            complete = True
+            break
+
+    data = np.concatenate(blocks) if blocks else np.empty((0, len(columns)))
+    data_dict = {name: data[:, i] for i, name in enumerate(columns)}
+    data_dict.update(extra)
+    return data_dict, complete
+
+
+# Compact result files (.bcr): header + columns of little-endian float64
+RESULTS_MAGIC = b"BRIDGRES"
+RESULTS_VERSION = 1
+RESULTS_HEADER = struct.Struct("<8sHI")  # magic, version, JSON header length
+RESULTS_ALIGN = 64  # The data starts at a multiple of 64 bytes
+
+
+def _results_data_offset(header_len):
+    """Position of the data in a compact result file (aligned to RESULTS_ALIGN)"""
+    offset = RESULTS_HEADER.size + header_len
+    return offset + -offset % RESULTS_ALIGN
+
+
+def save_results(path, data_dict):
+    """
+    Function Duties:
+        Saves a result (the dictionary saved by interface.py: one list/array
+        per column plus the "callibration" dictionary) in the compact binary
+        format (.bcr), which can be read lazily with load_results.
+
+    File format:
+        - RESULTS_MAGIC (8 bytes), version (uint16), header length (uint32)
+        - JSON header: column names, number of rows, data type and the
+          rest of the (non-array) entries, e.g. "callibration"
+        - Padding up to a multiple of RESULTS_ALIGN bytes
+        - Data: float64 little-endian, one column after another
+    Input:
+        path: path of the file to be saved (e.g. "data/Equipo_1_....bcr")
+        data_dict: dictionary with the result
+    """
+    columns = [name for name, values in data_dict.items() if name != "callibration"
+               and isinstance(values, (list, tuple, np.ndarray))]
+    data = np.vstack([np.asarray(data_dict[name], dtype="<f8") for name in columns])
+    header = {"columns": columns, "n_rows": data.shape[1], "dtype": "<f8",
+              "extra": {name: data_dict[name] for name in data_dict if name not in columns}}
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    offset = _results_data_offset(len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(RESULTS_HEADER.pack(RESULTS_MAGIC, RESULTS_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(np.ascontiguousarray(data).tobytes())
+
+
+def load_results(path):
+    """
+    Function Duties:
+        Loads a result file, either JSON (.json) or compact (.bcr). The
+        columns of compact files are memory-mapped (read-only), so only the
+        data actually used is read from disk.
+    Input:
+        path: path of the result file
+    Output:
+        data_dict: dictionary with one array per column (e.g. "time",
+            "processed_mass") and the "callibration" dictionary
+    """
+    if os.path.splitext(path)[1].lower() == ".json":
+        with open(path) as f:
+            data_dict = json.load(f)
+        if not isinstance(data_dict, dict) or "time" not in data_dict:  # e.g. a leaderboard
+            raise ValueError(f"{path} is not a result file")
+        return {name: np.asarray(values) if isinstance(values, list) else values
+                for name, values in data_dict.items()}
+
+    with open(path, "rb") as f:
+        magic, version, header_len = RESULTS_HEADER.unpack(f.read(RESULTS_HEADER.size))
+        if magic != RESULTS_MAGIC:
+            raise ValueError(f"{path} is not a result file")
+        header = json.loads(f.read(header_len))
+
+    n_columns, n_rows = len(header["columns"]), header["n_rows"]
+    if n_rows > 0:
+        data = np.memmap(path, dtype=header["dtype"], mode="r",
+                         offset=_results_data_offset(header_len), shape=(n_columns, n_rows))
+    else:
+        data = np.empty((n_columns, 0))
+    data_dict = {name: data[i] for i, name in enumerate(header["columns"])}
+    data_dict.update(header["extra"])
+    return data_dict
+
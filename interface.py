@@ -1,19 +1,23 @@
+import time
+startup_time = time.perf_counter()  # Start of the time to first frame (see report_startup_time)
+
 import tkinter as tk
 from tkinter import ttk
 
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure  # pyplot is not needed (the figures are embedded in Tk)
 from matplotlib.animation import FuncAnimation
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from PIL import Image, ImageTk  # Import Pillow for image handling
 from datetime import date
 import os
 import json
 import threading
-import time
 import datetime
-import queue
+import sys
+import numpy as np
 
 import helpers.outils as outils
+from helpers.classes import SampleStore, TieredRetention, MassDeflectionPlot, StiffnessPlot, StreamingPeakFilter, StreamingSmoother, \
+    RunningStats, AcquisitionLog, SerialReaderStats, SharedRingBuffer, ZeroCallibration, PipelineMetrics, StiffnessEstimator
 
 """
 File Duties:
@@ -24,7 +28,7 @@ In this case, data from 2 sensors is read; the arduino code is Potentiometer.ino
 located in arduino folder of this project
 
 The data read is the following:
-- Delta Time (ms): Time elapsed since last reading
+- Delta Time (us; ms in the legacy text format): Time elapsed since last reading
 - HX711 Value (bits)
 - Voltage (bits)
 
@@ -33,17 +37,25 @@ The data read is the following:
 
 
 IMPORTANT NOTES ABOUT CODE ARCHITECTURE:
-    - The data acquisition is done in a separate thread to avoid blocking the GUI.
+    - The data acquisition is done in a separate thread to avoid blocking the GUI
+      (or in a separate process, acquisition.py, if acquisition_process = True;
+      the samples are then passed through a shared-memory ring buffer).
     - The data is stored in a queue to ensure thread safety and fast plot updating.
-    - The variables raw_time, raw_mass, and raw_deflection are global and updated
-      by the process_data function.
+    - The samples are stored in a SampleStore (helpers/classes.py), a columnar
+      store with the columns time, raw_mass, raw_deflection, processed_mass and
+      processed_deflection; it is updated by the process_data function.
+    - The sensors are the channels of a ChannelRegistry (variable channels);
+      with several load cells or displacement sensors the store also has the
+      columns raw_<channel> and processed_<channel> of each one, and the mass
+      and deflection columns are their totals (sum of the loads, first
+      displacement sensor).
 
 NOTA ADICIONAL:
 El código está muy sucio, necesitaría una refactorización que no me ha dado tiempo a hacer.
 Lo importante es tener en cuenta que:
 
-- los datos en bruto se guardan en las variables raw_time, raw_mass, raw_deflection
-- estos datos se procesan, almacenándose en processed_mass, processed_deflection
+- los datos en bruto se guardan en las columnas time, raw_mass, raw_deflection del store
+- estos datos se procesan, almacenándose en las columnas processed_mass, processed_deflection
  el procesamiento consiste simplemente en restar el valor de calibración
   (zero_mass, zero_deflection) a los valores en bruto
 - estas variables (junto con otras que se van actualizando) son globales ya que hay
@@ -61,194 +73,152 @@ registra picos (ruido eléctrico o similar); este filtro está controlado por la
 
 """
 
-def update_mass_deflection_graph(frame, fig, ax1, ax2, data_queue, raw_time, raw_mass,
-                 raw_deflection, processed_mass, processed_deflection, zero_mass, zero_deflection,
-                 pause, callibration, threshold_mass_peaks, smooth_plots, step_smooth):
+def update_mass_deflection_graph(frame, plot, snapshot, pause, threshold_mass_peaks,
+                                 smooth_plots, step_smooth):
     """
     Function Duties:
         Updates the mass and deflection graph (which is a single figure with 2 axes)
         full list of values raw_time, raw_mass, raw_deflection
     Inputs:
         - frame: Required for FuncAnimation (unused inside the function)
-        - fig: The Matplotlib figure object to update
-        - ax1: First subplot (Mass vs Time)
-        - ax2: Second subplot (Deflection vs Time)
-        - raw_time: List storing time values
-        - raw_mass: List storing mass readings
-        - raw_deflection: List storing deflection readings
+        - plot: MassDeflectionPlot (figure with Mass vs Time and Deflection vs Time)
+        - snapshot: latest snapshot published by ingest_data
         - pause: Boolean indicating whether updates are paused
         - n_readings: Number of readings to display
+    Output:
+        artists: artists updated (required by FuncAnimation when blitting)
     """
+    global mass_peak_filter, mass_smoother, mass_plot_idx
     # n_readings = 200
-    if pause:
-        return  # If paused, do not update
-
-    process_data(data_queue, raw_time, raw_mass, raw_deflection, processed_mass,
-                 processed_deflection, threshold_mass_peaks)
-
-    if len(callibration_dict) > 0:
-        i = list(callibration_dict.keys())[-1]
-        idx_ini = callibration_dict[i]["raw_processed_data"]["idx_ini"] + 1
-    else:
-        idx_ini = 0
-    # idx_ini += 1
+    if pause or plot.version == snapshot["version"]:
+        return plot.artists  # If paused or no new data, do not update
+    plot.version = snapshot["version"]
+
+    if plot.idx_ini != snapshot["idx_ini"]:  # New callibration -> default view and filters
+        plot.reset()
+        plot.idx_ini = snapshot["idx_ini"]
+        mass_peak_filter = StreamingPeakFilter(threshold_mass_peaks, keep_indices=False)
+        mass_smoother = StreamingSmoother(step_smooth, n_columns=3)
+
+    # Arrays of the snapshot (views of the store, no copy); the filters count
+    # the samples since the callibration, the snapshot starts shift samples later
+    # if the oldest ones have been compacted (see TieredRetention; never the ones
+    # not read yet, see retention_limit)
+    data = snapshot["data"]
+    columns = (data["time"], data["processed_mass"], data["processed_deflection"])
+    shift = snapshot["idx_start"] - snapshot["idx_ini"]
+
+    # Manual filter for mass (only the new samples are checked)
+    with metrics.timer("peak_filter"):
+        new = slice(mass_peak_filter.n - shift, len(data["time"]))
+        valid_indices = mass_peak_filter.update(data["processed_mass"][new]) - shift
+        new_rows = np.column_stack([values[valid_indices] for values in columns])
+        # Last sample: provisionally valid (it may be filtered out when the next one arrives)
+        last_sample = slice(mass_peak_filter.n - 1 - shift, mass_peak_filter.n - shift)
+        last_row = np.column_stack([values[last_sample] for values in columns])
+    mass_plot_idx = snapshot["idx_ini"] + mass_peak_filter.n - 1  # The last sample is read again
+
+    # Smooth data (only new values; the last ones may change in next frames -> tail)
+    with metrics.timer("smoothing"):
+        if smooth_plots:
+            stable_rows = mass_smoother.update(new_rows)
+            tail_rows = mass_smoother.tail(last_row)
+        else:
+            stable_rows, tail_rows = new_rows, last_row
 
-    # Lists for plotting
-    t_plot = raw_time[idx_ini:]
-    mass_plot = processed_mass[idx_ini:]
-    deflection_plot = processed_deflection[idx_ini:]
-
-    # Manual filter for mass
-    valid_indices = outils.manual_find_peaks(mass_plot, threshold_mass_peaks)
-    t_plot = [t_plot[i] for i in valid_indices]
-    mass_plot = [mass_plot[i] for i in valid_indices]
-    deflection_plot = [deflection_plot[i] for i in valid_indices]
-
-    # Smooth data
-    if smooth_plots:
-        t_plot = outils.smooth_with_edges(t_plot, step_smooth)
-        mass_plot = outils.smooth_with_edges(mass_plot, step_smooth)
-        deflection_plot = outils.smooth_with_edges(deflection_plot, step_smooth)
-        if len(t_plot) > step_smooth:
-            t_plot = t_plot[step_smooth:]
-            mass_plot = mass_plot[step_smooth:]
-            deflection_plot = deflection_plot[step_smooth:]
-
-    # Update first graph
-    ax1.clear()
-    ax1.plot(t_plot, mass_plot, label="Célula de carga", color="blue")
-    # ax1.plot(raw_time[-n_readings:], processed_mass[-n_readings:], label="Célula de carga", color="blue")
-    ax1.set_title("Carga Aplicada")
-    ax1.set_xlabel("Tiempo (s)")
-    ax1.set_ylabel("Masa (kg)")
-    if len(mass_plot) > 0:
-        y_inf, y_max = min(min(mass_plot), -2), max(mass_plot) + 50
-    else:
-        y_inf, y_max = -2, 500
-    ax1.set_ylim([y_inf, y_max])
-    ax1.legend(loc="upper left")
-
-    # Update second graph
-    ax2.clear()
-    ax2.plot(t_plot, deflection_plot, label="Potenciómetro", color="red")
-    # ax2.plot(raw_time[-n_readings:], processed_deflection[-n_readings:], label="Potenciómetro", color="red")
-    ax2.set_title("Flecha en Centro de Vano")
-    ax2.set_xlabel("Tiempo (s)")
-    ax2.set_ylabel("Flecha (mm)")
-    if len(deflection_plot) > 0:
-        y_inf, y_max = min(min(deflection_plot), -5), max(deflection_plot) + 5
-    else:
-        y_inf, y_max = -5, 5
-    ax2.set_ylim([y_inf, y_max])
-    ax2.legend(loc="upper left")
+    # Update both graphs (only line data; limits change if the data leaves the view)
+    with metrics.timer("plot_update"):
+        artists = plot.update(*stable_rows.T, tail=tail_rows.T)
 
-    print(f"Time: {raw_time[-1]:.2f} s | Raw mass: {raw_mass[-1]:.3f} kg | Raw Deflection: {raw_deflection[-1]:.3f} mm | Processed Mass: {processed_mass[-1]:.3f} kg | Processed Deflection: {processed_deflection[-1]:.3f} mm")
+    last = {name: values[-1] if len(values) > 0 else 0 for name, values in data.items()}
+    print(f"Time: {last['time']:.2f} s | Raw mass: {last['raw_mass']:.3f} kg | Raw Deflection: {last['raw_deflection']:.3f} mm | Processed Mass: {last['processed_mass']:.3f} kg | Processed Deflection: {last['processed_deflection']:.3f} mm")
 
-    fig.tight_layout()  # Adjust layout for clarity
+    return artists
 
 
-def update_stiffness_graph(frame, fig, ax, data_queue, raw_time, raw_mass,
-                           raw_deflection, processed_mass, processed_deflection, zero_mass, zero_deflection,
-                           pause, callibration, threshold_mass_peaks, smooth_plots, step_smooth):
+def update_stiffness_graph(frame, plot, snapshot, pause, smooth_plots, step_smooth):
     """
     Function Duties:
         Updates the mass and deflection graph (which is a single figure with 2 axes)
         full list of values raw_time, raw_mass, raw_deflection
     Inputs:
         - frame: Required for FuncAnimation (unused inside the function)
-        - fig: The Matplotlib figure object to update
-        - ax1: First subplot (Mass vs Time)
-        - ax2: Second subplot (Deflection vs Time)
-        - raw_time: List storing time values
-        - raw_mass: List storing mass readings
-        - raw_deflection: List storing deflection readings
+        - plot: StiffnessPlot (Deflection vs Load scatter)
+        - snapshot: latest snapshot published by ingest_data
         - pause: Boolean indicating whether updates are paused
         - n_readings: Number of readings to display
+    Output:
+        artists: artists updated (required by FuncAnimation when blitting)
     """
+    global stiffness_smoother, stiffness_n_samples, stiffness_plot_idx
     # n_readings = 200
-    if pause:
-        return  # If paused, do not update
+    if pause or plot.version == snapshot["version"]:
+        return plot.artists  # If paused or no new data, do not update
+    plot.version = snapshot["version"]
+
+    if plot.idx_ini != snapshot["idx_ini"]:  # New callibration -> default view and smoother
+        plot.reset()
+        plot.idx_ini = snapshot["idx_ini"]
+        stiffness_smoother = StreamingSmoother(step_smooth, n_columns=2)
+        stiffness_n_samples = 0
+    # stiffness = [m/d if d != 0 else 0 for m, d in zip(processed_mass, processed_deflection)]
+    data = snapshot["data"]
+    shift = snapshot["idx_start"] - snapshot["idx_ini"]  # Samples compacted (see update_mass_deflection_graph)
+    new = slice(stiffness_n_samples - shift, len(data["processed_mass"]))
+    stiffness_n_samples = shift + len(data["processed_mass"])
+    stiffness_plot_idx = snapshot["idx_ini"] + stiffness_n_samples
+    new_rows = np.column_stack((data["processed_deflection"][new], data["processed_mass"][new]))
+
+    with metrics.timer("smoothing"):
+        if smooth_plots:
+            stable_rows = stiffness_smoother.update(new_rows)
+            tail_rows = stiffness_smoother.tail()
+        else:
+            stable_rows, tail_rows = new_rows, np.empty((0, 2))
 
-    process_data(data_queue, raw_time, raw_mass, raw_deflection, processed_mass,
-                 processed_deflection, threshold_mass_peaks)
+    # Update graph (only scatter offsets; limits change if the data leaves the view)
+    with metrics.timer("plot_update"):
+        return plot.update(*stable_rows.T, tail=tail_rows.T)
 
-    if len(callibration_dict) > 0:
-        i = list(callibration_dict.keys())[-1]
-        idx_ini = callibration_dict[i]["raw_processed_data"]["idx_ini"] + 1
-    else:
-        idx_ini = 0
-    # idx_ini += 1
-    # stiffness = [m/d if d != 0 else 0 for m, d in zip(processed_mass, processed_deflection)]
-    mass_plot = processed_mass[idx_ini:]
-    deflection_plot = processed_deflection[idx_ini:]
-
-    if smooth_plots:
-        mass_plot = outils.smooth_with_edges(mass_plot, step_smooth)
-        deflection_plot = outils.smooth_with_edges(deflection_plot, step_smooth)
-        if len(mass_plot) > step_smooth:
-            mass_plot = mass_plot[step_smooth:]
-            deflection_plot = deflection_plot[step_smooth:]
-
-    # Update first graph
-    ax.clear()
-    ax.scatter(deflection_plot, mass_plot, label="Rigidez", color="black")
-    ax.set_title(f"Flecha vs Carga")
-    ax.set_xlabel("Flecha (mm)")
-    ax.set_ylabel("Carga (kg)")
-    ax.legend(loc="lower right")
-    x_inf = 0
-    x_max = max(deflection_plot + [5])
-    y_inf = 0
-    y_max = max(mass_plot + [20])
-    ax.set_xlim([x_inf, x_max])
-    ax.set_ylim([y_inf, y_max])
-    # ax.set_ylim([-1, max(stiffness) + 5])
-
-    fig.tight_layout()  # Adjust layout for clarity
-
-
-def process_data(data_queue, raw_time, raw_mass, raw_deflection,
-                 processed_mass, processed_deflection, threshold_mass_peaks) -> None:
+
+def process_data(data_queue, store) -> None:
     """
     Function Duties:
         Retrieves and processes the latest available data from the queue.
     Inputs:
         - data_queue: Queue storing incoming sensor data
-        - raw_time: List storing time values
-        - raw_mass: List storing mass readings
-        - raw_deflection: List storing deflection readings
+        - store: SampleStore where the new samples are appended
     Output:
         None
-        They are global variables that get updated, no need to return them
-    """
-    global zero_mass, zero_deflection, callibration, callibration_time
-    latest_t = raw_time[-1] if raw_time else 0  # Last time value or 0 if empty
-    queue_time, queue_mass, queue_deflection = [], [], []
-
-    while not data_queue.empty():
-        delta_t, bits_hx711, bits_potentiometer = data_queue.get()
-        delta_t = outils.from_t_ms_to_s(delta_t)
-        mass = outils.from_bits_to_kg(bits_hx711)
-        deflection = outils.from_bits_to_deflection(bits_potentiometer)
-        latest_t += delta_t
-        queue_time.append(latest_t)
-        queue_mass.append(mass)
-        queue_deflection.append(deflection)
-    with lock:  # Avoid problems with different threads managing the same variables
-        raw_time += queue_time
-        raw_mass += queue_mass
-        raw_deflection += queue_deflection
-        processed_mass += [m - zero_mass for m in queue_mass]
-        processed_deflection += [d - zero_deflection for d in queue_deflection]
-    if callibration:
-        # Remove outliers from callibration
-        valid_indices = outils.manual_find_peaks(queue_mass, threshold_mass_peaks)
-        queue_mass = [queue_mass[i] for i in valid_indices]
-        queue_deflection = [queue_deflection[i] for i in valid_indices]
-        zero_mass = sum(queue_mass) / len(queue_mass)
-        zero_deflection = sum(queue_deflection) / len(queue_deflection)
-        callibration_time = queue_time[-1] - queue_time[0]
-        callibration = False
+        The store is updated in place, no need to return it
+    """
+    global zeros, zero_mass, zero_deflection
+
+    with metrics.timer("read_convert"):
+        queue_time, queue_values = read_new_samples(data_queue)
+    metrics.record_samples(queue_time)
+
+    # All the channels at once: arrays of shape (n_samples, n_channels)
+    processed_values = queue_values - zeros
+    # Callibration in progress: the zeros apply from the first sample after its window
+    idx_end = zero_callibration.update(queue_time, queue_values)
+    if idx_end is not None:
+        zeros = zero_callibration.zeros
+        zero_mass, zero_deflection = (float(total[0]) for total in channels.totals(zeros[None, :]))
+        processed_values[idx_end:] = queue_values[idx_end:] - zeros
+    processed_mass, processed_deflection = channels.totals(processed_values)
+
+    # The store handles its own lock (several threads read it)
+    store.extend_block(channels.store_block(queue_time, queue_values, processed_values))
+    if idx_end is None:
+        stats.update(queue_time, processed_mass, processed_deflection)
+        stiffness.update(processed_deflection, processed_mass)
+    else:
+        stats.reset()
+        stats.update(queue_time[idx_end:], processed_mass[idx_end:], processed_deflection[idx_end:])
+        stiffness.reset()
+        stiffness.update(processed_deflection[idx_end:], processed_mass[idx_end:])
+        finish_callibration(len(store) - len(queue_time) + idx_end - 1)
 
     
     # else:
@@ -263,6 +233,50 @@ def process_data(data_queue, raw_time, raw_mass, raw_deflection,
     #     raw_deflection.append(deflection)
 
 
+def read_new_samples(data_queue):
+    """
+    Function Duties:
+        Returns the samples acquired since the previous call, in physical
+        units: read from the shared ring buffer (acquisition_process) or
+        draining and converting the queue of the reader thread (vectorized).
+    Inputs:
+        - data_queue: SampleBlockQueue storing incoming sensor data (None if
+          the ring buffer is used)
+    Output:
+        time (s) array and values of the channels (array of shape
+        (n_samples, n_channels), kg for loads and mm for displacements)
+    """
+    global latest_t_us
+    if ring is not None:
+        rows = ring.read()
+        return rows[:, 0], rows[:, 1:]
+
+    if data_queue is None:  # No data source (e.g. the Arduino is not connected)
+        return np.empty(0), np.empty((0, channels.n_channels))
+    samples = data_queue.drain()
+    t_us, queue_values = outils.convert_channels(samples, latest_t_us, channels)
+    if len(t_us) > 0:
+        latest_t_us = int(t_us[-1])
+    return outils.from_t_us_to_s(t_us), queue_values
+
+
+def stop_acquisition_process():
+    """Asks the acquisition process to finish and releases the shared memory"""
+    global ring
+    if ring is None:
+        return
+    import subprocess
+    ring.request_stop()
+    try:
+        acquisition_proc.wait(timeout=3)
+    except subprocess.TimeoutExpired:
+        acquisition_proc.kill()
+    if ring.n_lost > 0:
+        print(f"[WARNING] {ring.n_lost} samples were overwritten in the ring buffer before being read")
+    ring.close()
+    ring = None
+
+
 def close_app(ser):
     """
     Function Duties:
@@ -276,6 +290,13 @@ def close_app(ser):
     if 'ani_1' in globals():
         ani_1.event_source.stop()
 
+    stop_acquisition_process()
+    metrics.close()
+    if data_queue is not None:
+        if data_queue.n_dropped > 0:
+            print(f"[WARNING] {data_queue.n_dropped} samples were dropped (acquisition queue full)")
+        data_queue.close()
+
     # Close Serial Connection
     if ser is not None and ser.is_open:
         print("[INFO] Closing serial connection...")
@@ -319,136 +340,279 @@ def toggle_measurement():
         Toggles between "Start Measurement" and "Stop Measurement" states.
         Also triggers calibration when first started.
     """
-    global measurement_running, zero_mass, zero_deflection, pause, callibration
+    global measurement_running
+    if zero_callibration.collecting:
+        return  # The measurement starts when the callibration finishes
     measurement_running = not measurement_running  # Toggle state
     if measurement_running:
-        pause = True
-        callibration = True
-    if callibration:
-        start_button.config(text="Please Wait...  ", style="Danger.TButton")  # Change button appearance
-        root.update_idletasks()
-        callibrate_mass_deflection(raw_time, raw_mass, raw_deflection, zero_mass, zero_deflection)
-
-    if measurement_running:
-        print("[INFO] Measurement started.")
-        start_button.config(text="Stop Measurement", style="Danger.TButton")  # Change button appearance
+        callibrate_mass_deflection(store)
     else:
         print("[INFO] Measurement stopped.")
         start_button.config(text="Start Measurement", style="Primary.TButton")  # Reset button
         save_data_to_file(callibration_dict)
 
 
+def start_acquisition_log(callibration_dict):
+    """
+    Function Duties:
+        Opens the acquisition log of a new measurement (after callibration);
+        the samples are appended to it by save_backup_data_thread.
+    """
+    global acquisition_log, logged_idx
+
+    folder = os.path.join("data")
+    os.makedirs(folder, exist_ok=True)
+
+    i = list(callibration_dict.keys())[-1]
+    file_name = f"{team_label}_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+    with log_lock:
+        acquisition_log = AcquisitionLog(os.path.join(folder, file_name), store.columns,
+                                         metadata={"team": team_label})
+        acquisition_log.write_json({"callibration": callibration_dict})
+        logged_idx = callibration_dict[i]["raw_processed_data"]["idx_ini"]
+
+
+def log_new_samples():
+    """
+    Function Duties:
+        Appends to the acquisition log the samples not logged yet
+    """
+    global logged_idx
+    with log_lock:
+        if acquisition_log is None:
+            return
+        snapshot = store.snapshot(logged_idx)
+        with metrics.timer("log_write"):
+            acquisition_log.write_samples(snapshot)
+        logged_idx += len(snapshot["time"])
+
+
 def save_backup_data_thread(callibration_dict):
-    global raw_time, raw_mass, raw_deflection, processed_mass, processed_deflection, measurement_running, team_label
+    """
+    Function Duties:
+        While the measurement is running, appends the new samples to the
+        acquisition log every log_time seconds (append-only, so the cost
+        does not grow with the length of the run).
+    """
+    global measurement_running
 
     while True:
         if measurement_running:
-            time.sleep(10)  # Save data every 10 seconds
-            folder = os.path.join("data", "backup")
-            os.makedirs(folder, exist_ok=True)
-
-            i = list(callibration_dict.keys())[-1]
-            idx_ini = callibration_dict[i]["raw_processed_data"]["idx_ini"]
-
-            data_dict = {
-                "time": raw_time[idx_ini:],
-                "raw_mass": raw_mass[idx_ini:],
-                "raw_deflection": raw_deflection[idx_ini:],
-                "processed_mass": processed_mass[idx_ini:],
-                "processed_deflection": processed_deflection[idx_ini:],
-                "callibration": callibration_dict
-            }
-
-            # Save data to a JSON file
-            file_name = f"{team_label}_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
-            with open(os.path.join(folder, file_name), "w") as f:
-                json.dump(data_dict, f, indent=4)
+            time.sleep(log_time)
+            log_new_samples()
         else:
             time.sleep(0.2)
 
 
 def save_data_to_file(callibration_dict):
-    global raw_time, raw_mass, raw_deflection, processed_mass, processed_deflection, team_label
-
-    folder = os.path.join("data")
-    os.makedirs(folder, exist_ok=True)
+    """
+    Function Duties:
+        Finalizes the acquisition log of the measurement and saves the
+        result file from it (compact .bcr format and, if save_json, JSON).
+    """
+    global acquisition_log
 
-    i = list(callibration_dict.keys())[-1]
-    idx_ini = callibration_dict[i]["raw_processed_data"]["idx_ini"]
+    if acquisition_log is None:
+        print("[WARNING] No measurement to be saved.")
+        return
+    log_new_samples()
+    with log_lock:
+        acquisition_log.close()
+        log_path = acquisition_log.path
+        acquisition_log = None
 
-    data_dict = {
-        "time": raw_time[idx_ini:],
-        "raw_mass": raw_mass[idx_ini:],
-        "raw_deflection": raw_deflection[idx_ini:],
-        "processed_mass": processed_mass[idx_ini:],
-        "processed_deflection": processed_deflection[idx_ini:],
-        "callibration": callibration_dict
-    }
+    data_dict, _ = outils.read_acquisition_log(log_path)
+    outils.save_results(os.path.splitext(log_path)[0] + ".bcr", data_dict)
 
-    # Save data to a JSON file
-    file_name = f"{team_label}_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
-    with open(os.path.join(folder, file_name), "w") as f:
-        json.dump(data_dict, f, indent=4)
+    if save_json:  # Save data to a JSON file
+        data_dict = {name: values.tolist() if isinstance(values, np.ndarray) else values
+                     for name, values in data_dict.items()}
+        with open(os.path.splitext(log_path)[0] + ".json", "w") as f:
+            json.dump(data_dict, f, indent=4)
 
 
 def update_measurement_info():
     """
     Function to update the measurement info panel in real time.
     """
-    global raw_time, raw_mass, raw_deflection, processed_mass, processed_deflection, refresh_time
-    process_data(data_queue, raw_time, raw_mass, raw_deflection, processed_mass,
-                 processed_deflection, threshold_mass_peaks)
+    global snapshot, refresh_time, info_version, stats
+
+    if info_version != snapshot["version"]:  # Only if there is new data
+        info_version = snapshot["version"]
+        if stats.count > 0:  # Running aggregates (updated in process_data)
+            max_mass = stats.max_mass
+            max_deflection = stats.max_deflection
+        else:
+            max_mass, max_deflection = 0, 0
+
+        # Update the label text (stiffness: online estimate, see StiffnessEstimator)
+        tangent, secant = (f"{k:.2f} kg/mm" if k == k else "-" for k in (stiffness.tangent, stiffness.secant))
+        text_label.config(text=f"CARGA MÁX.: {max_mass:.2f} kg        FLECHA MÁX.: {max_deflection:.2f} mm"
+                               f"        RIGIDEZ: {tangent} (SECANTE: {secant})")
+
+    # Schedule the next update (every 1 second)
+    text_label.after(refresh_time, update_measurement_info)
+
+
+def retention_limit():
+    """
+    Function Duties:
+        Index (in store) of the first sample that TieredRetention must keep
+        at full resolution: the samples not read yet by the plots (e.g.
+        while they are paused) or not written to the acquisition log are
+        never compacted.
+    """
+    limit = min(mass_plot_idx, stiffness_plot_idx)
+    if acquisition_log is not None:
+        limit = min(limit, logged_idx)
+    return limit
+
 
+def ingest_data():
+    """
+    Function Duties:
+        Single consumer of the acquisition queue. Every ingest_time ms it
+        drains and converts the queue (process_data) and publishes a new
+        snapshot of the samples since the last callibration; the views
+        (plots and measurement info) only read this snapshot and skip
+        their work if its version has not changed since their last frame.
+    """
+    with metrics.timer("process_data"):
+        process_data(data_queue, store)
+    with metrics.timer("publish_snapshot"):
+        publish_snapshot()
+    if retention is not None:
+        with metrics.timer("retention"):
+            retention.update(retention_limit())
+    update_callibration_countdown()
+    root.after(ingest_time, ingest_data)
+
+
+def queue_depth():
+    """Number of acquired samples waiting to be ingested"""
+    if ring is not None:
+        return ring.write_count - ring.read_count
+    if data_queue is None:
+        return 0
+    return len(data_queue)
+
+
+def update_metrics():
+    """
+    Function Duties:
+        Every second, reports the pipeline metrics (show_metrics): overlay
+        on the plots and a line in the metrics log.
+    """
+    metrics.gauges["queue_depth"] = queue_depth()
+    if data_queue is not None:
+        metrics.gauges["queue_dropped"] = data_queue.n_dropped
+        metrics.gauges["queue_spilled"] = data_queue.n_spilled
+        metrics.gauges["queue_high_water"] = data_queue.high_water
+    if reader_stats is not None:
+        metrics.gauges["bytes/s"] = round(reader_stats.bytes_per_second)
+        metrics.gauges["parse_errors"] = reader_stats.n_malformed
+        metrics.gauges["dropped_frames"] = reader_stats.n_dropped
+        metrics.gauges["decode_s"] = round(reader_stats.decode_time, 3)
+    if ring is not None:
+        metrics.gauges["ring_lost"] = ring.n_lost
+    metrics_label.config(text="\n".join(metrics.report()))
+    root.after(1000, update_metrics)
+
+
+def time_animation(animation, fig, stage):
+    """
+    Function Duties:
+        Measures each frame of a FuncAnimation (update function and, when
+        blitting, the drawing) as a stage of the metrics: two callbacks are
+        added to its timer, before and after the one of the animation (which
+        is added at the first draw of the figure, so they are added then).
+    """
+    t_ini = [0.]
+
+    def start():
+        t_ini[0] = time.perf_counter()
+
+    def end():
+        metrics.add_time(stage, time.perf_counter() - t_ini[0])
+
+    def install(event):
+        animation.event_source.callbacks.insert(0, (start, (), {}))
+        animation.event_source.add_callback(end)
+        fig.canvas.mpl_disconnect(cid)
+    cid = fig.canvas.mpl_connect("draw_event", install)
+
+
+def publish_snapshot():
+    """Publishes the current data (since the last callibration) as a versioned snapshot"""
+    global snapshot
     if len(callibration_dict) > 0:
         i = list(callibration_dict.keys())[-1]
         idx_ini = callibration_dict[i]["raw_processed_data"]["idx_ini"] + 1
     else:
         idx_ini = 0
+    # idx_ini += 1
 
-    if len(processed_mass[idx_ini:]) > 0:
-        max_mass = max(processed_mass[idx_ini:])
-        max_deflection = max(processed_deflection[idx_ini:])
-    else:
-        max_mass, max_deflection = 0, 0
+    version = (store.version, idx_ini)
+    if snapshot["version"] != version:
+        snapshot = {"version": version, "idx_ini": idx_ini, "idx_start": max(idx_ini, store.offset),
+                    "data": store.snapshot(idx_ini)}
 
-    # Update the label text
-    text_label.config(text=f"CARGA MÁX.: {max_mass:.2f} kg        FLECHA MÁX.: {max_deflection:.2f} mm")
 
-    # Schedule the next update (every 1 second)
-    text_label.after(refresh_time, update_measurement_info)
+def callibrate_mass_deflection(store):
+    """
+    Function Duties:
+        Starts the callibration (non-blocking): the samples of the next
+        callibration_time seconds are collected by process_data, which calls
+        finish_callibration when the window is completed. Meanwhile the
+        plots are paused and the button shows a countdown.
+    """
+    global pause
+    pause = True
+    print(f"[INFO] Iniciando medición en {callibration_time} segundos...")
+    zero_callibration.start(store.last("time"))
+    update_callibration_countdown()
 
 
+def update_callibration_countdown():
+    """Shows the remaining callibration time (from the sample timestamps) in the button"""
+    if zero_callibration.collecting:
+        remaining = zero_callibration.remaining(store.last("time"))
+        start_button.config(text=f"Please Wait... {remaining:.0f} s", style="Danger.TButton")
 
-def callibrate_mass_deflection(raw_time, raw_mass, raw_deflection, zero_mass, zero_deflection):
-    global pause, callibration, callibration_time
 
-    callibration_time = 5  # seconds
-    callibration = True
-    pause = True
-    print(f"[INFO] Iniciando medición en {callibration_time} segundos...")
-    idx_ini = len(raw_time) - 1
-    t_ini = raw_time[idx_ini]
-    time.sleep(callibration_time)
-    process_data(data_queue, raw_time, raw_mass, raw_deflection,
-                 processed_mass, processed_deflection, threshold_mass_peaks)
-    t_end = t_ini + callibration_time  # callibration_time is updated in process_data
-    callibration = False
+def finish_callibration(idx_callibration_end):
+    """
+    Function Duties:
+        Saves the new callibration entry (the zeros are already set by
+        process_data) and starts the measurement.
+    Input:
+        idx_callibration_end: index (in store) of the last callibration sample
+    """
+    global pause
     pause = False
 
-    # Save data in a callibration dictionary
-    idx_callibration_start = len(raw_time) - 1
     i = list(callibration_dict.keys())[-1] + \
         1 if len(callibration_dict) > 0 else 0
     callibration_dict[i] = {"callibration":
-                            {"t_ini_callibration": t_ini,
-                             "t_end_callibration": t_end,
+                            {"t_ini_callibration": zero_callibration.t_ini,
+                             "t_end_callibration": zero_callibration.t_end,
                              "zero_mass": zero_mass,
-                             "zero_deflection": zero_deflection},
+                             "zero_deflection": zero_deflection,
+                             "zeros": dict(zip(channels.names, zeros.tolist()))},
                             "raw_processed_data":
-                                {"time": raw_time[idx_callibration_start],
-                                 "idx_ini": idx_callibration_start}
+                                {"time": float(store.column("time", idx_callibration_end)[0]),
+                                 "idx_ini": idx_callibration_end}
                             }
 
+    if retention is not None:
+        retention.reset(idx_callibration_end + 1)  # Load drops of the new measurement
+    print(f"[INFO] Measurement started ({zero_callibration.n_samples} callibration samples).")
+    if zero_callibration.unstable:
+        print("[WARNING] The load changed during the callibration (no stable samples): "
+              "remove the load and callibrate again.")
+    start_acquisition_log(callibration_dict)
+    start_button.config(text="Stop Measurement", style="Danger.TButton")  # Change button appearance
+
 
 def to_roman(n: int) -> str:
     if not (1 <= n <= 3999):
@@ -464,6 +628,43 @@ def to_roman(n: int) -> str:
         q, n = divmod(n, v)
         res.append(sym * q)
     return "".join(res)
+
+
+def load_logo(path, size=(70, 70)):
+    """
+    Function Duties:
+        Returns the logo resized to size as a Tk image. The resized image is
+        cached as PNG in a .cache subfolder (made again if the logo changes),
+        so the large original image is only decoded and resized (with Pillow,
+        imported only then) the first time; afterwards Tk loads the small PNG.
+    """
+    folder, name = os.path.split(path)
+    cache_path = os.path.join(folder, ".cache", f"{os.path.splitext(name)[0]}_{size[0]}x{size[1]}.png")
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(path):
+        from PIL import Image
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        Image.open(path).convert("RGBA").resize(size, Image.Resampling.LANCZOS).save(cache_path)
+    return tk.PhotoImage(file=cache_path)
+
+
+def report_startup_time(event):
+    """
+    Function Duties:
+        Called when the first frame is drawn: prints the time to first frame
+        (since the script started) and its stages, and appends them to
+        data/startup_times.jsonl to compare the startups (e.g. between teams
+        or computers).
+    """
+    canvas_left.mpl_disconnect(startup_cid)
+    startup_stages["first_frame"] = time.perf_counter() - startup_time
+    print("[INFO] Startup: first frame in {first_frame:.2f} s (imports {imports:.2f} s, "
+          "data source {source:.2f} s, GUI {gui:.2f} s)".format(**startup_stages))
+    metrics.gauges["startup_s"] = round(startup_stages["first_frame"], 2)
+    os.makedirs("data", exist_ok=True)
+    with open(os.path.join("data", "startup_times.jsonl"), "a") as f:
+        f.write(json.dumps({"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                            "source": replay_file or ("simulated" if simulated else arduino_port),
+                            **{k: round(v, 3) for k, v in startup_stages.items()}}) + "\n")
 # -----------------------------------------------------------------------------
 
 
@@ -471,16 +672,34 @@ def to_roman(n: int) -> str:
 # MODIFIABLE VARIABLES
 # -----------------------------------------------------------------------------
 refresh_time = 1000  # ms
+ingest_time = 100  # ms (period for reading and converting the acquired data)
+log_time = 1  # s (period for appending the new samples to the acquisition log)
+save_json = False  # Also save the results as JSON (besides the compact .bcr file)
 arduino_port = "COM6"
-baud_rate = 9600
+baud_rate = 115200  # Must match BAUD_RATE in the .ino file
 smooth_plots = True
 step_smooth = 3  # Number of points to smooth (before and after)
 threshold_mass_peaks = 50  # kg
+channels = None  # ChannelRegistry of the sensors (None: load cell + potentiometer, see README)
+callibration_time = 5  # s (window of samples used to compute the zeros)
+stiffness_window = 50  # Samples of the sliding window of the tangent stiffness
 simulated = False
+replay_file = None  # Recorded run (.bcr/.json result or captured .raw serial stream) used instead of the Arduino
+replay_speed = 1  # Replay speed: 1 (real time), N (N times faster) or None (as fast as possible)
+show_metrics = False  # Pipeline timings, rates and queue depth: overlay on the plots and data/metrics_*.jsonl
+capture_serial = False  # Save all the bytes received from the Arduino (data/serial_*.raw) to replay them
+blit_plots = True  # Only redraw the plot lines in each frame (faster); False redraws the whole figure
+acquisition_process = False  # Read and convert the data in a separate process (acquisition.py)
+ring_capacity = 2**20  # Samples kept in the shared ring buffer of the acquisition process
+retention_time = None  # s of history kept at full resolution (None: all); older data as 1 s min/max/mean summaries
+collapse_drop = 0.3  # With retention_time: load drop (fraction of the peak) that keeps 30 s before/after at full resolution
+queue_capacity = 2**18  # Samples waiting between the serial reader and the GUI (bounded memory)
+queue_policy = "drop_oldest"  # If that queue is full: "drop_oldest", "block" or "spill" (to data/spill_*.bin)
 # -----------------------------------------------------------------------------
 # -----------------------------------------------------------------------------
 
 # GUI Variables
+startup_stages = {"imports": time.perf_counter() - startup_time}  # Time since startup_time (s)
 year = date.today().year
 num = to_roman(year - 2023)
 GUI_title = f"Fase Provincial - {num} Concurso Nacional de Puentes Agustín de Betancourt - ETSICCP GRANADA"
@@ -490,40 +709,73 @@ logo_etsiccp_name = "etsiccp.png"
 logo_grupo_puentes_name = "grupo_puentes.png"
 
 # Sensor Data
-raw_time, raw_mass, raw_deflection = [0], [0], [0]  # Starting values
-processed_time, processed_mass, processed_deflection = [0], [0], [0]  # Starting values
-zero_time, zero_mass, zero_deflection = 0, 0, 0  # Null values for callibration
+if channels is None:
+    channels = outils.default_channels(threshold_mass_peaks)
+store = SampleStore(channels.store_columns())
+store.extend_block(np.zeros((len(store.columns), 1)))  # Starting values
+stats = RunningStats()  # Live statistics since the last callibration
+stats.update([0], [0], [0])  # Starting values
+retention = None  # TieredRetention of the store (None: the whole history at full resolution)
+if retention_time is not None:
+    retention = TieredRetention(store, retention_time, drop_fraction=collapse_drop)
+stiffness = StiffnessEstimator(stiffness_window, threshold_mass_peaks)  # Live stiffness (kg/mm)
+zero_time, zero_mass, zero_deflection = 0, 0, 0  # Null values for callibration (totals)
+zeros = np.zeros(channels.n_channels)  # Null values for callibration (each channel)
+latest_t_us = 0  # Time of the last sample (integer us, avoids float drift)
 pause = False  # Variable to track if data updates are paused
-callibration = False
+zero_callibration = ZeroCallibration(callibration_time, channels.thresholds())
 callibration_dict = {}
+snapshot = {"version": None, "idx_ini": 0, "idx_start": 0, "data": store.snapshot()}  # Published by ingest_data
+info_version = None  # Version of the snapshot shown in the measurement info panel
+mass_peak_filter = None  # StreamingPeakFilter for the mass plot (reset at each callibration)
+mass_smoother = None  # StreamingSmoother for the mass plot (reset at each callibration)
+stiffness_smoother = None  # StreamingSmoother for the stiffness plot (reset at each callibration)
+stiffness_n_samples = 0  # Samples already added to the stiffness plot
+mass_plot_idx = 0  # Index (in store) of the first sample not read yet by the mass plot
+stiffness_plot_idx = 0  # Index (in store) of the first sample not read yet by the stiffness plot
 measurement_running = False
+acquisition_log = None  # AcquisitionLog of the running measurement
+logged_idx = 0  # Index (in store) of the first sample not logged yet
+log_lock = threading.Lock()
 ser = None  # Serial connection
-
-if simulated:
-    lock = threading.Lock()
-    data_queue = queue.Queue()
-    threading.Thread(target=outils.simulated_data_thread, args=(data_queue,), daemon=True).start()
+reader_stats = None  # SerialReaderStats of the reader thread
+metrics_path = None
+if show_metrics:
+    os.makedirs("data", exist_ok=True)
+    metrics_path = os.path.join("data", f"metrics_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl")
+metrics = PipelineMetrics(show_metrics, metrics_path)  # Does nothing if show_metrics is False
+ring = None  # SharedRingBuffer filled by the acquisition process
+data_queue = None  # SampleBlockQueue filled by the reader thread (None without data source)
+
+if acquisition_process:
+    # Serial reading and conversion run in acquisition.py; the GUI only reads the ring buffer
+    data_queue = None
+    ring = SharedRingBuffer(capacity=ring_capacity, n_columns=1 + channels.n_channels)
+    command = [sys.executable, "acquisition.py", ring.name,
+               "--port", arduino_port, "--baud-rate", str(baud_rate), "--channels", channels.to_json()]
+    if replay_file is not None:
+        command += ["--replay", replay_file, "--replay-speed", str(replay_speed or 0)]
+    elif simulated:
+        command.append("--simulated")
+    if capture_serial:
+        command.append("--capture")
+    import subprocess  # Only needed with acquisition_process
+    acquisition_proc = subprocess.Popen(command, stdin=subprocess.PIPE)
     threading.Thread(target=save_backup_data_thread, args=(callibration_dict,), daemon=True).start()
 else:
-    ser = outils.connect_arduino(arduino_port, baud_rate)
-    run_arduino_thread = False
-    if ser is None or not ser.is_open:  # Check connection before starting thread
-        print("[WARNING] No active serial connection. Attempting to reconnect...")
-        ser = outils.connect_arduino(arduino_port, baud_rate)
-        if ser is None:
-            print("[ERROR] Unable to establish connection. Data thread will NOT start.")
-        else:
-            run_arduino_thread = True
+    if replay_file is None and not simulated:
+        reader_stats = SerialReaderStats()  # Bytes/s, malformed lines and dropped frames of the serial reader
+    data_queue, ser = outils.start_data_source(channels, arduino_port, baud_rate, simulated, replay_file,
+                                               replay_speed, queue_policy, queue_capacity, reader_stats,
+                                               capture_serial, connection_attempts=2)
+    if data_queue is None:
+        print("[ERROR] Unable to establish connection. Data thread will NOT start.")
     else:
-        run_arduino_thread = True
-
-    if run_arduino_thread:
-        lock = threading.Lock()  # it avoids problems with different threads managing the same variables
-        data_queue = queue.Queue()
-        threading.Thread(target=outils.read_arduino_data_thread, args=(ser, data_queue), daemon=True).start()
         threading.Thread(target=save_backup_data_thread, args=(callibration_dict,), daemon=True).start()
 
 
+startup_stages["source"] = time.perf_counter() - startup_time
+
 # Tkinter GUI Setup
 root = tk.Tk()
 root.title("Arduino Sensor Data Viewer")
@@ -557,15 +809,9 @@ logo_etsiccp_path = os.path.join(logo_folder, logo_etsiccp_name)
 logo_grupo_puentes_path = os.path.join(logo_folder, logo_grupo_puentes_name)
 
 try:
-    logo_ugr_img = Image.open(logo_ugr_path).resize(
-        (70, 70), Image.Resampling.LANCZOS)
-    logo_ugr_tk = ImageTk.PhotoImage(logo_ugr_img)
-    logo_etsiccp_img = Image.open(logo_etsiccp_path).resize(
-        (70, 70), Image.Resampling.LANCZOS)
-    logo_etsiccp_tk = ImageTk.PhotoImage(logo_etsiccp_img)
-    logo_grupo_puentes_img = Image.open(logo_grupo_puentes_path).resize(
-        (70, 70), Image.Resampling.LANCZOS)
-    logo_grupo_puentes_tk = ImageTk.PhotoImage(logo_grupo_puentes_img)
+    logo_ugr_tk = load_logo(logo_ugr_path)  # Cached thumbnails (see load_logo)
+    logo_etsiccp_tk = load_logo(logo_etsiccp_path)
+    logo_grupo_puentes_tk = load_logo(logo_grupo_puentes_path)
 
     # Add left-side logos
     logo_ugr_label = tk.Label(logo_frame_left, image=logo_ugr_tk)
@@ -587,8 +833,10 @@ root.grid_rowconfigure(1, weight=1)
 root.grid_columnconfigure(0, weight=1)
 
 # LEFT SIDE: Original 2 Subplots (Mass & Deflection)
-fig_left, (ax1, ax2) = plt.subplots(2, 1, figsize=(8, 6))
+fig_left = Figure(figsize=(8, 6))
+ax1, ax2 = fig_left.subplots(2, 1)
 canvas_left = FigureCanvasTkAgg(fig_left, master=main_container)
+plot_left = MassDeflectionPlot(fig_left, ax1, ax2)
 canvas_left.get_tk_widget().grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
 
 # RIGHT SIDE: Now Divided into 2 Sections (Text + Stiffness Plot)
@@ -606,8 +854,10 @@ text_label = tk.Label(text_frame, text="Measurement Info", font=("Arial", 18, "b
 text_label.pack(expand=True)
 
 # RIGHT-BOTTOM: Stiffness Plot (Larger Area)
-fig_right, ax3 = plt.subplots(figsize=(8, 4))  # Single plot on the right
+fig_right = Figure(figsize=(8, 4))
+ax3 = fig_right.subplots()  # Single plot on the right
 canvas_right = FigureCanvasTkAgg(fig_right, master=right_container)
+plot_right = StiffnessPlot(fig_right, ax3)
 canvas_right.get_tk_widget().grid(row=1, column=0, sticky="nsew", padx=5, pady=0)
 
 # Make Right Side Expand Properly (More Height for Plot)
@@ -651,26 +901,36 @@ pause_button.pack(side=tk.RIGHT, padx=10)
 # Run Matplotlib animation
 ani_1 = FuncAnimation(
     fig_left,
-    lambda frame: update_mass_deflection_graph(frame, fig_left, ax1, ax2, data_queue, raw_time, raw_mass,
-                                               raw_deflection, processed_mass, processed_deflection, zero_mass,
-                                               zero_deflection, pause, callibration, threshold_mass_peaks,
+    lambda frame: update_mass_deflection_graph(frame, plot_left, snapshot, pause, threshold_mass_peaks,
                                                smooth_plots, step_smooth),
     interval=refresh_time,
+    blit=blit_plots,
     cache_frame_data=False
 )
 ani_2 = FuncAnimation(
     fig_right,
-    lambda frame2: update_stiffness_graph(frame2, fig_right, ax3, data_queue, raw_time, raw_mass,
-                                          raw_deflection, processed_mass, processed_deflection, zero_mass, zero_deflection,
-                                          pause, callibration, threshold_mass_peaks, smooth_plots, step_smooth),
+    lambda frame2: update_stiffness_graph(frame2, plot_right, snapshot, pause, smooth_plots, step_smooth),
     interval=refresh_time,
+    blit=blit_plots,
     cache_frame_data=False
 )
 
+# Pipeline metrics overlay (top right corner of the mass and deflection plots)
+metrics_label = tk.Label(main_container, font=("Courier", 9), fg="yellow", bg="black", justify=tk.LEFT)
+if show_metrics:
+    metrics_label.place(in_=canvas_left.get_tk_widget(), relx=1.0, rely=0.0, anchor="ne")
+    time_animation(ani_1, fig_left, "frame_mass_deflection")
+    time_animation(ani_2, fig_right, "frame_stiffness")
+
 root.protocol("WM_DELETE_WINDOW", lambda: close_app(ser))
+startup_stages["gui"] = time.perf_counter() - startup_time
+startup_cid = canvas_left.mpl_connect("draw_event", report_startup_time)
 # Run Tkinter main loop
 try:
+    ingest_data()
     update_measurement_info()
+    if show_metrics:
+        update_metrics()
     root.mainloop()
 except KeyboardInterrupt:
     close_app(ser)
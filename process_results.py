@@ -1,15 +1,22 @@
 
-import json
 import os
+import numpy as np
 import matplotlib.pyplot as plt
 import helpers.outils as outils
+import helpers.filters as filters
 
 folder = "data"
 
-file = os.listdir(folder)[-1]
-
-with open(os.path.join(folder, file)) as f:
-    data = json.load(f)
+# Last result file (.bcr compact format or .json); other JSON files (e.g. a leaderboard) are skipped
+files = sorted(f for f in os.listdir(folder) if f.endswith((".bcr", ".json")) and not f.startswith("."))
+for file in reversed(files):
+    try:
+        data = outils.load_results(os.path.join(folder, file))  # .bcr columns are memory-mapped
+        break
+    except ValueError as e:
+        print(f"[WARNING] {e}")
+else:
+    raise FileNotFoundError(f"No result files in {folder}")
 
 time_raw = data['time']
 raw_mass = data['raw_mass']
@@ -17,22 +24,33 @@ raw_deflection = data['raw_deflection']
 processed_mass = data['processed_mass']
 processed_deflection = data['processed_deflection']
 
-# Filter mass peaks
-threshold_mass_peaks = 50
+# Filter mass peaks (Hampel filter, see helpers/filters.py: isolated peaks and bursts of up to
+# window // 2 samples); the mask of the mass is applied to all the columns
+threshold_mass_peaks = 50  # kg (minimum deviation of a peak)
+despike_window = 21  # samples
+despike_sigmas = 3  # threshold in standard deviations of the local noise
 time, processed_mass, processed_deflection = time_raw[1:], processed_mass[1:], processed_deflection[1:]
-valid_indices = outils.manual_find_peaks(processed_mass, threshold_mass_peaks)
-time = [time[i] for i in valid_indices]
-processed_mass = [processed_mass[i] for i in valid_indices]
-processed_deflection = [processed_deflection[i] for i in valid_indices]
-
+outliers = filters.hampel_mask(processed_mass, despike_window, despike_sigmas, min_deviation=threshold_mass_peaks)
+print(f"[INFO] {np.count_nonzero(outliers)} outliers removed of {len(outliers)} samples")
+valid = ~outliers
+time = time[valid]
+processed_mass = processed_mass[valid]
+processed_deflection = processed_deflection[valid]
+
+# Plots (each series is decimated to ~2 points per pixel; min/max kept -> peaks visible)
 fig, ax = plt.subplots()
+n_buckets = int(ax.bbox.width)
 
-ax.plot(time_raw, raw_mass, label='raw_mass')
-ax.plot(time_raw, raw_deflection, label='raw_deflection')
+idx = outils.minmax_decimate(raw_mass, n_buckets)
+ax.plot(time_raw[idx], raw_mass[idx], label='raw_mass')
+idx = outils.minmax_decimate(raw_deflection, n_buckets)
+ax.plot(time_raw[idx], raw_deflection[idx], label='raw_deflection')
 ax.legend()
 
 fig, ax = plt.subplots()
 
-ax.plot(time, processed_mass, label='processed_mass')
-ax.plot(time, processed_deflection, label='processed_deflection')
+idx = outils.minmax_decimate(processed_mass, n_buckets)
+ax.plot(time[idx], processed_mass[idx], label='processed_mass')
+idx = outils.minmax_decimate(processed_deflection, n_buckets)
+ax.plot(time[idx], processed_deflection[idx], label='processed_deflection')
 ax.legend()
@@ -0,0 +1,54 @@
+import os
+import sys
+import helpers.outils as outils
+
+"""
+File Duties:
+
+Rebuilds a run from an acquisition log (.log files written by interface.py
+in the "data" folder), e.g. after a crash of the interface. The data of all
+the valid chunks is recovered (a truncated last chunk is discarded) and it
+is saved as a result file (compact .bcr format, same as interface.py).
+
+The raw logs of acquisition.py (data/acquisition_*.log) only have the raw
+columns (no callibration), so they cannot be rebuilt as a result file.
+
+Usage:
+    python recover_log.py [log_file]  (default: newest measurement log in "data")
+"""
+
+folder = "data"
+
+
+def is_measurement_log(path):
+    """Whether the log has the processed columns of a result file (not only raw samples)"""
+    columns = outils.read_acquisition_log_metadata(path)["columns"]
+    return "processed_mass" in columns and "processed_deflection" in columns
+
+
+if len(sys.argv) > 1:
+    log_path = sys.argv[1]
+else:
+    logs = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".log")]
+    logs = [path for path in logs if is_measurement_log(path)]
+    if not logs:
+        print(f"[ERROR] No measurement log in {folder}")
+        sys.exit(1)
+    log_path = max(logs, key=os.path.getmtime)  # Newest (the names of the logs do not sort by date)
+
+if not is_measurement_log(log_path):
+    print(f"[ERROR] {log_path} is a raw acquisition log (acquisition.py): it has no processed columns "
+          f"nor callibration, so it cannot be rebuilt as a result file. Recover the log of the measurement "
+          f"written by interface.py instead (data/<team>_<date>.log)")
+    sys.exit(1)
+
+data_dict, complete = outils.read_acquisition_log(log_path)
+n_samples = len(data_dict["time"])
+if complete:
+    print(f"[INFO] {log_path}: log closed properly ({n_samples} samples)")
+else:
+    print(f"[WARNING] {log_path}: log not closed properly; {n_samples} samples recovered")
+
+out_path = os.path.splitext(log_path)[0] + ("" if complete else "_recovered") + ".bcr"
+outils.save_results(out_path, data_dict)
+print(f"[INFO] Saved {out_path}")
@@ -0,0 +1,13 @@
+import os
+import sys
+
+"""
+File Duties:
+
+Common setup of the tests (python -m pytest -q from the root of the project):
+the helpers are imported as in the scripts (import helpers.outils as outils).
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
@@ -0,0 +1,43 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import helpers.outils as outils
+from conftest import REPO_ROOT
+
+"""
+File Duties:
+
+Batch analysis (analyze_results.py, run on a copy of two committed results):
+the default leaderboard is written next to the folder, and the scripts that
+read the folder never take a leaderboard as a result file.
+"""
+
+RUNS = ("Equipo_Azul_2025-03-07_09-33-45.json", "Equipo_Rojo_2025-03-07_09-43-54.json")
+
+
+def test_leaderboard_outside_results_folder(tmp_path):
+    folder = tmp_path / "data"
+    folder.mkdir()
+    for run in RUNS:
+        shutil.copy(os.path.join(REPO_ROOT, "bridge_contest_results", run), folder)
+
+    for _ in range(2):  # The second run reads the cache and the folder must still only hold the runs
+        result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "analyze_results.py"), str(folder),
+                                 "--workers", "1"], cwd=tmp_path, capture_output=True, text=True,
+                                env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert "[ERROR]" not in result.stdout
+        assert sorted(f for f in os.listdir(folder) if not f.startswith(".")) == sorted(RUNS)
+
+    with open(tmp_path / "data_leaderboard.json") as f:
+        rows = json.load(f)
+    assert sorted(row["file"] for row in rows) == sorted(RUNS)
+    assert (tmp_path / "data_leaderboard.csv").exists()
+
+    with pytest.raises(ValueError, match="not a result file"):  # e.g. if saved with --output data/leaderboard
+        outils.load_results(str(tmp_path / "data_leaderboard.json"))
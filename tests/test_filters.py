@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import helpers.filters as filters
+
+"""
+File Duties:
+
+Offline despiking filters (helpers/filters.py): the rolling median against a
+naive reference (one np.median per sample), spikes and short bursts detected
+and replaced by the median, clean data left unchanged and spikes at the
+first and last samples.
+"""
+
+
+def naive_rolling_median(values, window):
+    """Median of the samples of the centered window (truncated at the edges)"""
+    half = window // 2
+    return np.array([np.median(values[max(i - half, 0):i + half + 1]) for i in range(len(values))])
+
+
+def noisy_ramp(n=2000, seed=0):
+    """Load increasing from 0 to 500 kg with noise (sigma = 1 kg)"""
+    rng = np.random.default_rng(seed)
+    return np.linspace(0, 500, n) + rng.normal(0, 1, n)
+
+
+@pytest.mark.parametrize("n", [0, 1, 5, 20, 21, 22, 1000])
+@pytest.mark.parametrize("window", [3, 5, 21])
+@pytest.mark.parametrize("chunk_size", [7, filters.CHUNK_SIZE])
+def test_rolling_median_matches_naive(n, window, chunk_size):
+    values = np.random.default_rng(n).normal(0, 10, n)
+    np.testing.assert_array_equal(filters.rolling_median(values, window, chunk_size),
+                                  naive_rolling_median(values, window))
+
+
+def test_window_must_be_odd():
+    for window in (1, 4, 20):
+        with pytest.raises(ValueError):
+            filters.rolling_median(np.zeros(10), window)
+
+
+def test_spikes_replaced():
+    clean = noisy_ramp()
+    values = clean.copy()
+    spikes = [100, 900, 1200, 1500, 1501, 1502]  # Isolated peaks and a burst of 3 samples
+    values[[100, 900, 1500, 1501, 1502]] += 200
+    values[1200] -= 300
+    for mask in (filters.hampel_mask(values, 21, 3, min_deviation=20),
+                 filters.mad_mask(values, 21, 5, min_deviation=20),
+                 filters.median_mask(values, 21, threshold=20)):
+        assert np.flatnonzero(mask).tolist() == spikes
+        repaired = np.where(mask, filters.rolling_median(values, 21), values)
+        assert np.max(np.abs(repaired - clean)) < 5
+
+
+def test_clean_data_unchanged():
+    clean = noisy_ramp()
+    assert not filters.hampel_mask(clean, 21, 3, min_deviation=10).any()
+    assert not filters.mad_mask(clean, 21, 5, min_deviation=10).any()
+    assert not filters.median_mask(clean, 21, threshold=10).any()
+    flat = np.full(100, 20.)  # No noise (MAD = 0)
+    assert not filters.hampel_mask(flat).any()
+    np.testing.assert_array_equal(filters.rolling_median(flat), flat)
+
+
+def test_edges():
+    clean = noisy_ramp(500)
+    values = clean.copy()
+    values[[0, 1, -1]] += 200  # Spikes at the first and last samples
+    mask = filters.hampel_mask(values, 21, 3, min_deviation=20)
+    assert np.flatnonzero(mask).tolist() == [0, 1, len(values) - 1]
+    assert np.flatnonzero(filters.median_mask(values, 21, threshold=20)).tolist() == [0, 1, len(values) - 1]
+    assert not filters.hampel_mask(clean, 21, 3, min_deviation=10).any()  # The edges of the ramp are kept
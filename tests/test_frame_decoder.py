@@ -0,0 +1,114 @@
+import numpy as np
+
+import helpers.outils as outils
+from helpers.classes import FrameDecoder
+
+"""
+File Duties:
+
+Detection of the data format of the Arduino (binary frames or text lines,
+outils.is_binary_stream) and decoding with classes.FrameDecoder, with streams
+that start in the middle of a frame or a line and arrive in small reads.
+"""
+
+
+def encode_frames(hx711, potentiometer, seq_ini=0, dt_us=1000):
+    """Binary frames as sent by the Arduino (see outils.FRAME_DTYPE)"""
+    n = len(hx711)
+    frames = np.zeros(n, dtype=outils.FRAME_DTYPE)
+    frames["sync"] = np.frombuffer(outils.FRAME_SYNC, dtype="<u2")[0]
+    frames["seq"] = (seq_ini + np.arange(n)) % 2**16
+    frames["micros"] = (np.arange(n) * dt_us) % 2**32
+    frames["hx711"] = hx711
+    frames["potentiometer"] = potentiometer
+    raw = frames.view(np.uint8).reshape(n, outils.FRAME_SIZE)
+    frames["crc"] = outils.crc16_ccitt(raw[:, 2:-2])
+    return frames.tobytes()
+
+
+def decode_in_reads(decoder, stream, rng, max_read=8):
+    """Decodes the stream in reads of 1 to max_read bytes"""
+    batches, i = [], 0
+    while i < len(stream):
+        n = int(rng.integers(1, max_read + 1))
+        batches.append(decoder.decode(stream[i:i + n]))
+        i += n
+    return np.vstack(batches)
+
+
+def test_binary_with_new_lines_mid_frame():
+    # Payloads full of 0x0A bytes (new lines in the data and CRCs), stream
+    # starting at a random position inside a frame, small reads
+    rng = np.random.default_rng(0)
+    n = 40
+    hx711 = np.full(n, 0x0A0A0A0A) + rng.integers(0, 3, n)
+    potentiometer = np.full(n, 0x0A0A)
+    stream = encode_frames(hx711, potentiometer)
+    for start in range(1, outils.FRAME_SIZE):
+        for trial in range(4):
+            decoder = FrameDecoder()
+            samples = decode_in_reads(decoder, stream[start:], rng)
+            assert decoder.binary is True, (start, trial)
+            assert len(samples) == n - 1  # All but the first (incomplete) frame
+            np.testing.assert_array_equal(samples[:, 1], hx711[1:])
+
+
+def test_text_detection():
+    assert outils.is_binary_stream(b"10 100 200\n") is None  # Not enough lines
+    assert outils.is_binary_stream(b"00 200\n10 101 201\n10 102 202\n") is False  # Partial first line
+    assert outils.is_binary_stream(b"0 200\n10 101 201\n") is None
+    assert outils.is_binary_stream(b"\x0a\x0a\x0a\x01\x0a\x0a\x02\x0a") is None  # Not text lines
+    assert outils.is_binary_stream(b"10 1 2 3\n10 1 2 3\n10 1 2 3\n", n_fields=4) is False
+    assert outils.is_binary_stream(b"x" * outils.FORMAT_PROBE_SIZE) is False  # No frame at all
+
+
+def test_text_in_small_reads():
+    rng = np.random.default_rng(1)
+    stream = b"".join(b"%d %d %d\r\n" % (10, 100 + i, 200 + i) for i in range(100))
+    decoder = FrameDecoder()
+    samples = decode_in_reads(decoder, stream[3:], rng)
+    assert decoder.binary is False
+    assert samples[-1].tolist() == [10000, 199, 299]
+    assert decoder.n_redetections == 0
+
+
+def test_redetection_after_only_errors():
+    # Wrongly decoded as text: nothing but malformed lines -> detected again
+    hx711 = np.full(300, 0x0A0A0A0A)
+    stream = encode_frames(hx711, np.full(300, 0x0A0A))
+    decoder = FrameDecoder(binary=False)
+    samples = decode_in_reads(decoder, stream, np.random.default_rng(2), max_read=32)
+    assert decoder.binary is True
+    assert decoder.n_redetections == 1
+    assert len(samples) > 0 and np.all(samples[:, 1] == 0x0A0A0A0A)
+
+
+def test_no_redetection_with_valid_data():
+    # Some corrupted frames among valid ones are not a wrong format
+    stream = bytearray(encode_frames(np.arange(1000), np.arange(1000)))
+    for i in range(0, len(stream), 5 * outils.FRAME_SIZE):
+        stream[i + 6] ^= 0xFF  # Corrupt 1 frame of each 5
+    decoder = FrameDecoder()
+    samples = decoder.decode(bytes(stream))
+    assert decoder.binary is True and decoder.n_redetections == 0
+    assert len(samples) == 800 and decoder.n_corrupted == 200
+
+
+def test_sync_bytes_in_payload_are_not_corruption():
+    # Every payload holds the sync bytes (false candidates inside valid frames)
+    n = 200
+    hx711 = np.full(n, 0x55AA55AA)  # Little-endian: AA 55 AA 55
+    stream = encode_frames(hx711, np.full(n, 0x55AA))
+    assert stream.count(outils.FRAME_SYNC) > 2 * n
+    frames, rest, n_corrupted = outils.decode_binary_frames(stream[5:])  # Starting in the middle of a frame
+    assert len(frames) == n - 1 and n_corrupted == 0
+    np.testing.assert_array_equal(frames["hx711"], hx711[1:])
+
+    decoder = FrameDecoder()
+    samples = decode_in_reads(decoder, stream, np.random.default_rng(3))
+    assert len(samples) == n and decoder.n_corrupted == 0
+
+    stream = bytearray(stream)
+    stream[10 * outils.FRAME_SIZE + 8] ^= 0xFF  # A really corrupted frame is still counted
+    frames, _, n_corrupted = outils.decode_binary_frames(bytes(stream))
+    assert len(frames) == n - 1 and n_corrupted >= 1
@@ -0,0 +1,105 @@
+import os
+import re
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tkinter")  # interface.py imports the Tk backend of matplotlib (no window is opened)
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import helpers.outils as outils
+from conftest import REPO_ROOT
+from helpers.classes import MassDeflectionPlot, SampleBlockQueue, StiffnessPlot
+
+"""
+File Duties:
+
+Tiered retention in interface.py (retention_time) with the plots paused for
+longer than retention_time: the samples the plots have not read yet must not
+be compacted, and the plots must continue where they stopped when resumed.
+
+interface.py is a script (the GUI is built when it runs), so its functions and
+state are loaded by running it up to the Tk window, with the data source
+replaced by a queue filled by the test (a replay of a committed run).
+"""
+
+INTERFACE_PATH = os.path.join(REPO_ROOT, "interface.py")
+REPLAY_FILE = os.path.join(REPO_ROOT, "bridge_contest_results", "Equipo_Verde_2025-03-07_10-10-40.json")
+
+
+class _Stub:
+    """Tk widgets used by the ingest (root.after, start_button.config): nothing to do"""
+
+    def after(self, *args, **kwargs):
+        pass
+
+    def config(self, **kwargs):
+        pass
+
+
+def load_interface(monkeypatch, **variables):
+    """Runs interface.py up to the Tk window with the given MODIFIABLE VARIABLES"""
+    with open(INTERFACE_PATH, encoding="utf-8") as f:
+        source = f.read().split("# Tkinter GUI Setup")[0]
+    for name, value in variables.items():
+        source, n = re.subn(rf"^{name} = [^#\n]*", f"{name} = {value!r}  ", source, count=1, flags=re.M)
+        assert n == 1, name
+    data_queue = SampleBlockQueue(3, policy="block")
+    monkeypatch.setattr(outils, "start_data_source", lambda *args, **kwargs: (data_queue, None))
+    ns = {"__name__": "interface_test", "__file__": INTERFACE_PATH}
+    exec(compile(source, INTERFACE_PATH, "exec"), ns)
+    ns["root"], ns["start_button"] = _Stub(), _Stub()
+    return ns
+
+
+def new_plots():
+    fig_left = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig_left)
+    fig_right = Figure(figsize=(8, 4))
+    FigureCanvasAgg(fig_right)
+    return MassDeflectionPlot(fig_left, *fig_left.subplots(2, 1)), StiffnessPlot(fig_right, fig_right.subplots())
+
+
+def test_pause_longer_than_retention_time(monkeypatch):
+    ns = load_interface(monkeypatch, retention_time=5., simulated=True)
+    plot_left, plot_right = new_plots()
+    store, data_queue = ns["store"], ns["data_queue"]
+    samples = outils.load_replay_samples(REPLAY_FILE)
+    t_samples = np.cumsum(samples[:, 0]) / 1e6
+    batches = iter(np.split(samples, np.searchsorted(t_samples, np.arange(t_samples[0], t_samples[-1], 0.5))))
+
+    def tick(n_ticks):
+        """Ingest of 0.5 s of samples (a 5x replay) and a frame of both plots"""
+        for _ in range(n_ticks):
+            data_queue.put(next(batches))
+            ns["ingest_data"]()
+            ns["update_mass_deflection_graph"](0, plot_left, ns["snapshot"], ns["pause"], ns["threshold_mass_peaks"],
+                                               ns["smooth_plots"], ns["step_smooth"])
+            ns["update_stiffness_graph"](0, plot_right, ns["snapshot"], ns["pause"], ns["smooth_plots"],
+                                         ns["step_smooth"])
+
+    tick(6)
+    idx_read = len(store) - 1  # The plots have read everything (the last sample is read again)
+    ns["pause"] = True
+    tick(60)  # 30 s paused (retention_time = 5 s)
+    assert store.offset <= idx_read  # The samples not plotted yet are kept
+    assert len(store) - store.offset > 50
+
+    ns["pause"] = False
+    tick(1)
+    t_plot = plot_left.line_mass.get_xdata()
+    assert np.all(np.diff(t_plot) >= 0)  # Time never goes backwards
+    t_replay = t_plot[t_plot > t_samples[0] + 1]  # The store starts with a row of zeros at 0 s
+    assert np.max(np.diff(t_replay)) < 1.  # Nothing missing from the paused period
+    assert t_plot[-1] == pytest.approx(store.last("time"), abs=0.2)  # Smoothed tail
+
+    tick(30)  # The plots keep up again: the old samples are compacted
+    assert store.offset > idx_read
+    assert len(ns["retention"].history) > 0
+    t_plot = plot_left.line_mass.get_xdata()
+    assert np.all(np.diff(t_plot) >= 0)
+    assert t_plot[-1] == pytest.approx(store.last("time"), abs=0.2)  # Smoothed tail
+    assert len(plot_right.artists) > 0
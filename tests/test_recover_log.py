@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import helpers.outils as outils
+from conftest import REPO_ROOT
+from helpers.classes import AcquisitionLog
+
+"""
+File Duties:
+
+Recovery of a run from an acquisition log (recover_log.py, run in a temporary
+folder): the default log is the newest measurement log (not the last name in
+alphabetical order) and the raw logs of acquisition.py are rejected with a
+clear message.
+"""
+
+MEASUREMENT_COLUMNS = ("time", "raw_mass", "raw_deflection", "processed_mass", "processed_deflection")
+
+
+def write_log(path, columns, n_rows, mtime, close=True):
+    log = AcquisitionLog(str(path), columns)
+    log.write_samples({name: np.arange(n_rows, dtype=np.float64) for name in columns})
+    log.write_json({"callibration": {}})
+    if close:
+        log.close()
+    else:
+        log._file.close()  # Crash: no end mark
+    os.utime(path, (mtime, mtime))
+
+
+def run_recover_log(cwd, *args):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.run([sys.executable, os.path.join(REPO_ROOT, "recover_log.py"), *args], cwd=cwd, env=env,
+                          capture_output=True, text=True)
+
+
+def test_default_is_newest_measurement_log(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    write_log(data / "Equipo_Verde_2025-03-07_10-10-40.log", MEASUREMENT_COLUMNS, 30, mtime=2000, close=False)
+    write_log(data / "server_2025-03-07_09-00-00.log", MEASUREMENT_COLUMNS, 10, mtime=1000)  # Last name, older
+    write_log(data / "acquisition_2025-03-07_10-10-40.log", ("time", "raw_mass"), 50, mtime=3000)  # Raw only
+
+    result = run_recover_log(tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+    recovered = outils.load_results(str(data / "Equipo_Verde_2025-03-07_10-10-40_recovered.bcr"))
+    assert len(recovered["processed_mass"]) == 30
+    assert not (data / "server_2025-03-07_09-00-00.bcr").exists()
+
+
+def test_raw_acquisition_log_is_rejected(tmp_path):
+    (tmp_path / "data").mkdir()
+    log_path = tmp_path / "data" / "acquisition_2025-03-07_10-10-40.log"
+    write_log(log_path, ("time", "raw_mass", "raw_deflection"), 20, mtime=1000)
+
+    result = run_recover_log(tmp_path, str(log_path))
+    assert result.returncode == 1
+    assert "raw acquisition log" in result.stdout
+    assert os.listdir(tmp_path / "data") == [log_path.name]
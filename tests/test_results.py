@@ -0,0 +1,55 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pytest
+
+import helpers.outils as outils
+from conftest import REPO_ROOT
+
+"""
+File Duties:
+
+Round trip of the committed contest results through the compact format:
+JSON -> save_results (.bcr) -> load_results must give the same columns and
+callibration, with the columns memory-mapped (lazy loading).
+"""
+
+RESULT_FILES = sorted(glob.glob(os.path.join(REPO_ROOT, "bridge_contest_results", "**", "*.json"), recursive=True))
+
+
+def test_result_files_found():
+    assert len(RESULT_FILES) > 0
+
+
+@pytest.mark.parametrize("json_path", RESULT_FILES, ids=os.path.basename)
+def test_bcr_round_trip(json_path, tmp_path):
+    with open(json_path) as f:
+        original = json.load(f)
+    bcr_path = str(tmp_path / (os.path.splitext(os.path.basename(json_path))[0] + ".bcr"))
+    outils.save_results(bcr_path, outils.load_results(json_path))
+
+    converted = outils.load_results(bcr_path)
+    assert set(converted) == set(original)
+    assert converted["callibration"] == original["callibration"]
+    for name, values in original.items():
+        if name == "callibration":
+            continue
+        assert isinstance(converted[name], np.memmap), name  # Lazy loading
+        assert converted[name].dtype == np.float64
+        np.testing.assert_array_equal(converted[name], np.asarray(values, dtype=np.float64))
+
+
+def test_empty_result_round_trip(tmp_path):
+    path = str(tmp_path / "empty.bcr")
+    outils.save_results(path, {"time": [], "processed_mass": [], "callibration": {}})
+    converted = outils.load_results(path)
+    assert len(converted["time"]) == 0 and converted["callibration"] == {}
+
+
+def test_load_results_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bcr"
+    path.write_bytes(b"NOTARESULT" + b"\0" * 32)
+    with pytest.raises(ValueError):
+        outils.load_results(str(path))
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import numpy as np
+
+from helpers.classes import SharedRingBuffer
+
+"""
+File Duties:
+
+Shared-memory ring buffer between acquisition.py and the GUI
+(classes.SharedRingBuffer): the reader must never return rows that the writer
+is overwriting, even when it lags close to capacity.
+"""
+
+
+def numbered_rows(k_ini, n):
+    """Rows whose values are their sample number (to check them after reading)"""
+    k = np.arange(k_ini, k_ini + n, dtype=np.float64)
+    return np.column_stack([k, -k])
+
+
+def test_read_write():
+    ring = SharedRingBuffer(capacity=16, n_columns=2)
+    try:
+        ring.write(numbered_rows(0, 10))
+        np.testing.assert_array_equal(ring.read(), numbered_rows(0, 10))
+        ring.write(numbered_rows(10, 30))  # Wraps around: only the last 16 fit
+        np.testing.assert_array_equal(ring.read(), numbered_rows(24, 16))
+        assert ring.n_lost == 14 and ring.read_count == 40
+        assert len(ring.read()) == 0
+    finally:
+        ring.close()
+
+
+def test_write_in_progress_is_discarded():
+    ring = SharedRingBuffer(capacity=16, n_columns=2)
+    try:
+        ring.write(numbered_rows(0, 16))
+        # The writer has announced 4 more rows but not published them yet:
+        # the 4 oldest slots may already hold the new rows
+        ring._header[4] = 20
+        rows = ring.read()
+        np.testing.assert_array_equal(rows, numbered_rows(4, 12))
+        assert ring.n_lost == 4 and ring.read_count == 16
+    finally:
+        ring.close()
+
+
+def test_lagging_reader_never_gets_overwritten_rows():
+    ring = SharedRingBuffer(capacity=4096, n_columns=2)
+    stop = threading.Event()
+
+    def writer():  # Large batches, so the reader always lags close to capacity
+        k = 0
+        while not stop.is_set():
+            ring.write(numbered_rows(k, 3000))
+            k += 3000
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    n_read, t_end = 0, time.monotonic() + 0.5
+    try:
+        while time.monotonic() < t_end:
+            rows = ring.read()
+            first = ring.read_count - len(rows)
+            np.testing.assert_array_equal(rows, numbered_rows(first, len(rows)))
+            n_read += len(rows)
+    finally:
+        stop.set()
+        thread.join()
+        ring.close()
+    assert n_read > 0
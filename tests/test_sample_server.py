@@ -0,0 +1,161 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import REPO_ROOT
+from helpers.classes import SampleServer, SampleSubscriber
+
+"""
+File Duties:
+
+Live samples through a local socket (classes.SampleServer and
+SampleSubscriber, acquisition_server.py), only on the loopback interface
+(127.0.0.1): framing of the messages, viewers that do not keep up and the
+"callibrate" command.
+"""
+
+LOOPBACK = ("127.0.0.1", 0)  # Free port chosen by the system
+REPLAY_FILE = os.path.join(REPO_ROOT, "bridge_contest_results", "Equipo_Azul_2025-03-07_09-33-45.json")
+
+
+def wait_until(condition, timeout=5.):
+    t_end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < t_end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_framing():
+    server = SampleServer(LOOPBACK, ("time", "processed_mass"), metadata={"source": "test"})
+    subscriber = SampleSubscriber(server.address, timeout=5)
+    try:
+        assert subscriber.columns == ("time", "processed_mass")
+        assert subscriber.metadata["source"] == "test"
+        assert wait_until(lambda: server.n_clients == 1)
+
+        rows = np.column_stack([np.arange(5.), 10 * np.arange(5.)])
+        server.publish_samples(rows)
+        server.publish_samples(np.empty((0, 2)))  # Nothing is sent
+        server.publish_json({"callibration": {"0": {"zero_mass": 1.5}}})
+        server.close()
+
+        kind, content = subscriber.receive()
+        assert kind == "DATA"
+        np.testing.assert_array_equal(content["time"], rows[:, 0])
+        np.testing.assert_array_equal(content["processed_mass"], rows[:, 1])
+        assert subscriber.receive() == ("JSON", {"callibration": {"0": {"zero_mass": 1.5}}})
+        assert subscriber.receive() == ("END_", None)
+    finally:
+        subscriber.close()
+
+
+def test_slow_viewer_is_dropped_not_waited():
+    server = SampleServer(LOOPBACK, ("time",), max_queued=4)
+    fast = SampleSubscriber(server.address, timeout=5)
+    slow = socket.create_connection(server.address)  # Connected, but it never reads
+    received = []
+
+    def read_fast():
+        while True:
+            kind, content = fast.receive()
+            if kind == "END_":
+                return
+            received.append(content["time"])
+
+    thread = threading.Thread(target=read_fast, daemon=True)
+    try:
+        assert wait_until(lambda: server.n_clients == 2)
+        thread.start()
+        t_ini = time.monotonic()
+        n_batches = 2000
+        for i in range(n_batches):  # ~16 MB: much more than the socket buffers of the slow viewer
+            server.publish_samples(np.full((1000, 1), float(i)))
+        publish_time = time.monotonic() - t_ini
+        assert wait_until(lambda: len(received) > 0 and received[-1][0] == n_batches - 1)
+        server.close()
+        thread.join(timeout=5)
+    finally:
+        fast.close()
+        slow.close()
+
+    assert publish_time < 5.  # Publishing never waited for the slow viewer
+    assert server.n_dropped > 0
+    batches = [int(batch[0]) for batch in received]
+    assert batches == sorted(batches)  # The fast viewer gets the batches in order
+
+
+def test_callibrate_command():
+    commands = []
+    server = SampleServer(LOOPBACK, ("time",), on_command=commands.append)
+    subscriber = SampleSubscriber(server.address, timeout=5)
+    try:
+        subscriber.send_command("callibrate")
+        subscriber.send_command("  ")  # Empty commands are ignored
+        subscriber.send_command("stop")
+        assert wait_until(lambda: len(commands) == 2)
+        assert commands == ["callibrate", "stop"]
+    finally:
+        subscriber.close()
+        server.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(LOOPBACK)
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="stopped with SIGINT (Ctrl+C)")
+def test_acquisition_server_callibrate():
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "acquisition_server.py", "--listen", f"127.0.0.1:{port}",
+                                "--replay", REPLAY_FILE, "--replay-speed", "5", "--callibration-time", "0.5",
+                                "--no-log"], cwd=REPO_ROOT, stdout=subprocess.DEVNULL)
+    subscriber = None
+    try:
+        assert wait_until(lambda: process.poll() is None and _accepts(port), timeout=20)
+        subscriber = SampleSubscriber(("127.0.0.1", port), timeout=20)
+        assert "processed_mass" in subscriber.columns
+
+        callibrations, n_samples = {}, 0
+
+        def receive_until(key):
+            nonlocal n_samples
+            t_end = time.monotonic() + 20
+            while key not in callibrations and time.monotonic() < t_end:
+                kind, content = subscriber.receive()
+                assert kind != "END_"
+                if kind == "JSON":
+                    callibrations.update(content["callibration"])
+                elif kind == "DATA":
+                    n_samples += len(content["time"])
+            return callibrations.get(key)
+
+        first = receive_until("0")  # Done when the first data arrives
+        assert first is not None and first["callibration"]["zero_mass"] != 0  # Samples of the replay
+        subscriber.send_command("callibrate")
+        requested = receive_until("1")
+        assert requested is not None
+        assert n_samples > 0
+        assert requested["callibration"]["t_ini_callibration"] > first["callibration"]["t_end_callibration"]
+    finally:
+        if subscriber is not None:
+            subscriber.close()
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=10)
+
+
+def _accepts(port):
+    """Whether the server already listens on the port"""
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import numpy as np
+import serial
+
+import helpers.outils as outils
+from helpers.classes import SampleBlockQueue, SerialReaderStats
+
+"""
+File Duties:
+
+Serial reader of the Arduino (outils.read_arduino_data_thread) against a
+stand-in of the port: a pyserial loopback ("loop://"), where the bytes written
+are read back by the thread, so the text lines can arrive split in any way.
+"""
+
+
+def wait_for_samples(data_queue, n_samples, timeout=5.):
+    """Drains the queue until n_samples have arrived (or timeout)"""
+    batches, n = [], 0
+    t_end = time.monotonic() + timeout
+    while n < n_samples and time.monotonic() < t_end:
+        batch = data_queue.drain()
+        batches.append(batch)
+        n += len(batch)
+        time.sleep(0.01)
+    return np.vstack(batches)
+
+
+def start_reader(n_fields=3):
+    ser = serial.serial_for_url("loop://", timeout=0.05)
+    data_queue = SampleBlockQueue(n_fields)
+    stats = SerialReaderStats()
+    thread = threading.Thread(target=outils.read_arduino_data_thread,
+                              args=(ser, data_queue, stats, None, n_fields), daemon=True)
+    thread.start()
+    return ser, data_queue, stats, thread
+
+
+def stop_reader(ser, thread):
+    ser.close()  # The next read raises SerialException and the thread returns
+    thread.join(timeout=2.)
+    assert not thread.is_alive()
+
+
+def test_parse_text_lines_split_and_partial():
+    samples, rest, malformed = outils.parse_text_lines(b"10 100 200\n20 10")
+    assert samples.tolist() == [[10000, 100, 200]]  # ms -> us
+    assert rest == b"20 10" and malformed == []
+    samples, rest, malformed = outils.parse_text_lines(rest + b"1 201\n")
+    assert samples.tolist() == [[20000, 101, 201]] and rest == b""
+
+
+def test_parse_text_lines_crlf_and_empty_lines():
+    samples, rest, malformed = outils.parse_text_lines(b"10 100 200\r\n\r\n\n20 101 201\r\n")
+    assert samples.tolist() == [[10000, 100, 200], [20000, 101, 201]]
+    assert rest == b"" and malformed == []
+
+
+def test_parse_text_lines_malformed():
+    samples, rest, malformed = outils.parse_text_lines(b"10 100 200\n10 100\nab 1 2\n10 1 2 3\n30 102 202\n")
+    assert samples.tolist() == [[10000, 100, 200], [30000, 102, 202]]
+    assert sorted(malformed) == [b"10 1 2 3", b"10 100", b"ab 1 2"]
+
+
+def test_parse_text_lines_overflow():
+    # Garbled line with a field out of the int64 range: malformed, not an exception
+    samples, _, malformed = outils.parse_text_lines(b"10 100 200\n10 12345678901234567890 201\n30 102 202\n")
+    assert samples.tolist() == [[10000, 100, 200], [30000, 102, 202]]
+    assert malformed == [b"10 12345678901234567890 201"]
+
+
+def test_parse_text_lines_channels():
+    samples, _, malformed = outils.parse_text_lines(b"10 1 2 3\n10 1 2\n", n_fields=4)
+    assert samples.tolist() == [[10000, 1, 2, 3]] and malformed == [b"10 1 2"]
+
+
+def test_reader_thread_split_lines():
+    ser, data_queue, stats, thread = start_reader()
+    # Lines split at arbitrary points, CRLF line ends and malformed lines (one out of the int64 range)
+    pieces = [b"10 100 200\r\n20 1", b"01 2", b"01\r\n", b"30 102 202\n", b"bad line\n40 10", b"3 203\n",
+              b"50 99999999999999999999 204\n"]
+    for piece in pieces:
+        ser.write(piece)
+        time.sleep(0.06)  # Separate reads
+    samples = wait_for_samples(data_queue, 4)
+    stop_reader(ser, thread)
+
+    assert samples.tolist() == [[10000, 100, 200], [20000, 101, 201], [30000, 102, 202], [40000, 103, 203]]
+    assert stats.n_bytes == sum(len(piece) for piece in pieces)
+    assert stats.n_lines == 4
+    assert stats.n_malformed == 2
+    assert stats.n_dropped == 0
+
+
+def test_reader_thread_batches():
+    ser, data_queue, stats, thread = start_reader()
+    lines = b"".join(b"%d %d %d\n" % (10, 100 + i, 200 + i) for i in range(500))
+    ser.write(lines)  # Many lines available at once -> decoded in a few batches
+    samples = wait_for_samples(data_queue, 500)
+    stop_reader(ser, thread)
+
+    assert len(samples) == 500
+    np.testing.assert_array_equal(samples[:, 1], 100 + np.arange(500))
+    assert stats.n_lines == 500 and stats.n_malformed == 0 and stats.n_bytes == len(lines)
+    assert data_queue.n_put == 500
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from helpers.classes import StiffnessEstimator
+
+"""
+File Duties:
+
+Online stiffness (classes.StiffnessEstimator): tangent and secant stiffness of
+the last window samples, against a direct least-squares fit of the same
+samples, with the samples arriving in batches of any size.
+"""
+
+
+def load_curve(n, seed=0):
+    """Deflection (mm) and load (kg): 10 kg/mm up to 5 mm, then 2 kg/mm (with noise)"""
+    rng = np.random.default_rng(seed)
+    deflection = np.linspace(0, 10, n)
+    mass = np.where(deflection < 5, 10 * deflection, 50 + 2 * (deflection - 5)) + rng.normal(0, 0.05, n)
+    return deflection, mass
+
+
+def feed(estimator, deflection, mass, seed=1):
+    rng = np.random.default_rng(seed)
+    i = 0
+    while i < len(mass):
+        n = int(rng.integers(1, 40))
+        estimator.update(deflection[i:i + n], mass[i:i + n])
+        i += n
+
+
+def test_tangent_and_secant():
+    deflection, mass = load_curve(1000)
+    estimator = StiffnessEstimator(window=50, threshold=50)
+    feed(estimator, deflection, mass)
+
+    # The last sample is pending (its peak filter status is not final)
+    x, y = deflection[-51:-1], mass[-51:-1]
+    assert estimator.tangent == pytest.approx(np.polyfit(x, y, 1)[0], rel=1e-9)
+    assert estimator.tangent == pytest.approx(2, abs=0.1)
+    assert estimator.secant == pytest.approx(y.mean() / x.mean(), rel=1e-9)
+    assert estimator.secant == pytest.approx((50 + 2 * (x.mean() - 5)) / x.mean(), rel=1e-3)
+
+    # Elastic branch: both are the stiffness of the bridge
+    estimator.reset()
+    feed(estimator, deflection[:400], mass[:400])
+    assert estimator.tangent == pytest.approx(10, rel=0.02)
+    assert estimator.secant == pytest.approx(10, rel=0.02)
+
+
+def test_peaks_discarded_and_reset():
+    deflection, mass = load_curve(300)
+    mass[250] += 500  # Isolated peak of the load cell
+    estimator = StiffnessEstimator(window=50, threshold=50)
+    feed(estimator, deflection, mass)
+    x, y = np.delete(deflection[:-1], 250)[-50:], np.delete(mass[:-1], 250)[-50:]
+    assert estimator.tangent == pytest.approx(np.polyfit(x, y, 1)[0], rel=1e-9)
+    assert estimator.secant == pytest.approx(y.mean() / x.mean(), rel=1e-9)
+
+    estimator.reset()
+    assert np.isnan(estimator.tangent) and np.isnan(estimator.secant)
+    estimator.update([0., 0.], [0., 0.])  # No deflection range
+    assert np.isnan(estimator.tangent)
@@ -0,0 +1,48 @@
+import numpy as np
+
+from helpers.classes import ZeroCallibration
+
+"""
+File Duties:
+
+Zero callibration (classes.ZeroCallibration): zeros without outliers and,
+when the load changes during the window (no stable samples), finite zeros
+and the unstable flag instead of NaN.
+"""
+
+
+def run_callibration(values, duration=5., thresholds=(50, np.inf)):
+    """Collects the samples (10 per second, starting at 0 s) in batches of 7"""
+    callibration = ZeroCallibration(duration, thresholds)
+    callibration.start(-0.05)
+    t = np.arange(len(values)) * 0.1
+    for i in range(0, len(values), 7):
+        idx_end = callibration.update(t[i:i + 7], values[i:i + 7])
+        if idx_end is not None:
+            return callibration
+    raise AssertionError("The callibration window was not completed")
+
+
+def test_zeros_without_outliers():
+    rng = np.random.default_rng(0)
+    values = np.column_stack([20 + rng.normal(0, 1, 60), 3 + rng.normal(0, 0.1, 60)])
+    values[10, 0] = 500  # Isolated peak
+    callibration = run_callibration(values)
+    assert not callibration.unstable
+    np.testing.assert_allclose(callibration.zeros, [20, 3], atol=0.5)
+
+
+def test_bimodal_window():
+    # The load (120 kg) is placed in the middle of the window: every sample is
+    # further than the threshold (50 kg) from the median
+    rng = np.random.default_rng(1)
+    mass = np.where(np.arange(60) < 25, 0., 120.) + rng.normal(0, 1, 60)
+    values = np.column_stack([mass, 3 + rng.normal(0, 0.1, 60)])
+    callibration = run_callibration(values)
+    assert callibration.unstable
+    assert np.all(np.isfinite(callibration.zeros))
+    np.testing.assert_allclose(callibration.zeros, values[:50].mean(axis=0))  # Window: 0 to 4.9 s
+
+    callibration.start(10.)  # Callibrated again without load
+    callibration.update(np.array([10.5, 16.]), np.array([[0.5, 3.], [0., 3.]]))
+    assert not callibration.unstable